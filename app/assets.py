@@ -0,0 +1,70 @@
+"""Images and styles loaded once per process instead of on every rerun.
+
+Files are read and encoded on first use and kept until their modification
+time changes. Large images are not inlined as data URIs but served by
+Streamlit from ``static/`` (``server.enableStaticServing`` in
+``.streamlit/config.toml``). The page then only carries a short URL; the
+browser loads the image once and caches it (the static route sends
+``Last-Modified`` and ``ETag``), and the modification time in the URL makes
+it load the image again after a change. Without static serving the images
+fall back to cached data URIs.
+"""
+
+import base64
+import mimetypes
+from pathlib import Path
+
+import streamlit as st
+
+
+_APP_ROOT = Path(__file__).resolve().parents[1]
+ASSETS_DIR = _APP_ROOT / "assets"
+STATIC_DIR = _APP_ROOT / "static"  # served at app/static/ next to app.py
+
+_cache = {}  # (path, build) -> (mtime, value); concurrent first builds give equal values
+
+
+def cached_asset(path, build):
+    """Returns ``build(path)`` and reuses it until the file's mtime changes ("" if missing)."""
+    try:
+        mtime = Path(path).stat().st_mtime_ns
+    except FileNotFoundError:
+        return ""
+    key = (str(path), build)  # ``build`` is one of the module functions below
+    entry = _cache.get(key)
+    if entry is None or entry[0] != mtime:
+        value = build(path)
+        _cache[key] = (mtime, value)
+        return value
+    return entry[1]
+
+
+def _encode(path):
+    return base64.b64encode(Path(path).read_bytes()).decode("utf-8")
+
+
+def _data_uri(path):
+    mime = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+    return f"data:{mime};base64,{_encode(path)}"
+
+
+def base64_asset(path):
+    """Returns the file as a Base64 string, encoded once per modification."""
+    return cached_asset(path, _encode)
+
+
+def data_uri(path):
+    """Returns the file as a data URI, encoded once per modification."""
+    return cached_asset(path, _data_uri)
+
+
+def _static_url(path):
+    return f"app/static/{path.name}?v={path.stat().st_mtime_ns}"
+
+
+def static_url(name):
+    """Returns the URL of ``static/<name>`` (versioned by mtime), or its data URI without static serving."""
+    path = STATIC_DIR / name
+    if not st.get_option("server.enableStaticServing"):
+        return data_uri(path)
+    return cached_asset(path, _static_url)
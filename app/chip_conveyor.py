@@ -1,17 +1,15 @@
 import streamlit as st
-import pandas as pd
 from app.components import render_traffic_light, create_plotly_chart
-from app.test_env import get_global_history
+from app.sidebar import get_global_history_frame
 from app.config import COLOR_PALETTE
 
 @st.fragment(run_every="1s")
 def render_chip_conveyor_dynamic():
-    history = get_global_history()
-    if not history:
+    history_df = get_global_history_frame()
+    if history_df.empty:
         st.info("Initializing live data...")
         return
     
-    history_df = pd.DataFrame(history)
     
     # Layout: Plot left, traffic light right
     col1, col2 = st.columns([3, 1])
@@ -29,7 +27,7 @@ def render_chip_conveyor_dynamic():
         
     with col2:
         st.subheader("Status")
-        render_traffic_light("animation")
+        render_traffic_light("animation", key="chip_conveyor_light")
 
 def render_chip_conveyor():
     st.header("Chip conveyor")
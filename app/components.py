@@ -1,87 +1,52 @@
-import streamlit as st
+from pathlib import Path
+
+import numpy as np
 import plotly.graph_objects as go
+from streamlit.components.v1 import declare_component
 from app.config import COLOR_PALETTE
+from app.services.downsampling import lttb_indices
+
+# Mounted once per key; later runs only send the state (see app/frontend/traffic_light).
+_traffic_light = declare_component(
+    "traffic_light", path=str(Path(__file__).resolve().parent / "frontend" / "traffic_light")
+)
 
-def render_traffic_light(state="animation"):
+TRAFFIC_LIGHT_STATES = ("red", "yellow", "green", "animation")
+
+def render_traffic_light(state="animation", key="traffic_light"):
     """
-    Renders the HTML for the traffic light.
+    Renders the traffic light.
     States: 'red', 'yellow', 'green' or 'animation'
+    The light stays mounted across reruns as long as the key is the same, so
+    several lights on one page (e.g. one per machine) need distinct keys.
     """
-    
-    # CSS Styles
-    css = """
-    <style>
-      .trafficLight {
-        background-color: black;
-        width: 50px;
-        height: 150px;
-        display: flex;
-        flex-direction: column;
-        justify-content: space-between;
-        align-items: center;
-        padding: 10px 5px;
-        border-radius: 10px;
-      }
-      .trafficLight span {
-        width: 40px;
-        height: 40px;
-        border-radius: 100%;
-        background-color: #333;
-      }
-      
-      /* Static colors */
-      .light-red { background-color: red !important; box-shadow: 0 0 10px red; }
-      .light-yellow { background-color: yellow !important; box-shadow: 0 0 10px yellow; }
-      .light-green { background-color: green !important; box-shadow: 0 0 10px green; }
+    if state not in TRAFFIC_LIGHT_STATES:
+        raise ValueError(f"Unknown traffic light state: {state}")
+    _traffic_light(state=state, key=key, default=None)
 
-      /* Animations */
-      .anim-red { animation: red-anim 5s linear infinite; }
-      .anim-yellow { animation: yellow-anim 5s linear infinite; }
-      .anim-green { animation: green-anim 5s linear infinite; }
-
-      @keyframes red-anim {
-        0%, 33% { background-color: red; box-shadow: 0 0 10px red; }
-        34%, 100% { background-color: #333; box-shadow: none; }
-      }
-      @keyframes yellow-anim {
-        0%, 33% { background-color: #333; box-shadow: none; }
-        34%, 66% { background-color: yellow; box-shadow: 0 0 10px yellow; }
-        67%, 100% { background-color: #333; box-shadow: none; }
-      }
-      @keyframes green-anim {
-        0%, 66% { background-color: #333; box-shadow: none; }
-        67%, 100% { background-color: green; box-shadow: 0 0 10px green; }
-      }
-    </style>
+def downsample_trace(df, y_col, max_points=None):
     """
-    
-    # Classes based on state
-    red_class = "anim-red" if state == "animation" else ("light-red" if state == "red" else "")
-    yellow_class = "anim-yellow" if state == "animation" else ("light-yellow" if state == "yellow" else "")
-    green_class = "anim-green" if state == "animation" else ("light-green" if state == "green" else "")
-    
-    html = f"""
-    {css}
-    <div class="trafficLight">
-      <span class="{red_class}"></span>
-      <span class="{yellow_class}"></span>
-      <span class="{green_class}"></span>
-    </div>
+    Returns the x and y values of one trace, reduced to max_points by LTTB.
     """
-    st.components.v1.html(html, height=170)
+    if max_points is None or len(df) <= max_points:
+        return df["timestamp"], df[y_col]
+    x = df["time"].to_numpy() if "time" in df else np.arange(len(df))
+    indices = lttb_indices(x, df[y_col].to_numpy(), max_points)
+    return df["timestamp"].iloc[indices], df[y_col].iloc[indices]
 
-def create_plotly_chart(df, y_col, title, color=None, y_label="Effective power [W]", height=300):
+def create_plotly_chart(df, y_col, title, color=None, y_label="Effective power [W]", height=300, max_points=None):
     """
     Creates a modern Plotly line chart.
     """
     if color is None:
         color = COLOR_PALETTE.get("FX Blue", "#4B5BA9")
+    x, y = downsample_trace(df, y_col, max_points)
         
     fig = go.Figure()
     
     fig.add_trace(go.Scatter(
-        x=df["timestamp"],
-        y=df[y_col],
+        x=x,
+        y=y,
         name=y_col,
         mode='lines',
         line=dict(color=color, width=2, shape='spline'),
@@ -1,6 +1,9 @@
 """Central configuration for the Factory-X Energy Savings App.
 """
 
+import os
+from pathlib import Path
+
 # Colors
 DEFAULT_COLORS = [
     '#4B5BA9', '#006DB9', '#007CC5', '#01A579',
@@ -28,3 +31,44 @@ TAB_NAMES = [
     "Mist extractor settings",
     "Mist extractor savings",
 ]
+
+# Simulation history
+HISTORY_CAPACITY = 4 * 60 * 60  # samples kept in memory (4 hours at 1 Hz)
+HISTORY_WINDOW = 300  # samples shown in the live charts (5 minutes)
+CHART_MAX_POINTS = 800  # points per chart trace, roughly the chart width in pixels
+CHART_RANGES = {  # visible time range of the live charts in seconds
+    "5 minutes": 5 * 60,
+    "1 hour": 60 * 60,
+    "4 hours": 4 * 60 * 60,
+    "24 hours": 24 * 60 * 60,
+    "7 days": 7 * 24 * 60 * 60,
+}
+HISTORY_STORE_DIR = Path(  # persistent history
+    os.environ.get("FACTORYX_HISTORY_DIR", Path(__file__).resolve().parents[1] / ".data" / "history")
+)
+# Directory the measurement replay may open recordings from (paths are relative to it).
+REPLAY_DIR = Path(
+    os.environ.get("FACTORYX_REPLAY_DIR", Path(__file__).resolve().parents[1] / ".data" / "recordings")
+)
+# Retention of the persistent history; the oldest segments are deleted beyond either limit.
+HISTORY_STORE_MAX_BYTES = int(os.environ.get("FACTORYX_HISTORY_MAX_BYTES", 2 * 1024 ** 3))
+HISTORY_STORE_MAX_SECONDS = float(os.environ.get("FACTORYX_HISTORY_MAX_SECONDS", 30 * 24 * 60 * 60))
+# Pushed sensor samples with their own timestamps, one store per machine (the
+# history store skips the directory, it has no segment metadata).
+INGEST_STORE_DIR = Path(os.environ.get("FACTORYX_INGEST_DIR", HISTORY_STORE_DIR / "ingest"))
+INGEST_STORE_MAX_BYTES = int(os.environ.get("FACTORYX_INGEST_MAX_BYTES", 256 * 1024 ** 2))  # per machine
+
+# Shifts (start hours, local time) for the energy accounting
+SHIFT_START_HOURS = (6, 14, 22)
+
+# Machine fleet (each machine tool has its own mist extractor and chip conveyor)
+FLEET_SIZE = int(os.environ.get("FACTORYX_FLEET_SIZE", "6"))  # machines registered at startup
+FLEET_MACHINE_IDS = [f"MT-{i:02d}" for i in range(1, FLEET_SIZE + 1)]
+DEFAULT_MACHINE_ID = FLEET_MACHINE_IDS[0]
+
+# Multi-process deployments (see app/services/shared_state.py): "writer" runs the
+# simulation and publishes it to shared memory, "reader" serves API and UI from
+# there. Empty keeps everything in this process.
+SHARED_STATE_ROLE = os.environ.get("FACTORYX_SHARED_STATE", "")
+SHARED_STATE_NAME = os.environ.get("FACTORYX_SHARED_NAME", "factoryx_state")
+SHARED_STATE_MAX_MACHINES = int(os.environ.get("FACTORYX_SHARED_MAX_MACHINES", max(32, FLEET_SIZE)))
@@ -0,0 +1,130 @@
+"""Live charts that are drawn once per session and afterwards only extended.
+
+``st.plotly_chart`` ships the whole figure on every rerun of a fragment.
+``live_chart`` sends the figure (layout, trace styles and the visible window)
+once per session and chart, and on later runs only the samples after the
+last sequence number the browser has, plus layout changes such as new axis
+ranges. A small custom component (``app/frontend/live_chart``) appends them
+with ``Plotly.extendTraces`` and drops the points that left the window. The
+updates can be shared by all sessions (``cache``), as most of them are at
+the same sequence number.
+
+The whole window is sent again when the chart changes (another machine,
+range or resolution), when the window is not a contiguous run of samples
+(raw data reduced by LTTB) and when the component asks for it because it was
+mounted anew or missed an update.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import plotly
+import streamlit as st
+import streamlit.components.v1 as components
+
+
+_APP_ROOT = Path(__file__).resolve().parents[1]
+_FRONTEND_PAGE = Path(__file__).resolve().parent / "frontend" / "live_chart" / "index.html"
+_PLOTLY_JS = Path(plotly.__file__).resolve().parent / "package_data" / "plotly.min.js"
+_COMPONENT_DIR = _APP_ROOT / ".cache" / "components" / "live_chart"
+
+
+def _build_component_dir():
+    """Puts the component page and the plotly.js bundle of the plotly package into one served directory."""
+    _COMPONENT_DIR.mkdir(parents=True, exist_ok=True)
+    for source in (_FRONTEND_PAGE, _PLOTLY_JS):
+        target = _COMPONENT_DIR / source.name
+        if not target.exists() or target.stat().st_mtime != source.stat().st_mtime:
+            temporary = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            shutil.copy2(source, temporary)
+            os.replace(temporary, target)
+    return _COMPONENT_DIR
+
+
+_component = components.declare_component("live_chart", path=str(_build_component_dir()))
+
+
+def chart_update(state, chart_id, figure_factory, columns, y_cols, x_col="timestamp", relayout=None, cache=None):
+    """Returns the component arguments for one run and updates ``state`` (a dict kept per session).
+
+    ``columns`` is the visible window (dict of arrays with a ``seq``
+    channel), ``y_cols`` the channels of the figure's traces in order.
+    ``figure_factory()`` builds the ``go.Figure`` with styled, empty traces;
+    it runs only when the figure is sent. ``chart_id`` identifies what the
+    window shows (machine, range, resolution); a new id redraws the chart.
+
+    The update is serialized to JSON. Sessions at the same sequence number
+    get the same update, so with ``cache(key, build)`` (see
+    ``app.views.chart_update_cache``) it is built once for all of them.
+    """
+    seq = columns["seq"]
+    last_seq = int(seq[-1]) if len(seq) else 0
+    contiguous = not len(seq) or int(seq[-1] - seq[0]) + 1 == len(seq)
+    full = (
+        state.get("id") != chart_id
+        or state.pop("resend", False)
+        or not contiguous
+        or not state.get("contiguous")
+    )
+    if state.get("id") != chart_id:
+        state.pop("figure", None)
+    base = None if full else state["seq"]
+
+    def build():
+        update = {
+            "id": chart_id,
+            "base": base,
+            "seq": last_seq,
+            "figure": None,
+            "x": [],
+            "y": [],
+            "max_points": len(seq),
+            "relayout": relayout,
+        }
+        if base is None:
+            if "figure" not in state:
+                state["figure"] = json.loads(figure_factory().to_json())
+            figure = dict(state["figure"])
+            figure["data"] = [
+                {**trace, "x": columns[x_col].tolist(), "y": columns[y_col].tolist()}
+                for trace, y_col in zip(figure["data"], y_cols)
+            ]
+            if relayout:
+                figure["layout"] = _apply_relayout(figure["layout"], relayout)
+            update["figure"] = figure
+        else:
+            new = seq > base
+            update["x"] = columns[x_col][new].tolist()
+            update["y"] = [columns[y_col][new].tolist() for y_col in y_cols]
+        return json.dumps(update, separators=(",", ":"))
+
+    payload = build() if cache is None else cache((chart_id, base, last_seq), build)
+    state["revision"] = state.get("revision", 0) + 1
+    state.update({"id": chart_id, "seq": last_seq, "contiguous": contiguous})
+    return {"revision": state["revision"], "payload": payload}
+
+
+def _apply_relayout(layout, relayout):
+    """Applies Plotly relayout updates (``"yaxis.range": [...]``) to a layout dict."""
+    layout = json.loads(json.dumps(layout))
+    for path, value in relayout.items():
+        target = layout
+        *parents, name = path.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return layout
+
+
+def live_chart(key, chart_id, figure_factory, columns, y_cols, x_col="timestamp", relayout=None, cache=None):
+    """Draws ``y_cols`` of the window ``columns`` and extends the chart on later runs (see ``chart_update``)."""
+    state = st.session_state.setdefault(f"live_chart:{key}", {})
+    shared = None if cache is None else (lambda update_key, build: cache(("live_chart", key, *update_key), build))
+    args = chart_update(state, chart_id, figure_factory, columns, y_cols, x_col, relayout, shared)
+    value = _component(**args, key=key, default=None)
+    # The component asks for the whole figure after a remount or a missed update.
+    if value and value.get("resend") == chart_id and value.get("nonce") != state.get("nonce"):
+        state["nonce"] = value["nonce"]
+        state["resend"] = True
@@ -2,32 +2,32 @@
 """
 
 from __future__ import annotations
-from pathlib import Path
+from functools import lru_cache
+import importlib
 import streamlit as st
-import base64
 
+from app.assets import ASSETS_DIR, static_url
 from app.config import APP_TITLE, LOGO_FILENAME, TAB_NAMES
-from app.test_env import render_test_env, init_background_tasks
-from app.mist_extractor import render_mist_extractor
-from app.mist_extractor_savings import render_mist_extractor_savings
+from app.sidebar import init_background_tasks, render_chart_settings, render_machine_selector
 
-_APP_ROOT = Path(__file__).resolve().parents[1]
-_LOGO_PATH = _APP_ROOT / "assets" / LOGO_FILENAME
-_STYLE_PATH = _APP_ROOT / "assets" / "FX_style_top_right.svg"
+_LOGO_PATH = ASSETS_DIR / LOGO_FILENAME
+_STYLE_IMAGE = "FX_style_top_right.svg"
 
+# Tab -> (module, render function). A tab module and its dependencies
+# (pandas, plotly subplots, the savings sweeps) are imported when the tab is
+# first shown.
+_TAB_RENDERERS = {
+    "Mist extractor demo": ("app.mist_extractor", "render_mist_extractor"),
+    "Mist extractor settings": ("app.test_env", "render_test_env"),
+    "Mist extractor savings": ("app.mist_extractor_savings", "render_mist_extractor_savings"),
+}
 
-def _get_base64(path: Path) -> str:
-    """Loads a file as a Base64 string."""
-    if not path.exists():
-        return ""
-    with path.open("rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
 
-
-def _get_custom_css(rgba_bg: str, style_base64: str) -> str:
-    """Returns the custom CSS for the app."""
+@lru_cache(maxsize=4)
+def _get_custom_css(rgba_bg: str, style_url: str) -> str:
+    """Returns the custom CSS for the app (built once per background image URL)."""
     bg_svg_style = ""
-    if style_base64:
+    if style_url:
         bg_svg_style = f"""
         [data-testid="stAppViewContainer"]::before {{
             content: "";
@@ -36,7 +36,7 @@ def _get_custom_css(rgba_bg: str, style_base64: str) -> str:
             right: -5px;
             width: 400px;
             height: 400px;
-            background-image: url('data:image/svg+xml;base64,{style_base64}');
+            background-image: url('{style_url}');
             background-size: contain;
             background-repeat: no-repeat;
             background-position: top right;
@@ -101,7 +101,8 @@ def _get_custom_css(rgba_bg: str, style_base64: str) -> str:
 
 def _inject_styles() -> None:
     """Injects global CSS styles."""
-    style_base64 = _get_base64(_STYLE_PATH)
+    # A static file URL (or a data URI cached per process), not re-encoded per rerun.
+    style_url = static_url(_STYLE_IMAGE)
     
     # Background configuration (Light green with transparency)
     bg_color_hex = "#B1CB21"
@@ -112,7 +113,15 @@ def _inject_styles() -> None:
     r, g, b = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
     rgba_bg = f"rgba({r}, {g}, {b}, {bg_opacity})"
     
-    st.markdown(_get_custom_css(rgba_bg, style_base64), unsafe_allow_html=True)
+    st.markdown(_get_custom_css(rgba_bg, style_url), unsafe_allow_html=True)
+
+
+def _create_tabs():
+    """Creates the tabs; switching tabs reruns the app so only the open one is rendered."""
+    try:
+        return st.tabs(TAB_NAMES, key="active_tab", on_change="rerun")
+    except TypeError:  # Streamlit without lazy tabs
+        return st.tabs(TAB_NAMES)
 
 
 def run_app() -> None:
@@ -126,6 +135,9 @@ def run_app() -> None:
     if _LOGO_PATH.exists():
         st.logo(str(_LOGO_PATH))
     
+    render_machine_selector()
+    render_chart_settings()
+    
     # Sidebar Footer
     st.sidebar.markdown("""
         <hr class="sidebar-hr">
@@ -150,18 +162,18 @@ def run_app() -> None:
     _inject_styles()
     
     # Tabs
-    tabs = st.tabs(TAB_NAMES)
-    for i, tab in enumerate(tabs):
+    for name, tab in zip(TAB_NAMES, _create_tabs()):
+        # Only the open tab runs; without tab state (older Streamlit) all of them do.
+        if getattr(tab, "open", None) is False:
+            continue
         with tab:
-            if TAB_NAMES[i] == "Mist extractor demo":
-                render_mist_extractor()
-            elif TAB_NAMES[i] == "Mist extractor settings":
-                render_test_env()
-            elif TAB_NAMES[i] == "Mist extractor savings":
-                render_mist_extractor_savings()
+            renderer = _TAB_RENDERERS.get(name)
+            if renderer is not None:
+                module, function = renderer
+                getattr(importlib.import_module(module), function)()
             else:
-                st.header(TAB_NAMES[i])
-                st.write(f"Insert content for {TAB_NAMES[i]} here.")
+                st.header(name)
+                st.write(f"Insert content for {name} here.")
 
 
 if __name__ == "__main__":
@@ -1,22 +1,87 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from app.components import render_traffic_light
-from app.test_env import get_global_history
+from app.live_chart import live_chart
+from app.services.data_service import data_service
+from app.services.metrics import timed_render
+from app.sidebar import get_chart_view, get_selected_machine_id
+from app.views import chart_update_cache
 from app.config import COLOR_PALETTE
 
+def _mist_extractor_figure():
+    """Layout and trace styles of the mist extractor chart, without data (see ``live_chart``)."""
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Line 1: Power (Mist extractor)
+    fig.add_trace(
+        go.Scatter(
+            x=[],
+            y=[],
+            name="Effective power [W]", 
+            line=dict(color=COLOR_PALETTE["FX Blue"], width=2, shape='spline'),
+            fill='tozeroy',
+            fillcolor='rgba(75, 91, 169, 0.1)'
+        ),
+        secondary_y=False,
+    )
+
+    # Line 2: PM10
+    fig.add_trace(
+        go.Scatter(
+            x=[],
+            y=[],
+            name="PM₁₀ [mg/m³]", 
+            line=dict(color=COLOR_PALETTE["Light Green"], width=2, shape='spline'),
+            fill='tozeroy',
+            fillcolor='rgba(177, 203, 33, 0.1)'
+        ),
+        secondary_y=True,
+    )
+
+    fig.update_yaxes(
+        title_text="Effective power [W]", 
+        secondary_y=False,
+        nticks=6,
+        gridcolor='rgba(200, 200, 200, 0.3)',
+        showgrid=True
+    )
+    fig.update_yaxes(
+        title_text="PM₁₀ [mg/m³]", 
+        secondary_y=True,
+        nticks=6,
+        showgrid=False
+    )
+    
+    fig.update_xaxes(
+        title_text="Timestamp",
+        nticks=20,
+        gridcolor='rgba(200, 200, 200, 0.3)',
+        showgrid=True
+    )
+
+    fig.update_layout(
+        height=400,
+        paper_bgcolor='white',
+        plot_bgcolor='rgba(250, 250, 250, 0.5)',
+        margin=dict(l=10, r=10, t=30, b=30),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        hovermode="x unified"
+    )
+    return fig
+
 @st.fragment(run_every="1s")
+@timed_render
 def render_mist_extractor_dynamic():
-    history = get_global_history()
-    if not history:
+    # Window, latest sample, axis ranges and light are derived once per tick for all sessions.
+    view = get_chart_view()
+    latest = view["latest"]
+    if not len(view["columns"]["seq"]) or latest is None:
         st.info("Initializing live data...")
         return
-    
-    history_df = pd.DataFrame(history)
-    latest = history_df.iloc[-1]
-    pm10 = latest.get("PM10", 0.0)
-    is_active = latest.get("mist_extractor_active", False)
+
+    pm10 = latest["PM10"]
+    is_active = latest["mist_extractor_active"]
 
     # Status-Messages
     if is_active:
@@ -29,86 +94,48 @@ def render_mist_extractor_dynamic():
     
     with col1:
         st.subheader("Effective power vs. Particulate Matter")
-        
-        # Plotly Chart with synchronized axes
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-
-        # Line 1: Power (Mist extractor)
-        fig.add_trace(
-            go.Scatter(
-                x=history_df["timestamp"], 
-                y=history_df["Mist extractor"], 
-                name="Effective power [W]", 
-                line=dict(color=COLOR_PALETTE["FX Blue"], width=2, shape='spline'),
-                fill='tozeroy',
-                fillcolor='rgba(75, 91, 169, 0.1)'
-            ),
-            secondary_y=False,
-        )
-
-        # Line 2: PM10
-        fig.add_trace(
-            go.Scatter(
-                x=history_df["timestamp"], 
-                y=history_df["PM10"], 
-                name="PM₁₀ [mg/m³]", 
-                line=dict(color=COLOR_PALETTE["Light Green"], width=2, shape='spline'),
-                fill='tozeroy',
-                fillcolor='rgba(177, 203, 33, 0.1)'
-            ),
-            secondary_y=True,
-        )
 
         # Axis-Synchronization
-        y1_max = max(history_df["Mist extractor"].max() * 1.2, 500)
-        y2_max = max(history_df["PM10"].max() * 1.2, 5)
+        y_max = view["y_max"]
 
-        fig.update_yaxes(
-            title_text="Effective power [W]", 
-            secondary_y=False,
-            range=[0, y1_max],
-            nticks=6,
-            gridcolor='rgba(200, 200, 200, 0.3)',
-            showgrid=True
-        )
-        fig.update_yaxes(
-            title_text="PM₁₀ [mg/m³]", 
-            secondary_y=True,
-            range=[0, y2_max],
-            nticks=6,
-            showgrid=False
-        )
-        
-        fig.update_xaxes(
-            title_text="Timestamp",
-            nticks=20,
-            gridcolor='rgba(200, 200, 200, 0.3)',
-            showgrid=True
+        # The figure is sent once per session; later runs only send new samples and axis ranges.
+        live_chart(
+            "mist_extractor_chart", view["chart_id"], _mist_extractor_figure, view["columns"],
+            ["Mist extractor", "PM10"],
+            relayout={"yaxis.range": [0, y_max["Mist extractor"]], "yaxis2.range": [0, y_max["PM10"]]},
+            cache=chart_update_cache,
         )
         
-        fig.update_layout(
-            height=400,
-            paper_bgcolor='white',
-            plot_bgcolor='rgba(250, 250, 250, 0.5)',
-            margin=dict(l=10, r=10, t=30, b=30),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode="x unified"
-        )
-
-        st.plotly_chart(fig, use_container_width=True, key="mist_extractor_chart")
-        
     with col2:
         st.subheader("Status")
-        if pm10 <= 2.0:
-            color = "green"
-        elif pm10 <= 3.0:
-            color = "yellow"
-        else:
-            color = "red"
-        
-        render_traffic_light(color)
+        render_traffic_light(view["light"], key="mist_extractor_light")
         st.metric("PM₁₀", f"{pm10:.3f} mg/m³")
 
+    render_energy_metrics()
+
+def render_energy_metrics():
+    # Counters are integrated on every tick by the data service, no history scan needed.
+    energy = data_service.get_energy_snapshot(get_selected_machine_id())
+    since_reset = energy["since_reset"]
+    shift = energy["shift"]
+    last_hour = energy["windows"]["1 h"]
+
+    st.subheader("Energy")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Mist extractor since reset", f"{since_reset['consumers_wh']['Mist extractor']:.1f} Wh")
+    col2.metric("Always-on extractor", f"{since_reset['always_on_extractor_wh']:.1f} Wh")
+    col3.metric("Savings since reset", f"{since_reset['savings_wh']:.1f} Wh", f"{since_reset['savings_percent']:.1f} %")
+    col4.metric(
+        f"Savings this shift (since {shift.get('started', '-')[-5:]})",
+        f"{shift['savings_wh']:.1f} Wh",
+        f"{shift['savings_percent']:.1f} %",
+    )
+    st.caption(
+        f"Total consumption since reset: {since_reset['total_wh'] / 1000:.3f} kWh - "
+        f"last hour: {last_hour['total_wh'] / 1000:.3f} kWh, "
+        f"extractor savings {last_hour['savings_percent']:.1f} %"
+    )
+
 def render_mist_extractor():
-    st.header("Mist extractor demo")
+    st.header(f"Mist extractor demo ({get_selected_machine_id()})")
     render_mist_extractor_dynamic()
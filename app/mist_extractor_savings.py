@@ -1,32 +1,156 @@
-from pathlib import Path
-import base64
-
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
 
+from app.assets import static_url
+from app.config import COLOR_PALETTE
+from app.services.data_service import data_service
+from app.services.savings import (
+    build_grid,
+    evaluate_strategies,
+    load_cached_sweep,
+    run_sweep,
+    sweep_key,
+)
+from app.sidebar import get_selected_machine_id
 
-_APP_ROOT = Path(__file__).resolve().parents[1]
-_ASSETS_DIR = _APP_ROOT / "assets"
-_EXPERIMENTS_IMAGE = _ASSETS_DIR / "mist_extraction_experiments.png"
-_SAVINGS_IMAGE = _ASSETS_DIR / "mist_extraction_savings.png"
 
+_EXPERIMENTS_IMAGE = "mist_extraction_experiments.png"
+_SAVINGS_IMAGE = "mist_extraction_savings.png"
 
-def _image_data_uri(path: Path) -> str:
-    with path.open("rb") as image_file:
-        encoded = base64.b64encode(image_file.read()).decode("utf-8")
-    return f"data:image/png;base64,{encoded}"
+_DURATIONS = {
+    "1 hour": 3600.0,
+    "1 shift (8 hours)": 8 * 3600.0,
+}
 
 
-def _render_image_panel(path: Path, alt_text: str) -> None:
+def _render_image_panel(name: str, alt_text: str) -> None:
+    # Served from static/ with browser caching instead of a data URI in every rerun.
     st.markdown(
         f"""
 <div class="savings-image-panel">
-  <img src="{_image_data_uri(path)}" alt="{alt_text}" />
+  <img src="{static_url(name)}" alt="{alt_text}" />
 </div>
 """,
         unsafe_allow_html=True,
     )
 
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def _operating_point(rise_rate, fall_rate, on_threshold, off_threshold, min_run_time):
+    """One 8-hour shift at the given settings; deterministic, so shared by all reruns and sessions."""
+    return evaluate_strategies(
+        rise_rate, fall_rate, on_threshold, off_threshold, duration=8 * 3600.0, min_run_time=min_run_time,
+    )
+
+
+def _render_operating_point():
+    machine_id = get_selected_machine_id()
+    metadata = data_service.get_control_metadata_snapshot(machine_id)
+    result = _operating_point(
+        metadata["pm10_rise_rate"],
+        metadata["pm10_fall_rate"],
+        metadata["on_threshold"],
+        metadata["off_threshold"],
+        metadata["min_run_time"],
+    )
+
+    st.subheader(f"Current operating point ({machine_id})")
+    st.caption(
+        f"Rise rate {result['rise_rate']:.2f} mg/m3/s, fall rate {result['fall_rate']:.2f} mg/m3/s, "
+        f"thresholds {result['off_threshold']:.2f}/{result['on_threshold']:.2f} mg/m3, "
+        f"minimum run time {metadata['min_run_time']:.0f} s, simulated over one 8-hour shift."
+    )
+    col_on, col_two_point, col_savings = st.columns(3)
+    col_on.metric("Always-on extractor", f"{result['always_on_wh'] / 1000:.2f} kWh")
+    col_two_point.metric("Two-point control", f"{result['two_point_wh'] / 1000:.2f} kWh")
+    col_savings.metric("Savings", f"{result['savings_percent']:.1f} %")
+
+
+def _sweep_settings():
+    col_rise, col_fall, col_band = st.columns(3)
+    with col_rise:
+        rise_range = st.slider("Rise rates [mg/m3/s]", 0.01, 0.50, (0.01, 0.50), 0.01, key="sweep_rise_range")
+        rise_steps = st.number_input("Rise rate steps", 2, 50, 20, key="sweep_rise_steps")
+    with col_fall:
+        fall_range = st.slider("Fall rates [mg/m3/s]", 0.05, 1.00, (0.05, 1.00), 0.01, key="sweep_fall_range")
+        fall_steps = st.number_input("Fall rate steps", 2, 50, 20, key="sweep_fall_steps")
+    with col_band:
+        on_thresholds = st.multiselect(
+            "Switch-on thresholds [mg/m3]", [2.5, 3.0, 3.5, 4.0], [3.0, 3.5], key="sweep_on_thresholds"
+        )
+        off_thresholds = st.multiselect(
+            "Switch-off thresholds [mg/m3]", [1.0, 1.5, 2.0, 2.5], [1.5, 2.0], key="sweep_off_thresholds"
+        )
+    duration_label = st.selectbox("Simulated time per grid point", list(_DURATIONS), key="sweep_duration")
+
+    grid = build_grid(
+        np.round(np.linspace(*rise_range, int(rise_steps)), 4),
+        np.round(np.linspace(*fall_range, int(fall_steps)), 4),
+        [(on, off) for on in on_thresholds for off in off_thresholds],
+    )
+    return grid, _DURATIONS[duration_label]
+
+
+def _render_sweep_results(result):
+    results_df = pd.DataFrame(result)
+    bands = results_df[["on_threshold", "off_threshold"]].drop_duplicates()
+    band_labels = {
+        f"{row.off_threshold:.1f} / {row.on_threshold:.1f} mg/m3": (row.on_threshold, row.off_threshold)
+        for row in bands.itertuples()
+    }
+    band_label = st.selectbox("Threshold band (off / on)", list(band_labels), key="sweep_band")
+    on_threshold, off_threshold = band_labels[band_label]
+    band_df = results_df[
+        (results_df["on_threshold"] == on_threshold) & (results_df["off_threshold"] == off_threshold)
+    ]
+    savings = band_df.pivot(index="fall_rate", columns="rise_rate", values="savings_percent")
+
+    fig = go.Figure(go.Heatmap(
+        x=savings.columns,
+        y=savings.index,
+        z=savings.values,
+        colorscale=[[0.0, COLOR_PALETTE["Red"]], [0.5, COLOR_PALETTE["Yellow"]], [1.0, COLOR_PALETTE["Dark Green"]]],
+        zmin=0,
+        zmax=100,
+        colorbar=dict(title="Savings [%]"),
+        hovertemplate="Rise %{x:.2f} / Fall %{y:.2f} mg/m3/s<br>Savings %{z:.1f} %<extra></extra>",
+    ))
+    fig.update_layout(
+        height=450,
+        paper_bgcolor='white',
+        plot_bgcolor='rgba(250, 250, 250, 0.5)',
+        margin=dict(l=10, r=10, t=30, b=30),
+        xaxis=dict(title="Pollution rate (PM10 rise) [mg/m3/s]"),
+        yaxis=dict(title="Extraction efficiency (PM10 fall) [mg/m3/s]"),
+    )
+    st.plotly_chart(fig, use_container_width=True, key="savings_heatmap")
+
+    with st.expander("Sweep results"):
+        st.dataframe(results_df, use_container_width=True, hide_index=True)
+
+
+def _render_parameter_sweep():
+    st.subheader("Parameter sweep: always-on vs. two-point control")
+    grid, duration = _sweep_settings()
+    st.caption(f"{len(grid)} grid points")
+
+    key = sweep_key(grid, duration, 1.0, 0)
+    result = load_cached_sweep(key)
+    if result is None and grid:
+        if st.button("Compute savings", type="primary", key="sweep_button"):
+            progress = st.progress(0.0, text="Simulating grid points...")
+            for done, total, result in run_sweep(grid, duration=duration):
+                progress.progress(done / total, text=f"Simulated {done} of {total} grid points")
+            progress.empty()
+
+    if result is not None:
+        _render_sweep_results(result)
+    elif not grid:
+        st.info("Select at least one threshold band with switch-off below switch-on.")
+
+
 def render_mist_extractor_savings():
     st.header("Energy savings for demand-oriented mist extraction")
     st.markdown(
@@ -50,12 +174,22 @@ def render_mist_extractor_savings():
 """,
         unsafe_allow_html=True,
     )
-    st.markdown(
-        """
+
+    _render_operating_point()
+
+    st.divider()
+
+    _render_parameter_sweep()
+
+    st.divider()
+
+    with st.expander("Reference measurements"):
+        st.markdown(
+            """
 - Figure 1: Control strategies based on the two-point controller used in the energy savings concept
 - Figure 2: Energy savings achieved using the control strategies
 """
-    )
+        )
 
-    _render_image_panel(_EXPERIMENTS_IMAGE, "Control strategies based on the two-point controller")
-    _render_image_panel(_SAVINGS_IMAGE, "Energy savings achieved using the control strategies")
+        _render_image_panel(_EXPERIMENTS_IMAGE, "Control strategies based on the two-point controller")
+        _render_image_panel(_SAVINGS_IMAGE, "Energy savings achieved using the control strategies")
@@ -1,22 +1,160 @@
-import random
+import asyncio
+import atexit
+import logging
+import math
 import time
 import threading
 from datetime import datetime
-from collections import deque
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+import numpy as np
+import orjson
 import uvicorn
 
+from app.config import (
+    DEFAULT_MACHINE_ID,
+    FLEET_MACHINE_IDS,
+    HISTORY_CAPACITY,
+    HISTORY_STORE_DIR,
+    HISTORY_STORE_MAX_BYTES,
+    HISTORY_STORE_MAX_SECONDS,
+    HISTORY_WINDOW,
+    INGEST_STORE_DIR,
+    INGEST_STORE_MAX_BYTES,
+    REPLAY_DIR,
+    SHARED_STATE_MAX_MACHINES,
+    SHARED_STATE_NAME,
+    SHARED_STATE_ROLE,
+    SHIFT_START_HOURS,
+)
+from app.services import metrics
+from app.services.fleet import DEFAULT_FALL_RATE, DEFAULT_RISE_RATE, MachineFleet
+from app.services.health import ApiHealth
+from app.services.ingest import OVERFLOW_POLICIES, STALE_AFTER, IngestQueue, IngestRecorder, IngestWorker
+from app.services.history_buffer import HISTORY_CHANNELS, HistoryBuffer, columns_to_records
+from app.services.downsampling import downsample_columns
+from app.services.energy import EnergyMeter
+# export and replay import pandas/pyarrow/openpyxl on first use, so the API-only server
+# (uvicorn app.services.data_service:app) starts without them.
+from app.services.export import (
+    EXPORT_CHUNK_ROWS,
+    EXPORT_FORMATS,
+    excel_sheet_title,
+    iter_csv,
+    iter_pages,
+    iter_parquet,
+    iter_xlsx,
+)
+from app.services.optimizer import STARTUP_ENERGY_WH, optimize_thresholds
+from app.services.replay import CHUNK_ROWS, ReplaySource
+from app.services.rollups import RollupSet, select_resolution
+from app.services.scheduler import CATCH_UP_POLICIES, DEFAULT_RATE_HZ, MAX_RATE_HZ, MIN_RATE_HZ, TickScheduler
+from app.services.shared_state import (
+    POLL_INTERVAL,
+    SHARED_ROLES,
+    CommandClient,
+    SharedStateReader,
+    SharedStateWriter,
+    writer_command,
+)
+from app.services.simulation import POWER_LEVELS
+from app.services.snapshots import ServiceSnapshot
+from app.services.sources import BrokerSource, LocalBroker, SensorSource
+from app.services.streaming import SnapshotBroadcaster
+from app.services.tick_notifier import TickNotifier
+from app.services.timeseries_store import TimeSeriesStore
+
 
 class PM10RatesCommand(BaseModel):
     rise_rate: float = Field(..., ge=0.01, le=0.50)
     fall_rate: float = Field(..., ge=0.05, le=1.00)
+    machine_id: str = DEFAULT_MACHINE_ID
     source: str = "REST API"
 
 
 class ResetCommand(BaseModel):
+    machine_id: str | None = None  # None resets the whole fleet
+    source: str = "REST API"
+
+
+class ThresholdsCommand(BaseModel):
+    on_threshold: float = Field(..., gt=0.0, le=10.0)
+    off_threshold: float = Field(..., ge=0.0, le=10.0)
+    min_run_time: float = Field(0.0, ge=0.0, le=3600.0)
+    machine_id: str = DEFAULT_MACHINE_ID
+    source: str = "REST API"
+
+    @model_validator(mode="after")
+    def check_band(self):
+        if self.off_threshold >= self.on_threshold:
+            raise ValueError("off_threshold must be below on_threshold")
+        return self
+
+
+class OptimizeCommand(BaseModel):
+    machine_id: str = DEFAULT_MACHINE_ID
+    rise_rate: float | None = Field(None, ge=0.01, le=0.50)  # None: current machine rate
+    fall_rate: float | None = Field(None, ge=0.05, le=1.00)
+    max_pm10: float | None = Field(None, gt=0.0)
+    max_twa: float | None = Field(None, gt=0.0)
+    duration: float = Field(8 * 3600.0, ge=600.0, le=7 * 24 * 3600.0)
+    startup_energy_wh: float = Field(STARTUP_ENERGY_WH, ge=0.0, le=100.0)
+
+
+class MachineCommand(BaseModel):
+    machine_id: str = Field(..., min_length=1, max_length=64)
+    rise_rate: float = Field(DEFAULT_RISE_RATE, ge=0.01, le=0.50)
+    fall_rate: float = Field(DEFAULT_FALL_RATE, ge=0.05, le=1.00)
+    source: str = "REST API"
+
+
+class MachinesCommand(BaseModel):
+    machine_ids: list[str] = Field(..., min_length=1, max_length=10000)
+    rise_rate: float = Field(DEFAULT_RISE_RATE, ge=0.01, le=0.50)
+    fall_rate: float = Field(DEFAULT_FALL_RATE, ge=0.05, le=1.00)
+    source: str = "REST API"
+
+
+class IngestSample(BaseModel):
+    machine_id: str
+    values: dict[str, bool | float]
+    timestamp: float | None = None
+
+
+class IngestCommand(BaseModel):
+    samples: list[IngestSample] = Field(..., max_length=100_000)
+
+
+class IngestSettingsCommand(BaseModel):
+    capacity: int | None = Field(None, ge=1, le=1_000_000)
+    policy: Literal[OVERFLOW_POLICIES] | None = None
+
+
+class SchedulerCommand(BaseModel):
+    rate_hz: float | None = Field(None, ge=MIN_RATE_HZ, le=MAX_RATE_HZ)
+    catch_up: Literal[CATCH_UP_POLICIES] | None = None
+    source: str = "REST API"
+
+
+class ReplayCommand(BaseModel):
+    path: str = Field(..., min_length=1)
+    machine_id: str = DEFAULT_MACHINE_ID
+    speed: float = Field(1.0, ge=0.0, le=10000.0)  # 0: maximum speed
+    channel_map: dict[str, str] | None = None
+    sheet: str | None = None
+    chunk_rows: int = Field(CHUNK_ROWS, ge=1, le=1_000_000)
+    loop: bool = False
+    simulate_controller: bool = False
     source: str = "REST API"
 
+
+logger = logging.getLogger(__name__)
+
+# A recorded extractor power above this counts as running.
+EXTRACTOR_ON_POWER = POWER_LEVELS["Mist extractor"][0] / 2
+
 class DataService:
     _instance = None
     _lock = threading.Lock()
@@ -31,37 +169,75 @@ class DataService:
     def __init__(self):
         if self._initialized:
             return
-        
-        self.history = deque(maxlen=300)  # 5 minutes
-        self.server_data = {
-            "Main supply": 0,
-            "Mist extractor": 0,
-            "Chip conveyor": 0,
-            "PM10": 0.0,
-            "mist_extractor_active": False,
-            "pm10_rise_rate": 0.05,
-            "pm10_fall_rate": 0.15,
-            "timestamp": ""
-        }
-        
-        # Simulation parameters
-        self._state_lock = threading.RLock()
-        self.pm10_value = 0.0
-        self.mist_active = False
-        self.pm10_rise_rate = 0.05
-        self.pm10_fall_rate = 0.15
+
+        if SHARED_STATE_ROLE not in SHARED_ROLES:
+            raise ValueError(f"Unknown shared state role '{SHARED_STATE_ROLE}', expected one of {SHARED_ROLES}")
+        # Simulation state: one entry per machine in the fleet arrays and one
+        # history column per machine.
+        self._state_lock = metrics.TimedLock(threading.RLock(), metrics.lock_wait, "state")
+        self.fleet = MachineFleet(FLEET_MACHINE_IDS)
+        # Writer processes keep the history in shared memory for the readers.
+        self._shared_writer = None
+        self._shared_reader = None
+        self.command_client = None  # reader processes forward commands to the writer
+        if SHARED_STATE_ROLE == "writer":
+            self._shared_writer = SharedStateWriter(
+                SHARED_STATE_NAME, HISTORY_CAPACITY, SHARED_STATE_MAX_MACHINES, len(self.fleet),
+            )
+            self.history = self._shared_writer.history
+        else:
+            self.history = HistoryBuffer(HISTORY_CAPACITY, width=len(self.fleet))
+        # Every tick is also written to disk; sequence numbers continue after
+        # a restart.
+        self.store = TimeSeriesStore(
+            HISTORY_STORE_DIR, read_only=SHARED_STATE_ROLE == "reader",
+            max_bytes=HISTORY_STORE_MAX_BYTES, max_seconds=HISTORY_STORE_MAX_SECONDS,
+        )
+        self.history.last_seq = self.store.last_seq
+        self.rollups = RollupSet(width=len(self.fleet))
+        self.energy = EnergyMeter(len(self.fleet), SHIFT_START_HOURS)
+        self._latest_tick = None
+        self._tick_notifier = TickNotifier()
+        self._broadcaster = SnapshotBroadcaster()
         self._api_started = False
+        self.api_health = ApiHealth()
         self._generator_started = False
+        self._replay = None
+        self._replay_machine_id = None
+        self._replay_simulate_controller = False
+        self._scheduler = TickScheduler(DEFAULT_RATE_HZ)
+        # Pushed sensor samples: sources -> bounded queue -> worker -> tick,
+        # and every sample with its own timestamp -> recorder -> disk.
+        self.ingest_queue = IngestQueue()
+        self.ingest_recorder = IngestRecorder(
+            INGEST_STORE_DIR, read_only=SHARED_STATE_ROLE == "reader",
+            max_bytes=INGEST_STORE_MAX_BYTES, max_seconds=HISTORY_STORE_MAX_SECONDS,
+        )
+        self.ingest_worker = IngestWorker(self.ingest_queue, recorder=self.ingest_recorder)
+        self.broker = LocalBroker()
+        self.sources = {}
+        self._rest_source = SensorSource("rest")
+        self.add_source(self._rest_source)
+        # Like ingest(), drop samples of machines that are not in the fleet.
+        self.add_source(BrokerSource("broker", self.broker, known=lambda machine_id: machine_id in self._snapshot))
         self.control_metadata = {
-            "last_command": None,
-            "last_command_timestamp": None,
-            "last_command_source": None,
-            "pm10_rise_rate": self.pm10_rise_rate,
-            "pm10_fall_rate": self.pm10_fall_rate,
+            machine_id: self._initial_control_metadata(index)
+            for index, machine_id in enumerate(self.fleet.ids)
         }
-        
+
+        self._published = None
+        self._snapshot_version = 0
+        if SHARED_STATE_ROLE == "reader":
+            self._shared_reader = SharedStateReader(SHARED_STATE_NAME)
+            self.command_client = CommandClient(self._shared_reader)
+        else:
+            self._publish_snapshot()
+        if self._shared_writer is not None:
+            self._shared_writer.serve_commands(self)
+
         self._initialized = True
         self.api_app = FastAPI()
+        self.api_app.add_middleware(metrics.RouteTimingMiddleware, histogram=metrics.request_latency)
         self._setup_routes()
 
     def _setup_routes(self):
@@ -69,32 +245,194 @@ class DataService:
         def start_api_data_generator():
             self.start_data_generator()
 
+        @self.api_app.on_event("startup")
+        async def start_api_health():
+            self.api_health.started()
+
+        @self.api_app.on_event("shutdown")
+        async def stop_api_health():
+            self.api_health.stopped()
+
+        @self.api_app.on_event("shutdown")
+        def close_shared_state():
+            # uvicorn ends with the re-raised signal, so atexit handlers may not run.
+            if self._shared_writer is not None:
+                self._shared_writer.close()
+
         @self.api_app.get("/health")
-        def get_health():
+        async def get_health():
+            health = self.api_health.status()
             return {
                 "status": "ok",
                 "service": "Factory-X Energy Savings external control",
                 "role": "optional demonstrator interface",
+                "uptime_s": health["uptime_s"],
+                "loop_latency_ms": health["latency_ms"],
             }
 
-        @self.api_app.get("/data")
-        def get_data():
-            return self.get_server_data_snapshot()
+        @self.api_app.get("/metrics", response_class=PlainTextResponse)
+        async def get_metrics():
+            return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
-        @self.api_app.get("/state")
-        def get_state():
+        @self.api_app.get("/machines")
+        async def get_machines(request: Request):
+            snapshot = self._snapshot
+            return self._json_response(request, snapshot, ("machines",), lambda: snapshot.states)
+
+        @self.api_app.post("/machines")
+        def post_machine(command: MachineCommand):
+            try:
+                self.add_machine(
+                    command.machine_id,
+                    command.rise_rate,
+                    command.fall_rate,
+                    source=command.source,
+                )
+            except ValueError as exc:
+                raise HTTPException(status_code=409, detail=str(exc))
             return {
-                "state": self.get_server_data_snapshot(),
-                "external_control": self.get_control_metadata_snapshot(),
+                "status": "ok",
+                "state": self.get_server_data_snapshot(command.machine_id),
+                "external_control": self.get_control_metadata_snapshot(command.machine_id),
             }
 
+        @self.api_app.post("/machines/bulk")
+        def post_machines(command: MachinesCommand):
+            try:
+                self.add_machines(command.machine_ids, command.rise_rate, command.fall_rate, source=command.source)
+            except ValueError as exc:
+                raise HTTPException(status_code=409, detail=str(exc))
+            return {"status": "ok", "machines": len(self.get_machine_ids())}
+
+        @self.api_app.get("/data")
+        async def get_data(request: Request, machine_id: str = DEFAULT_MACHINE_ID):
+            snapshot = self._snapshot_for(machine_id)
+            return self._json_response(
+                request, snapshot, ("data", machine_id),
+                lambda: snapshot.states[snapshot.index_of(machine_id)],
+            )
+
+        @self.api_app.get("/state")
+        async def get_state(request: Request, machine_id: str = DEFAULT_MACHINE_ID):
+            snapshot = self._snapshot_for(machine_id)
+            return self._json_response(request, snapshot, ("state", machine_id), lambda: {
+                "state": snapshot.states[snapshot.index_of(machine_id)],
+                "external_control": snapshot.metadata[machine_id],
+            })
+
         @self.api_app.get("/history")
-        def get_history():
-            return self.get_history_snapshot()
+        async def get_history(
+            request: Request,
+            machine_id: str = DEFAULT_MACHINE_ID,
+            limit: int | None = Query(None, ge=1, le=HISTORY_CAPACITY),
+            after: int | None = Query(None, ge=0, description="Only samples with seq > after"),
+            wait: float = Query(0.0, ge=0.0, le=60.0, description="Long-poll timeout in seconds"),
+            start: float | None = Query(None, alias="from", description="Range start (Unix epoch seconds)"),
+            end: float | None = Query(None, alias="to", description="Range end (Unix epoch seconds)"),
+            channels: str | None = Query(None, description="Comma-separated channel names"),
+            max_points: int | None = Query(None, ge=3, le=HISTORY_CAPACITY, description="Downsample to at most this many rows"),
+        ):
+            self._snapshot_for(machine_id)
+            if channels is not None:
+                channels = [name.strip() for name in channels.split(",") if name.strip()]
+                unknown = [name for name in channels if name not in HISTORY_CHANNELS]
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Unknown channels: {', '.join(unknown)}")
+            if max_points is not None and after is None:
+                snapshot = self._snapshot
+                columns, resolution = self.get_history_view(
+                    machine_id, max_points, start=start, end=end, limit=limit, channels=channels,
+                )
+                response = self._json_response(request, snapshot, None, lambda: columns_to_records(columns))
+                response.headers["X-History-Resolution"] = f"{resolution}s" if resolution else "raw"
+                return response
+            if start is not None or end is not None:
+                # Range queries are answered from the persistent store.
+                snapshot = self._snapshot
+                return self._json_response(request, snapshot, None, lambda: columns_to_records(self.get_history_range(
+                    machine_id, start, end, channels, after=after, limit=limit or HISTORY_CAPACITY,
+                )))
+            if after is not None and wait > 0:
+                await self.wait_for_seq(after, wait)
+            snapshot = self._snapshot
+            limit = limit or HISTORY_WINDOW
+            if max_points is not None:
+                limit = min(limit, max_points)
+            key = ("history", machine_id, limit, after, tuple(channels) if channels else None)
+            # Plain window requests are cached per tick; delta requests differ per client.
+            return self._json_response(
+                request, snapshot, key if after is None else None,
+                lambda: snapshot.history.to_records(snapshot.index_of(machine_id), limit, after, channels),
+            )
+
+        @self.api_app.get("/export")
+        def get_export(
+            machine_id: str = DEFAULT_MACHINE_ID,
+            format: str = Query("csv", pattern="^(csv|parquet|xlsx)$"),
+            start: float | None = Query(None, alias="from", description="Range start (Unix epoch seconds)"),
+            end: float | None = Query(None, alias="to", description="Range end (Unix epoch seconds)"),
+            channels: str | None = Query(None, description="Comma-separated channel names"),
+        ):
+            self._snapshot_for(machine_id)
+            if channels is not None:
+                channels = [name.strip() for name in channels.split(",") if name.strip()]
+                unknown = [name for name in channels if name not in HISTORY_CHANNELS]
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Unknown channels: {', '.join(unknown)}")
+            # Fix the end of open ranges so the export does not chase new ticks.
+            end = time.time() if end is None else end
+            filename = f"factoryx-{machine_id}-{int(start or 0)}-{int(end)}.{format}"
+            return StreamingResponse(
+                self.export_history(machine_id, format, start, end, channels),
+                media_type=EXPORT_FORMATS[format],
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            )
+
+        @self.api_app.get("/energy")
+        async def get_energy(request: Request, machine_id: str = DEFAULT_MACHINE_ID):
+            snapshot = self._snapshot_for(machine_id)
+            return self._json_response(
+                request, snapshot, ("energy", machine_id), lambda: self._energy_payload(snapshot, machine_id),
+            )
+
+        @self.api_app.get("/stream/sse")
+        async def stream_sse(machine_id: str = DEFAULT_MACHINE_ID):
+            if machine_id not in self._snapshot:
+                raise HTTPException(status_code=404, detail=f"Unknown machine '{machine_id}'")
+            return StreamingResponse(
+                self._sse_events(machine_id),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        @self.api_app.websocket("/stream/ws")
+        async def stream_ws(websocket: WebSocket, machine_id: str = DEFAULT_MACHINE_ID):
+            if machine_id not in self._snapshot:
+                await websocket.close(code=1008, reason=f"Unknown machine '{machine_id}'")
+                return
+            await websocket.accept()
+            subscription = self._broadcaster.subscribe(machine_id)
+            try:
+                await websocket.send_text(self._stream_payload(machine_id))
+                while (payload := await subscription.get()) is not None:
+                    await websocket.send_text(payload)
+            except WebSocketDisconnect:
+                pass
+            finally:
+                self._broadcaster.unsubscribe(subscription)
+
+        @self.api_app.get("/stream/stats")
+        async def get_stream_stats():
+            return {
+                "subscribers": self._broadcaster.subscriber_count(),
+                "disconnected_slow_consumers": self._broadcaster.disconnected,
+            }
 
         @self.api_app.post("/control/pm10-rates")
         def post_pm10_rates(command: PM10RatesCommand):
-            self.set_pm10_rates(
+            self._for_machine(
+                self.set_pm10_rates,
+                command.machine_id,
                 command.rise_rate,
                 command.fall_rate,
                 source=command.source,
@@ -102,103 +440,740 @@ class DataService:
             )
             return {
                 "status": "ok",
-                "state": self.get_server_data_snapshot(),
-                "external_control": self.get_control_metadata_snapshot(),
+                "state": self.get_server_data_snapshot(command.machine_id),
+                "external_control": self.get_control_metadata_snapshot(command.machine_id),
+            }
+
+        @self.api_app.post("/control/thresholds")
+        def post_thresholds(command: ThresholdsCommand):
+            self._for_machine(
+                self.set_thresholds,
+                command.machine_id,
+                command.on_threshold,
+                command.off_threshold,
+                command.min_run_time,
+                source=command.source,
+                command_name="set_thresholds",
+            )
+            return {
+                "status": "ok",
+                "state": self.get_server_data_snapshot(command.machine_id),
+                "external_control": self.get_control_metadata_snapshot(command.machine_id),
             }
 
+        @self.api_app.post("/optimize")
+        def post_optimize(command: OptimizeCommand):
+            metadata = self._for_machine(self.get_control_metadata_snapshot, command.machine_id)
+            result = optimize_thresholds(
+                command.rise_rate if command.rise_rate is not None else metadata["pm10_rise_rate"],
+                command.fall_rate if command.fall_rate is not None else metadata["pm10_fall_rate"],
+                max_pm10=command.max_pm10,
+                max_twa=command.max_twa,
+                duration=command.duration,
+                startup_energy_wh=command.startup_energy_wh,
+            )
+            return {"machine_id": command.machine_id, **result}
+
         @self.api_app.post("/control/reset")
         def post_reset(command: ResetCommand | None = None):
             source = command.source if command else "REST API"
-            self.reset_all_data(source=source, command_name="reset")
+            machine_id = command.machine_id if command else None
+            if machine_id is None:
+                self.reset_all_data(source=source, command_name="reset")
+                return {"status": "ok", "machines": self.get_fleet_snapshot()}
+            self._for_machine(
+                self.reset_all_data,
+                machine_id,
+                source=source,
+                command_name="reset",
+            )
             return {
                 "status": "ok",
-                "state": self.get_server_data_snapshot(),
-                "external_control": self.get_control_metadata_snapshot(),
+                "state": self.get_server_data_snapshot(machine_id),
+                "external_control": self.get_control_metadata_snapshot(machine_id),
             }
 
+        @self.api_app.get("/ingest")
+        async def get_ingest():
+            return self.get_ingest_status()
+
+        @self.api_app.post("/ingest")
+        def post_ingest(command: IngestCommand):
+            result = self.ingest([(sample.machine_id, sample.values, sample.timestamp) for sample in command.samples])
+            if result["discarded"] and self.get_ingest_status()["queue"]["policy"] == "block":
+                # Backpressure: the client should slow down and resend.
+                raise HTTPException(status_code=503, detail=result, headers={"Retry-After": "1"})
+            return result
+
+        @self.api_app.get("/ingest/history")
+        def get_ingest_history(
+            machine_id: str = DEFAULT_MACHINE_ID,
+            start: float | None = Query(None, alias="from"),
+            end: float | None = Query(None, alias="to"),
+            limit: int | None = Query(None, ge=1, le=HISTORY_CAPACITY),
+        ):
+            columns = self._for_machine(self.get_ingested_samples, machine_id, start=start, end=end, limit=limit)
+            body = orjson.dumps(columns_to_records(columns), option=orjson.OPT_SERIALIZE_NUMPY)
+            return Response(body, media_type="application/json")
+
+        @self.api_app.post("/control/ingest")
+        def post_ingest_settings(command: IngestSettingsCommand):
+            return self.configure_ingest(command.capacity, command.policy)
+
+        @self.api_app.get("/scheduler")
+        async def get_scheduler():
+            return self.get_scheduler_status()
+
+        @self.api_app.post("/control/scheduler")
+        def post_scheduler(command: SchedulerCommand):
+            try:
+                return self.set_scheduler(command.rate_hz, command.catch_up, source=command.source)
+            except ValueError as exc:
+                raise HTTPException(status_code=422, detail=str(exc))
+
+        @self.api_app.get("/replay")
+        async def get_replay():
+            return self.get_replay_status()
+
+        @self.api_app.post("/replay")
+        def post_replay(command: ReplayCommand):
+            try:
+                return self._for_machine(
+                    self.start_replay,
+                    command.machine_id,
+                    command.path,
+                    speed=command.speed,
+                    channel_map=command.channel_map,
+                    sheet=command.sheet,
+                    chunk_rows=command.chunk_rows,
+                    loop=command.loop,
+                    simulate_controller=command.simulate_controller,
+                    source=command.source,
+                )
+            except ValueError as exc:
+                raise HTTPException(status_code=422, detail=str(exc))
+
+        @self.api_app.post("/replay/stop")
+        def post_replay_stop():
+            return self.stop_replay(source="REST API")
+
+    def _for_machine(self, method, machine_id, *args, **kwargs):
+        """Calls a per-machine service method and maps unknown ids to HTTP 404."""
+        if machine_id not in self._snapshot:
+            raise HTTPException(status_code=404, detail=f"Unknown machine '{machine_id}'")
+        return method(*args, machine_id=machine_id, **kwargs)
+
+    @property
+    def _snapshot(self):
+        """The published snapshot (the writer's, read from shared memory, in reader processes)."""
+        reader = self._shared_reader
+        return self._published if reader is None else reader.snapshot()
+
+    def _snapshot_for(self, machine_id):
+        """Returns the current snapshot, or raises 404 if it has no such machine."""
+        snapshot = self._snapshot
+        if machine_id not in snapshot:
+            raise HTTPException(status_code=404, detail=f"Unknown machine '{machine_id}'")
+        return snapshot
+
+    @staticmethod
+    def _json_response(request, snapshot, key, build):
+        """Serves ``build()`` as JSON with the snapshot's ETag.
+
+        Answers 304 if the client already has this snapshot's version. With a
+        ``key`` the encoded body is cached on the snapshot for later requests.
+        """
+        etag = snapshot.etag
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        def encode():
+            return orjson.dumps(build(), option=orjson.OPT_SERIALIZE_NUMPY)
+
+        body = encode() if key is None else snapshot.payload(key, encode)
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    async def _sse_events(self, machine_id, keepalive_seconds=15.0):
+        subscription = self._broadcaster.subscribe(machine_id)
+        try:
+            yield f"event: sample\ndata: {self._stream_payload(machine_id)}\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscription.get(), keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload is None:
+                    break
+                yield f"event: sample\ndata: {payload}\n\n"
+        finally:
+            self._broadcaster.unsubscribe(subscription)
+
+    def _stream_payload(self, machine_id):
+        snapshot = self._snapshot
+        return snapshot.payload(("stream", machine_id), lambda: orjson.dumps(snapshot.state(machine_id)).decode())
+
     def run_api(self):
-        uvicorn.run(self.api_app, host="127.0.0.1", port=8000, log_level="error")
+        try:
+            uvicorn.run(self.api_app, host="127.0.0.1", port=8000, log_level="error")
+        except SystemExit:  # uvicorn exits if it cannot bind the port
+            self.api_health.stopped(error="could not start the API on 127.0.0.1:8000")
 
     def data_generator(self):
-        last_tick = time.monotonic()
+        scheduler = self._scheduler
         while True:
-            now = time.monotonic()
-            elapsed_seconds = max(0.0, min(now - last_tick, 2.0))
-            last_tick = now
+            try:
+                replay = self._replay
+                if replay is not None and not replay.finished and not replay.stopped:
+                    self._replay_tick(replay)
+                    # The recording sets the pace; the schedule restarts afterwards.
+                    scheduler.restart()
+                    continue
+                # Waits for the next deadline; returns early for a rate change or replay.
+                ticks, lateness = scheduler.next_ticks()
+                if not ticks:
+                    continue
+                metrics.tick_drift.observe(lateness)
+                self.tick(scheduler.period, ticks=ticks)
+            except Exception:
+                # This is the only generator thread; a failed tick must not stop the simulation.
+                logger.exception("Tick failed, the data generator continues")
+                time.sleep(scheduler.period)
 
+    def _replay_tick(self, replay):
+        """Feeds the next recorded row into the state and history path."""
+        try:
+            sample = replay.next_sample()
+        except Exception as exc:  # malformed row, recording deleted meanwhile
+            replay.fail(exc)
+            with self._state_lock:
+                self._record_control_command(self._replay_machine_id, "replay_failed", "Replay")
+                self._publish_snapshot()
+            return
+        if sample is None:
             with self._state_lock:
-                rise_rate = self.pm10_rise_rate
-                fall_rate = self.pm10_fall_rate
-
-                # Two-point controller logic. The slider values are maximum
-                # rates per second, so the random factor never exceeds 1.0.
-                if not self.mist_active:
-                    # Phase: Pollution (Extraction OFF)
-                    self.pm10_value += rise_rate * elapsed_seconds * random.uniform(0.9, 1.0)
-                    if self.pm10_value >= 3.0:
-                        self.pm10_value = 3.0
-                        self.mist_active = True
-                else:
-                    # Phase: Cleaning (Extraction ON)
-                    self.pm10_value -= fall_rate * elapsed_seconds * random.uniform(0.9, 1.0)
-                    if self.pm10_value <= 2.0:
-                        self.pm10_value = 2.0
-                        self.mist_active = False
-
-                self.pm10_value = max(0.0, round(self.pm10_value, 4))
-
-                snapshot = {
-                    "timestamp": datetime.now().strftime("%H:%M:%S"),
-                    "Main supply": 4200 + random.randint(-50, 50),
-                    "Mist extractor": (385 + random.randint(-5, 5)) if self.mist_active else 0,
-                    "Chip conveyor": 260 + random.randint(-10, 10),
-                    "PM10": self.pm10_value,
-                    "mist_extractor_active": self.mist_active,
-                    "pm10_rise_rate": rise_rate,
-                    "pm10_fall_rate": fall_rate,
-                }
-                self.server_data.update(snapshot)
-                self.history.append(snapshot.copy())
-            
-            time.sleep(1)
-
-    def _record_control_command(self, command_name, source):
-        self.control_metadata.update({
+                self._record_control_command(self._replay_machine_id, "replay_finished", "Replay")
+                self._publish_snapshot()
+            return
+        elapsed_seconds, values = sample
+        with self._state_lock:
+            if self._replay is not replay or self._replay_machine_id not in self.fleet:
+                return
+            measurements = {self.fleet.index_of(self._replay_machine_id): (values, self._replay_simulate_controller)}
+        self.tick(elapsed_seconds, measurements)
+        delay = replay.delay(elapsed_seconds)
+        # Maximum speed still yields the GIL to readers between rows.
+        time.sleep(delay if delay > 0 else 0)
+
+    def tick(self, elapsed_seconds, measurements=None, ticks=1):
+        """Advances the fleet by one tick and publishes the new sample.
+
+        ``measurements`` maps machine indices to ``(values, simulate_controller)``
+        with recorded channel values that replace the simulation of those
+        machines for this tick (see ``start_replay``); the latest pushed
+        sensor values (see ``ingest``) are added to them. ``ticks`` > 1
+        simulates that many intervals of ``elapsed_seconds`` in one batch
+        (catch-up after missed deadlines), stamped back from now, and
+        publishes once.
+        """
+        pushed = self.ingest_worker.current()
+        with metrics.tick_duration.time():
+            with self._state_lock:
+                if pushed:
+                    measurements = {
+                        **{
+                            self.fleet.index_of(machine_id): (values, False)
+                            for machine_id, values in pushed.items() if machine_id in self.fleet
+                        },
+                        **(measurements or {}),
+                    }
+                now = time.time()
+                for position in range(ticks):
+                    if not measurements:
+                        # One vectorized step advances every machine of the fleet.
+                        tick = self.fleet.step(elapsed_seconds)
+                    else:
+                        tick = self._measured_step(elapsed_seconds, measurements)
+                    timestamp = now - (ticks - 1 - position) * elapsed_seconds
+                    tick["time"] = timestamp
+                    tick["timestamp"] = self._format_timestamp(timestamp)
+                    seq = self.history.append(tick)
+                    self.rollups.add(tick)
+                    self.energy.add(tick, elapsed_seconds)
+                    self.store.append(seq, tick, self.fleet.ids)
+                self._latest_tick = tick
+                snapshot = self._publish_snapshot()
+            self._fan_out(snapshot)
+
+    def _fan_out(self, snapshot):
+        """Wakes long-polls and pushes the new sample to the stream subscribers."""
+        stream_payloads = {
+            machine_id: self._stream_payload(machine_id)
+            for machine_id in self._broadcaster.machine_ids()
+            if machine_id in snapshot
+        }
+        self._tick_notifier.notify()
+        self._broadcaster.publish(stream_payloads)
+
+    def _follow_shared_state(self):
+        """Reader processes: fans out the ticks the writer publishes."""
+        last_seq = self.get_last_seq()
+        while True:
+            time.sleep(POLL_INTERVAL)
+            snapshot = self._snapshot
+            if snapshot.seq != last_seq:
+                last_seq = snapshot.seq
+                self._fan_out(snapshot)
+
+    def _format_timestamp(self, timestamp):
+        """HH:MM:SS, with hundredths of a second above 1 Hz."""
+        moment = datetime.fromtimestamp(timestamp)
+        if self._scheduler.rate_hz > 1.0:
+            return moment.strftime("%H:%M:%S.%f")[:11]
+        return moment.strftime("%H:%M:%S")
+
+    def _measured_step(self, elapsed_seconds, measurements):
+        """Steps the fleet with measured values of some machines. Call with the state lock held."""
+        states = {}
+        for index, (values, simulate_controller) in measurements.items():
+            active = None
+            if not simulate_controller:
+                active = values.get("mist_extractor_active")
+                if active is None and "Mist extractor" in values:
+                    active = values["Mist extractor"] > EXTRACTOR_ON_POWER
+            states[index] = (values.get("PM10"), active)
+        tick = self.fleet.step(elapsed_seconds, states)
+        for index, (values, simulate_controller) in measurements.items():
+            for channel in POWER_LEVELS:
+                if channel in values and not (simulate_controller and channel == "Mist extractor"):
+                    tick[channel][index] = round(values[channel])
+        return tick
+
+    def _publish_snapshot(self):
+        """Builds a new immutable snapshot and publishes it. Call with the state lock held."""
+        with metrics.snapshot_publish.time():
+            snapshot = self._build_snapshot()
+            if self._shared_writer is not None:
+                self._shared_writer.publish(snapshot, {
+                    "scheduler": self.get_scheduler_status(),
+                    "replay": self.get_replay_status(),
+                    "ingest": self.get_ingest_status(),
+                    "api": self.get_api_status(),
+                })
+        self._published = snapshot  # atomic reference swap, readers take no lock
+        return snapshot
+
+    def _build_snapshot(self):
+        self._snapshot_version += 1
+        return ServiceSnapshot(
+            self.history.last_seq,
+            self._snapshot_version,
+            self.fleet.ids,
+            [self._machine_state(index) for index in range(len(self.fleet))],
+            {machine_id: dict(metadata) for machine_id, metadata in self.control_metadata.items()},
+            self.history.view(),
+            self.rollups.views(),
+            self.energy.view(),
+        )
+
+    def _initial_control_metadata(self, index):
+        return {
+            "last_command": None,
+            "last_command_timestamp": None,
+            "last_command_source": None,
+            **self._controller_settings(index),
+        }
+
+    def _controller_settings(self, index):
+        fleet = self.fleet
+        return {
+            "pm10_rise_rate": float(fleet.rise_rate[index]),
+            "pm10_fall_rate": float(fleet.fall_rate[index]),
+            "on_threshold": float(fleet.on_threshold[index]),
+            "off_threshold": float(fleet.off_threshold[index]),
+            "min_run_time": float(fleet.min_run_time[index]),
+        }
+
+    def _record_control_command(self, machine_id, command_name, source):
+        index = self.fleet.index_of(machine_id)
+        self.control_metadata[machine_id].update({
             "last_command": command_name,
             "last_command_timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "last_command_source": source,
-            "pm10_rise_rate": self.pm10_rise_rate,
-            "pm10_fall_rate": self.pm10_fall_rate,
+            **self._controller_settings(index),
         })
 
-    def set_pm10_rates(self, rise_rate, fall_rate, source="Streamlit UI", command_name="set_pm10_rates"):
+    def add_machine(self, machine_id, rise_rate=DEFAULT_RISE_RATE, fall_rate=DEFAULT_FALL_RATE,
+                    source="Streamlit UI"):
+        """Registers a new machine. Raises ValueError if the id is taken."""
+        self.add_machines([machine_id], rise_rate, fall_rate, source=source)
+
+    @writer_command
+    def add_machines(self, machine_ids, rise_rate=DEFAULT_RISE_RATE, fall_rate=DEFAULT_FALL_RATE,
+                     source="Streamlit UI"):
+        """Registers several machines at once (one resize, one snapshot). Raises ValueError if an id is taken."""
+        machine_ids = list(machine_ids)
+        with self._state_lock:
+            if self._shared_writer is not None:
+                self._shared_writer.check_width(len(self.fleet) + len(machine_ids))
+            first = self.fleet.add_machines(machine_ids, rise_rate, fall_rate)
+            self.history.add_columns(len(machine_ids))
+            self.rollups.add_columns(len(machine_ids))
+            self.energy.add_columns(len(machine_ids))
+            for index, machine_id in enumerate(machine_ids, first):
+                self.control_metadata[machine_id] = self._initial_control_metadata(index)
+                self._record_control_command(machine_id, "add_machine", source)
+            self._publish_snapshot()
+
+    def get_machine_ids(self):
+        return list(self._snapshot.machine_ids)
+
+    @writer_command
+    def set_pm10_rates(self, rise_rate, fall_rate, source="Streamlit UI", command_name="set_pm10_rates",
+                       machine_id=DEFAULT_MACHINE_ID):
+        with self._state_lock:
+            self.fleet.set_rates(self.fleet.index_of(machine_id), rise_rate, fall_rate)
+            self._record_control_command(machine_id, command_name, source)
+            self._publish_snapshot()
+
+    @writer_command
+    def set_thresholds(self, on_threshold, off_threshold, min_run_time=0.0, source="Streamlit UI",
+                       command_name="set_thresholds", machine_id=DEFAULT_MACHINE_ID):
+        """Sets the two-point band of a machine. Raises ValueError if off >= on."""
+        with self._state_lock:
+            self.fleet.set_thresholds(self.fleet.index_of(machine_id), on_threshold, off_threshold, min_run_time)
+            self._record_control_command(machine_id, command_name, source)
+            self._publish_snapshot()
+
+    def _machine_state(self, index):
+        fleet = self.fleet
+        tick = self._latest_tick
+        state = {
+            "machine_id": fleet.ids[index],
+            "seq": self.history.last_seq,
+            "Main supply": 0,
+            "Mist extractor": 0,
+            "Chip conveyor": 0,
+            "PM10": round(float(fleet.pm10[index]), 4),
+            "mist_extractor_active": bool(fleet.active[index]),
+            **self._controller_settings(index),
+            "time": 0.0,
+            "timestamp": "",
+        }
+        if tick is not None and index < len(tick["PM10"]):
+            for channel in ("Main supply", "Mist extractor", "Chip conveyor"):
+                state[channel] = int(tick[channel][index])
+            state["time"] = tick["time"]
+            state["timestamp"] = tick["timestamp"]
+        return state
+
+    # Readers below work on the published snapshot and never take the state lock.
+
+    def get_server_data_snapshot(self, machine_id=DEFAULT_MACHINE_ID):
+        return self._snapshot.state(machine_id)
+
+    def get_fleet_snapshot(self):
+        """Returns the current state of every machine."""
+        return [dict(state) for state in self._snapshot.states]
+
+    def get_history_snapshot(self, limit=None, machine_id=DEFAULT_MACHINE_ID, after=None):
+        """Returns the history as a dict of column arrays (oldest first)."""
+        snapshot = self._snapshot
+        return snapshot.history.snapshot(snapshot.index_of(machine_id), limit, after=after)
+
+    def get_history_records(self, limit=None, machine_id=DEFAULT_MACHINE_ID, after=None, channels=None):
+        snapshot = self._snapshot
+        return snapshot.history.to_records(snapshot.index_of(machine_id), limit, after, channels)
+
+    def get_history_range(self, machine_id=DEFAULT_MACHINE_ID, start=None, end=None, channels=None,
+                          after=None, limit=None):
+        """Returns the samples of one machine between two Unix timestamps.
+
+        Reads the persistent store, which survives resets and restarts, and
+        adds the ticks the background writer has not flushed yet from memory.
+        """
+        names = list(HISTORY_CHANNELS if channels is None else channels)
+        queried = list(dict.fromkeys(["seq", "time", *names]))
+        flushed_seq = self.store.last_seq
+        stored = self.store.query(machine_id, start, end, queried, after=after, limit=limit)
+        newest_seq = max(flushed_seq, after or 0, int(stored["seq"][-1]) if len(stored["seq"]) else 0)
+        snapshot = self._snapshot
+        recent = snapshot.history.snapshot(snapshot.index_of(machine_id), channels=queried, after=newest_seq)
+        in_range = np.ones(len(recent["time"]), dtype=bool)
+        if start is not None:
+            in_range &= recent["time"] >= start
+        if end is not None:
+            in_range &= recent["time"] <= end
+        columns = {name: np.concatenate((stored[name], recent[name][in_range])) for name in names}
+        if limit is not None:
+            columns = {name: values[:limit] for name, values in columns.items()}
+        return columns
+
+    def export_history(self, machine_id=DEFAULT_MACHINE_ID, format="csv", start=None, end=None, channels=None,
+                       chunk_rows=EXPORT_CHUNK_ROWS):
+        """Returns a generator with the encoded history of one machine (see ``app.services.export``).
+
+        The range is read from the store in pages of ``chunk_rows`` rows, so
+        memory use does not depend on its length and the tick thread is
+        never blocked.
+        """
+        names = list(HISTORY_CHANNELS if channels is None else channels)
+        pages = iter_pages(
+            lambda start, end, after, limit: self.get_history_range(
+                machine_id, start, end, list(dict.fromkeys(["seq", *names])), after=after, limit=limit,
+            ),
+            start, end, chunk_rows,
+        )
+        if format == "parquet":
+            return iter_parquet(pages, names, HISTORY_CHANNELS)
+        if format == "xlsx":
+            # Validated here, as the generator only runs once the response has started.
+            return iter_xlsx(pages, names, excel_sheet_title(machine_id))
+        return iter_csv(pages, names)
+
+    def get_history_view(self, machine_id=DEFAULT_MACHINE_ID, max_points=HISTORY_WINDOW, start=None, end=None,
+                         limit=None, channels=None, snapshot=None):
+        """Returns ``(columns, resolution)`` for a chart of at most ``max_points`` rows.
+
+        The window is either ``start``/``end`` (Unix seconds) or the newest
+        ``limit`` seconds. Windows with more samples than ``max_points`` are
+        read from the finest rollup resolution that fits (``resolution`` in
+        seconds, None for raw samples); rollup rows carry the mean under the
+        channel name plus ``_min``/``_max``/``_last`` and ``on_fraction``. If
+        the rollups do not cover the window, raw samples are reduced by LTTB.
+        The newest window is read from ``snapshot`` (default: the current one).
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+        index = snapshot.index_of(machine_id)
+        if start is None and end is None:
+            span = limit or HISTORY_WINDOW
+            resolution = select_resolution(span, max_points, snapshot.rollups)
+            if resolution is None:
+                # ``span`` is in seconds; above 1 Hz it holds more samples.
+                rate_hz = self.get_scheduler_status()["rate_hz"]
+                samples = min(HISTORY_CAPACITY, math.ceil(span * max(rate_hz, 1.0)))
+                columns = snapshot.history.snapshot(index, samples)
+                if len(columns["time"]):
+                    in_span = columns["time"] > columns["time"][-1] - span
+                    columns = {name: values[in_span] for name, values in columns.items()}
+            else:
+                columns = snapshot.rollups[resolution].snapshot(index, math.ceil(span / resolution))
+            return self._select_channels(downsample_columns(columns, max_points), channels), resolution
+
+        end_time = time.time() if end is None else end
+        start_time = end_time - HISTORY_CAPACITY if start is None else start
+        resolution = select_resolution(end_time - start_time, max_points, snapshot.rollups)
+        if resolution is not None:
+            columns = snapshot.rollups[resolution].snapshot(index)
+            if len(columns["time"]) and columns["time"][0] <= start_time:
+                in_range = (columns["time"] + resolution > start_time) & (columns["time"] <= end_time)
+                columns = {name: values[in_range] for name, values in columns.items()}
+                return self._select_channels(downsample_columns(columns, max_points), channels), resolution
+        columns = self.get_history_range(machine_id, start, end, limit=limit or None)
+        return self._select_channels(downsample_columns(columns, max_points), channels), None
+
+    @staticmethod
+    def _select_channels(columns, channels):
+        if channels is None:
+            return columns
+        return {name: values for name, values in columns.items() if name in channels}
+
+    @staticmethod
+    def _energy_payload(snapshot, machine_id):
+        return {"machine_id": machine_id, "seq": snapshot.seq, **snapshot.energy.summary(snapshot.index_of(machine_id))}
+
+    def get_energy_snapshot(self, machine_id=DEFAULT_MACHINE_ID):
+        """Returns the energy counters of one machine (since reset, shift, rolling windows)."""
+        return self._energy_payload(self._snapshot, machine_id)
+
+    def get_last_seq(self):
+        """Sequence number of the most recent tick (0 before the first tick)."""
+        return self._snapshot.seq
+
+    async def wait_for_seq(self, after, timeout):
+        """Waits until a tick newer than ``after`` exists or ``timeout`` passes."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.get_last_seq() <= after:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await self._tick_notifier.wait(remaining):
+                return False
+        return True
+
+    def get_latest_sample(self, machine_id=DEFAULT_MACHINE_ID):
+        snapshot = self._snapshot
+        return snapshot.history.latest(snapshot.index_of(machine_id))
+
+    def get_control_metadata_snapshot(self, machine_id=DEFAULT_MACHINE_ID):
+        return dict(self._snapshot.metadata[machine_id])
+
+    def get_view(self, key, build, snapshot=None):
+        """Returns ``build(snapshot)`` memoized on ``snapshot`` (default: the current one) under ``key``.
+
+        Derived views (chart windows, serialized figures) are built once per
+        tick and shared read-only by all UI sessions; they are dropped with
+        the snapshot when the next one is published. ``build`` must read
+        only from the snapshot it is given, or a view cached for one tick
+        could hold data of the next.
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+        return snapshot.payload(("view", *key), lambda: build(snapshot))
+
+    @writer_command
+    def reset_all_data(self, source="Streamlit UI", command_name="reset", machine_id=None):
+        """Resets one machine, or the whole fleet if ``machine_id`` is None."""
         with self._state_lock:
-            self.pm10_rise_rate = float(rise_rate)
-            self.pm10_fall_rate = float(fall_rate)
-            self.server_data["pm10_rise_rate"] = self.pm10_rise_rate
-            self.server_data["pm10_fall_rate"] = self.pm10_fall_rate
-            self._record_control_command(command_name, source)
+            if machine_id is None:
+                self.history.clear()
+                self.rollups.clear()
+                self.energy.reset()
+                self.fleet.reset()
+                for fleet_machine_id in self.fleet.ids:
+                    self._record_control_command(fleet_machine_id, command_name, source)
+                self._publish_snapshot()
+                return
+            index = self.fleet.index_of(machine_id)
+            self.history.clear(index)
+            self.rollups.clear(index)
+            self.energy.reset(index)
+            self.fleet.reset(index)
+            self._record_control_command(machine_id, command_name, source)
+            self._publish_snapshot()
+
+    def add_source(self, source):
+        """Connects a push source to the ingest queue. Raises ValueError if the name is taken."""
+        if source.name in self.sources:
+            raise ValueError(f"Source '{source.name}' is already registered")
+        self.sources[source.name] = source
+        source.start(self.ingest_queue)
+
+    def remove_source(self, name):
+        self.sources.pop(name).stop()
+
+    @writer_command
+    def ingest(self, samples):
+        """Pushes ``(machine_id, values, timestamp)`` samples through the REST source.
+
+        Returns the counts of accepted and discarded samples and of samples
+        for unknown machines (not queued).
+        """
+        samples = list(samples)
+        accepted = discarded = unknown = 0
+        fleet_ids = set(self._snapshot.machine_ids)
+        for position, (machine_id, values, timestamp) in enumerate(samples):
+            if machine_id not in fleet_ids:
+                unknown += 1
+            elif self._rest_source.push(machine_id, values, timestamp):
+                accepted += 1
+            else:
+                discarded += 1
+                if self.ingest_queue.policy == "block":
+                    # The queue stayed full for a whole timeout; refuse the rest at once.
+                    discarded += len(samples) - position - 1
+                    break
+        return {"accepted": accepted, "discarded": discarded, "unknown_machine": unknown}
 
-    def get_server_data_snapshot(self):
+    def get_ingested_samples(self, machine_id=DEFAULT_MACHINE_ID, start=None, end=None, channels=None, limit=None):
+        """Returns the pushed samples of one machine between two Unix timestamps, at their own timestamps.
+
+        Unlike the history, which keeps one value per tick, these are all
+        samples the ingest worker recorded; the last ``flush_interval``
+        seconds are not on disk yet.
+        """
+        self._snapshot.index_of(machine_id)
+        return self.ingest_recorder.query(machine_id, start, end, channels, limit=limit or HISTORY_CAPACITY)
+
+    @writer_command
+    def configure_ingest(self, capacity=None, policy=None):
+        """Sets capacity and overflow policy of the ingest queue. Raises ValueError if invalid."""
+        self.ingest_queue.configure(capacity, policy)
         with self._state_lock:
-            return self.server_data.copy()
+            self._publish_snapshot()
+        return self.get_ingest_status()
 
-    def get_history_snapshot(self):
+    def get_ingest_status(self):
+        if self._shared_reader is not None:
+            return self._shared_reader.status()["ingest"]
+        return {
+            "queue": self.ingest_queue.stats(),
+            "worker": self.ingest_worker.stats(),
+            "stale_after_s": STALE_AFTER,
+            "pushing_machines": sorted(self.ingest_worker.current()),
+            "sources": [source.status() for source in list(self.sources.values())],
+        }
+
+    @writer_command
+    def set_scheduler(self, rate_hz=None, catch_up=None, source="Streamlit UI"):
+        """Sets the tick rate (Hz) and catch-up policy. Raises ValueError if out of range."""
         with self._state_lock:
-            return list(self.history)
+            self._scheduler.configure(rate_hz, catch_up)
+            for machine_id in self.fleet.ids:
+                self._record_control_command(machine_id, "set_scheduler", source)
+            self._publish_snapshot()
+        return self.get_scheduler_status()
+
+    def get_api_status(self):
+        """Returns the health of the REST API (see ``ApiHealth.status``) without a request to it."""
+        if self._shared_reader is not None:
+            return self._shared_reader.status()["api"]
+        return self.api_health.status()
 
-    def get_control_metadata_snapshot(self):
+    def get_scheduler_status(self):
+        if self._shared_reader is not None:
+            return self._shared_reader.status()["scheduler"]
+        return self._scheduler.status()
+
+    @writer_command
+    def start_replay(self, path, machine_id=DEFAULT_MACHINE_ID, speed=1.0, channel_map=None, sheet=None,
+                     chunk_rows=CHUNK_ROWS, loop=False, simulate_controller=False, source="Streamlit UI"):
+        """Replays a recorded CSV/Excel file into one machine, replacing a running replay.
+
+        The recorded channels go through the same tick, history, store and
+        energy path as the simulation. With ``simulate_controller`` the
+        recorded extractor state is ignored and the machine's two-point
+        controller switches on the recorded PM10. ``path`` is relative to
+        ``REPLAY_DIR``. Raises ValueError if the file or mapping is unusable
+        or the path leaves that directory, and KeyError for unknown machines.
+        """
+        replay = ReplaySource(path, channel_map, speed, chunk_rows, sheet, loop, directory=REPLAY_DIR)
         with self._state_lock:
-            return self.control_metadata.copy()
+            self.fleet.index_of(machine_id)
+            if self._replay is not None:
+                self._replay.stop()
+            self._replay = replay
+            self._replay_machine_id = machine_id
+            self._replay_simulate_controller = simulate_controller
+            self._record_control_command(machine_id, "start_replay", source)
+            self._publish_snapshot()
+        self._scheduler.wake()
+        return self.get_replay_status()
 
-    def reset_all_data(self, source="Streamlit UI", command_name="reset"):
+    @writer_command
+    def stop_replay(self, source="Streamlit UI"):
+        """Stops the running replay; the simulation takes over again."""
         with self._state_lock:
-            self.history.clear()
-            self.pm10_value = 0.0
-            self.mist_active = False
-            self.server_data["PM10"] = 0.0
-            self.server_data["mist_extractor_active"] = False
-            self._record_control_command(command_name, source)
+            if self._replay is None:
+                return self.get_replay_status()
+            self._replay.stop()
+            self._record_control_command(self._replay_machine_id, "stop_replay", source)
+            self._publish_snapshot()
+        return self.get_replay_status()
+
+    def get_replay_status(self):
+        if self._shared_reader is not None:
+            return self._shared_reader.status()["replay"]
+        replay = self._replay
+        if replay is None:
+            return {"active": False}
+        return {
+            "active": not (replay.finished or replay.stopped),
+            "machine_id": self._replay_machine_id,
+            "simulate_controller": self._replay_simulate_controller,
+            **replay.status(),
+        }
 
     def start_api(self):
         with self._lock:
@@ -212,10 +1187,19 @@ class DataService:
             if self._generator_started:
                 return
             self._generator_started = True
+        if self._shared_reader is not None:
+            threading.Thread(target=self._follow_shared_state, daemon=True).start()
+            return
+        self.store.start()
+        atexit.register(self.store.stop)
+        self.ingest_worker.start()
+        atexit.register(self.ingest_worker.stop)
         threading.Thread(target=self.data_generator, daemon=True).start()
 
     def start_background_tasks(self):
-        self.start_api()
+        # Reader processes leave the API port to the writer process.
+        if self._shared_reader is None:
+            self.start_api()
         self.start_data_generator()
 
 # Global instance
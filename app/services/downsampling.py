@@ -0,0 +1,54 @@
+"""Largest-Triangle-Three-Buckets (LTTB) downsampling for chart data.
+
+LTTB keeps the first and last point and, for every bucket in between, the
+point that spans the largest triangle with the previously kept point and the
+mean of the next bucket. Peaks and switching edges survive, unlike plain
+decimation.
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """Returns the indices of the ``threshold`` points LTTB keeps."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    # Bucket edges of the points between the first and the last one.
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = count - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        mean_x = x[stop:next_stop].mean()
+        mean_y = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[selected] - mean_x) * (y[start:stop] - y[selected])
+            - (x[selected] - x[start:stop]) * (mean_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def downsample_columns(columns, max_points, y="PM10", x="time"):
+    """Reduces a dict of column arrays to ``max_points`` rows.
+
+    The rows are picked by LTTB on channel ``y`` (the first numeric channel
+    if ``y`` is missing), so all channels keep the same rows.
+    """
+    if max_points is None or len(columns.get(x, ())) <= max_points:
+        return columns
+    if y not in columns:
+        y = next(
+            name for name, values in columns.items()
+            if name not in ("seq", x) and np.issubdtype(values.dtype, np.number)
+        )
+    indices = lttb_indices(columns[x], columns[y], max_points)
+    return {name: values[indices] for name, values in columns.items()}
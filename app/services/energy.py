@@ -0,0 +1,189 @@
+"""Incremental energy accounting for the machine fleet.
+
+Every tick adds ``power * elapsed`` to per-consumer Wh counters (one column
+per machine) since the last reset, for the current shift and for rolling
+windows. Next to the measured consumers the meter integrates an always-on
+baseline for the mist extractor (nominal power, continuously), so the savings
+of the two-point control are known at any time without scanning the
+history. Rolling windows keep a ring of time buckets with a running sum, so
+their cost per tick is constant as well; a window is exact to one bucket
+(1/60 of its length).
+"""
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.simulation import POWER_LEVELS
+
+
+CONSUMERS = tuple(POWER_LEVELS)
+EXTRACTOR = "Mist extractor"
+EXTRACTOR_BASELINE_POWER = POWER_LEVELS[EXTRACTOR][0]  # W, always-on reference
+ENERGY_WINDOWS = {"15 min": 15 * 60, "1 h": 60 * 60, "8 h": 8 * 60 * 60}
+WINDOW_BUCKETS = 60
+
+
+def shift_start(timestamp, start_hours):
+    """Returns the Unix time at which the shift containing ``timestamp`` started."""
+    moment = datetime.fromtimestamp(timestamp)
+    hours = sorted(start_hours)
+    started = [hour for hour in hours if hour <= moment.hour]
+    if started:
+        start = moment.replace(hour=started[-1], minute=0, second=0, microsecond=0)
+    else:  # before the first shift of the day: last shift of the previous day
+        start = (moment - timedelta(days=1)).replace(hour=hours[-1], minute=0, second=0, microsecond=0)
+    return start.timestamp()
+
+
+def energy_summary(consumer_wh, baseline_wh, seconds):
+    """Builds the JSON summary of one machine from its counters."""
+    consumers = {name: round(float(value), 3) for name, value in zip(CONSUMERS, consumer_wh)}
+    extractor_wh = consumers[EXTRACTOR]
+    baseline_wh = float(baseline_wh)
+    savings_wh = baseline_wh - extractor_wh
+    return {
+        "duration_s": round(float(seconds), 1),
+        "consumers_wh": consumers,
+        "total_wh": round(float(np.sum(consumer_wh)), 3),
+        "always_on_extractor_wh": round(baseline_wh, 3),
+        "savings_wh": round(savings_wh, 3),
+        "savings_percent": round(100.0 * savings_wh / baseline_wh, 2) if baseline_wh > 0 else 0.0,
+    }
+
+
+class EnergyCounter:
+    """Wh per consumer, always-on baseline and covered seconds, one column per machine."""
+
+    def __init__(self, width):
+        self.consumer_wh = np.zeros((len(CONSUMERS), width))
+        self.baseline_wh = np.zeros(width)
+        self.seconds = np.zeros(width)
+
+    def add(self, consumer_wh, baseline_wh, seconds):
+        self.consumer_wh += consumer_wh
+        self.baseline_wh += baseline_wh
+        self.seconds += seconds
+
+    def subtract(self, other):
+        self.consumer_wh -= other.consumer_wh
+        self.baseline_wh -= other.baseline_wh
+        self.seconds -= other.seconds
+
+    def clear(self, column=None):
+        columns = slice(None) if column is None else column
+        self.consumer_wh[:, columns] = 0.0
+        self.baseline_wh[columns] = 0.0
+        self.seconds[columns] = 0.0
+
+    def add_columns(self, count):
+        self.consumer_wh = np.hstack((self.consumer_wh, np.zeros((len(CONSUMERS), count))))
+        self.baseline_wh = np.append(self.baseline_wh, np.zeros(count))
+        self.seconds = np.append(self.seconds, np.zeros(count))
+
+    def copy(self):
+        counter = EnergyCounter.__new__(EnergyCounter)
+        counter.consumer_wh = self.consumer_wh.copy()
+        counter.baseline_wh = self.baseline_wh.copy()
+        counter.seconds = self.seconds.copy()
+        return counter
+
+    def summary(self, column):
+        return energy_summary(self.consumer_wh[:, column], self.baseline_wh[column], self.seconds[column])
+
+
+class RollingEnergy:
+    """Energy over the last ``window`` seconds from a ring of time buckets."""
+
+    def __init__(self, window, width, buckets=WINDOW_BUCKETS):
+        self.bucket_seconds = window / buckets
+        self._buckets = [EnergyCounter(width) for _ in range(buckets)]
+        self._total = EnergyCounter(width)
+        self._current = None  # index of the newest bucket since the epoch
+
+    def add(self, timestamp, consumer_wh, baseline_wh, seconds):
+        bucket = math.floor(timestamp / self.bucket_seconds)
+        if self._current is not None and bucket != self._current:
+            # Evict the buckets that fell out of the window (at most all of them).
+            for stale in range(self._current + 1, min(bucket, self._current + len(self._buckets)) + 1):
+                evicted = self._buckets[stale % len(self._buckets)]
+                self._total.subtract(evicted)
+                evicted.clear()
+        self._current = bucket
+        self._buckets[bucket % len(self._buckets)].add(consumer_wh, baseline_wh, seconds)
+        self._total.add(consumer_wh, baseline_wh, seconds)
+
+    def add_columns(self, count):
+        for counter in (*self._buckets, self._total):
+            counter.add_columns(count)
+
+    @property
+    def total(self):
+        return self._total
+
+
+class EnergyMeter:
+    def __init__(self, width=1, shift_start_hours=(6, 14, 22), windows=None):
+        self.shift_start_hours = tuple(shift_start_hours)
+        self.since_reset = EnergyCounter(width)
+        self.shift = EnergyCounter(width)
+        self.shift_started = None
+        self.windows = {
+            label: RollingEnergy(seconds, width)
+            for label, seconds in (windows or ENERGY_WINDOWS).items()
+        }
+
+    def add(self, sample, elapsed_seconds):
+        """Integrates one fleet tick (power in W held for ``elapsed_seconds``)."""
+        consumer_wh = np.array([sample[name] for name in CONSUMERS], dtype=np.float64)
+        consumer_wh *= elapsed_seconds / 3600.0
+        baseline_wh = EXTRACTOR_BASELINE_POWER * elapsed_seconds / 3600.0
+        timestamp = sample["time"]
+
+        started = shift_start(timestamp, self.shift_start_hours)
+        if started != self.shift_started:
+            self.shift.clear()
+            self.shift_started = started
+
+        for counter in (self.since_reset, self.shift):
+            counter.add(consumer_wh, baseline_wh, elapsed_seconds)
+        for window in self.windows.values():
+            window.add(timestamp, consumer_wh, baseline_wh, elapsed_seconds)
+
+    def reset(self, column=None):
+        """Restarts the since-reset counters; shift and rolling windows keep running."""
+        self.since_reset.clear(column)
+
+    def add_columns(self, count):
+        self.since_reset.add_columns(count)
+        self.shift.add_columns(count)
+        for window in self.windows.values():
+            window.add_columns(count)
+
+    def view(self):
+        """Returns an immutable copy of the counters for lock-free readers."""
+        return EnergyView(
+            self.since_reset.copy(),
+            self.shift.copy(),
+            self.shift_started,
+            {label: window.total.copy() for label, window in self.windows.items()},
+        )
+
+
+class EnergyView:
+    def __init__(self, since_reset, shift, shift_started, windows):
+        self.since_reset = since_reset
+        self.shift = shift
+        self.shift_started = shift_started
+        self.windows = windows
+
+    def summary(self, column=0):
+        shift = self.shift.summary(column)
+        if self.shift_started is not None:
+            shift["started"] = datetime.fromtimestamp(self.shift_started).strftime("%Y-%m-%d %H:%M")
+        return {
+            "since_reset": self.since_reset.summary(column),
+            "shift": shift,
+            "windows": {label: counter.summary(column) for label, counter in self.windows.items()},
+        }
@@ -0,0 +1,139 @@
+"""Streaming export of the stored history to CSV, Parquet and Excel.
+
+The rows of a time range are read page by page (``chunk_rows`` at a time,
+ordered by sequence number) and every page is encoded and handed out before
+the next one is read, so an export of days of data needs the memory of one
+page regardless of its length. CSV is produced by a plain generator,
+Parquet as one row group per page and Excel with a write-only openpyxl
+workbook, which keeps its rows in a temporary file until it is saved.
+"""
+
+import io
+import re
+import tempfile
+
+import numpy as np
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+EXPORT_CHUNK_ROWS = 10_000
+EXCEL_MAX_ROWS = 1_048_576  # per sheet, including the header
+EXCEL_MAX_TITLE = 31  # characters of a sheet title
+_INVALID_TITLE_CHARACTERS = re.compile(r"[\\/?*\[\]:]")
+_FILE_BLOCK = 1024 * 1024
+
+
+def iter_pages(read_page, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yields dicts of column arrays with at most ``chunk_rows`` rows.
+
+    ``read_page(start, end, after, limit)`` returns the columns (including
+    ``seq``) of the oldest ``limit`` samples with a sequence number above
+    ``after``.
+    """
+    after = None
+    while True:
+        page = read_page(start, end, after, chunk_rows)
+        rows = len(page["seq"])
+        if rows == 0:
+            return
+        after = int(page["seq"][-1])
+        yield page
+        if rows < chunk_rows:
+            return
+
+
+def iter_csv(pages, channels):
+    """Encodes pages as CSV, one block of bytes per page."""
+    import pandas as pd
+
+    yield (",".join(channels) + "\n").encode()
+    for page in pages:
+        yield pd.DataFrame({name: page[name] for name in channels}).to_csv(
+            header=False, index=False, lineterminator="\n",
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """File-like object that collects written bytes until they are taken."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(pages, channels, dtypes):
+    """Encodes pages as a Parquet file with one row group per page."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (name, pa.string() if np.dtype(dtypes[name]).kind == "U" else pa.from_numpy_dtype(np.dtype(dtypes[name])))
+        for name in channels
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for page in pages:
+            writer.write_table(pa.table({name: page[name] for name in channels}, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def excel_sheet_title(name):
+    """Turns free text (a machine id) into a valid sheet title: no ``/\\?*[]:``, at most 31 characters."""
+    title = _INVALID_TITLE_CHARACTERS.sub("_", str(name)).strip("'")
+    return title[:EXCEL_MAX_TITLE] or "History"
+
+
+def iter_xlsx(pages, channels, sheet_title="History"):
+    """Encodes pages as an Excel workbook, starting a new sheet when one is full.
+
+    ``sheet_title`` must be valid (see ``excel_sheet_title``); it is
+    shortened to make room for the number of further sheets.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet, rows, sheets = None, EXCEL_MAX_ROWS, 0
+    for page in pages:
+        columns = [page[name].tolist() for name in channels]
+        for row in zip(*columns):
+            if rows >= EXCEL_MAX_ROWS:
+                sheets += 1
+                suffix = "" if sheets == 1 else f" {sheets}"
+                sheet = workbook.create_sheet(sheet_title[:EXCEL_MAX_TITLE - len(suffix)] + suffix)
+                sheet.append(list(channels))
+                rows = 1
+            sheet.append(row)
+            rows += 1
+    if sheet is None:
+        workbook.create_sheet(sheet_title).append(list(channels))
+    with tempfile.TemporaryFile() as handle:
+        workbook.save(handle)
+        handle.seek(0)
+        while block := handle.read(_FILE_BLOCK):
+            yield block
@@ -0,0 +1,148 @@
+"""Machine registry and vectorized fleet simulation.
+
+Every machine tool has its own mist extractor, chip conveyor, PM10 rates and
+two-point controller state. The state of all machines is kept in parallel
+NumPy arrays (one entry per machine), so a tick advances the whole fleet with
+a handful of array operations instead of a Python loop per machine. The
+controller rule itself lives in :mod:`app.services.simulation` and is shared
+with the batch engine.
+"""
+
+import numpy as np
+
+from app.services.simulation import (
+    PM10_OFF_THRESHOLD,
+    PM10_ON_THRESHOLD,
+    noise_factors,
+    power_draw,
+    step,
+)
+
+
+DEFAULT_RISE_RATE = 0.05
+DEFAULT_FALL_RATE = 0.15
+
+
+class MachineFleet:
+    def __init__(self, machine_ids=(), rng=None):
+        self.ids = []
+        self._index = {}
+        self.pm10 = np.zeros(0, dtype=np.float64)
+        self.active = np.zeros(0, dtype=np.bool_)
+        self.run_time = np.zeros(0, dtype=np.float64)
+        self.rise_rate = np.zeros(0, dtype=np.float64)
+        self.fall_rate = np.zeros(0, dtype=np.float64)
+        self.on_threshold = np.zeros(0, dtype=np.float64)
+        self.off_threshold = np.zeros(0, dtype=np.float64)
+        self.min_run_time = np.zeros(0, dtype=np.float64)
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self.add_machines(machine_ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, machine_id):
+        return machine_id in self._index
+
+    def index_of(self, machine_id):
+        """Returns the array index of a machine. Raises KeyError if unknown."""
+        return self._index[machine_id]
+
+    def add_machine(self, machine_id, rise_rate=DEFAULT_RISE_RATE, fall_rate=DEFAULT_FALL_RATE):
+        return self.add_machines([machine_id], rise_rate, fall_rate)
+
+    def add_machines(self, machine_ids, rise_rate=DEFAULT_RISE_RATE, fall_rate=DEFAULT_FALL_RATE):
+        """Registers several machines with one resize of the state arrays; returns the index of the first."""
+        machine_ids = list(machine_ids)
+        new = set()
+        for machine_id in machine_ids:
+            if machine_id in self._index or machine_id in new:
+                raise ValueError(f"Machine '{machine_id}' is already registered")
+            new.add(machine_id)
+        first = len(self.ids)
+        count = len(machine_ids)
+        for index, machine_id in enumerate(machine_ids, first):
+            self._index[machine_id] = index
+        self.ids.extend(machine_ids)
+        self.pm10 = np.append(self.pm10, np.zeros(count))
+        self.active = np.append(self.active, np.zeros(count, dtype=np.bool_))
+        self.run_time = np.append(self.run_time, np.zeros(count))
+        self.rise_rate = np.append(self.rise_rate, np.full(count, float(rise_rate)))
+        self.fall_rate = np.append(self.fall_rate, np.full(count, float(fall_rate)))
+        self.on_threshold = np.append(self.on_threshold, np.full(count, PM10_ON_THRESHOLD))
+        self.off_threshold = np.append(self.off_threshold, np.full(count, PM10_OFF_THRESHOLD))
+        self.min_run_time = np.append(self.min_run_time, np.zeros(count))
+        return first
+
+    def set_rates(self, index, rise_rate, fall_rate):
+        self.rise_rate[index] = float(rise_rate)
+        self.fall_rate[index] = float(fall_rate)
+
+    def set_thresholds(self, index, on_threshold, off_threshold, min_run_time=0.0):
+        if off_threshold >= on_threshold:
+            raise ValueError("The switch-off threshold must be below the switch-on threshold")
+        self.on_threshold[index] = float(on_threshold)
+        self.off_threshold[index] = float(off_threshold)
+        self.min_run_time[index] = float(min_run_time)
+
+    def reset(self, index=None):
+        """Resets the controller state of one machine, or of all machines."""
+        if index is None:
+            index = slice(None)
+        self.pm10[index] = 0.0
+        self.active[index] = False
+        self.run_time[index] = 0.0
+
+    def apply_measurement(self, index, pm10, elapsed_seconds, active=None):
+        """Overrides the state of one machine with a measured PM10 value.
+
+        Without a measured extractor state the two-point controller of the
+        machine decides it from ``pm10``, honouring the minimum run time.
+        Returns the extractor state.
+        """
+        was_active = bool(self.active[index])
+        run_time = self.run_time[index] + elapsed_seconds if was_active else 0.0
+        if active is None:
+            if was_active:
+                active = not (pm10 <= self.off_threshold[index] and run_time >= self.min_run_time[index])
+            else:
+                active = pm10 >= self.on_threshold[index]
+        self.pm10[index] = max(float(pm10), 0.0)
+        self.active[index] = active
+        self.run_time[index] = run_time if active and was_active else 0.0
+        return bool(active)
+
+    def step(self, elapsed_seconds, measurements=None):
+        """Advances all machines by ``elapsed_seconds``.
+
+        ``measurements`` maps a machine index to a measured ``(pm10, active)``
+        pair (either may be None) that replaces the simulation of that
+        machine, see :meth:`apply_measurement`. Returns a dict with one array
+        per machine channel for this tick.
+        """
+        measurements = measurements or {}
+        previous = {index: (self.pm10[index], self.active[index], self.run_time[index]) for index in measurements}
+        factor = noise_factors(self._rng, len(self.ids))
+        self.pm10, self.active, self.run_time = step(
+            self.pm10,
+            self.active,
+            self.run_time,
+            self.rise_rate,
+            self.fall_rate,
+            elapsed_seconds,
+            factor,
+            self.on_threshold,
+            self.off_threshold,
+            self.min_run_time,
+        )
+        for index, (pm10, active) in measurements.items():
+            simulated_pm10 = self.pm10[index]
+            self.pm10[index], self.active[index], self.run_time[index] = previous[index]
+            self.apply_measurement(index, simulated_pm10 if pm10 is None else pm10, elapsed_seconds, active)
+        return {
+            **power_draw(self.active, self._rng),
+            "PM10": np.round(self.pm10, 4),
+            "mist_extractor_active": self.active.copy(),
+            "pm10_rise_rate": self.rise_rate.copy(),
+            "pm10_fall_rate": self.fall_rate.copy(),
+        }
@@ -0,0 +1,63 @@
+"""Health of the REST API, tracked inside the serving process.
+
+The settings tab used to probe ``/health`` over HTTP on every run, which
+blocked the render for up to the request timeout whenever the API was down.
+``ApiHealth`` is updated by the API itself instead: the startup and shutdown
+events mark it up and down, and a heartbeat task in the API event loop
+measures how late the loop wakes up (the time a request waits before it is
+handled). Reading the status is a dict lookup, with no network I/O.
+"""
+
+import asyncio
+import time
+
+
+HEARTBEAT_INTERVAL = 1.0
+UNRESPONSIVE_AFTER = 3 * HEARTBEAT_INTERVAL  # seconds without heartbeat
+
+
+class ApiHealth:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._started_at = None
+        self._heartbeat_at = None
+        self._latency = None
+        self._error = None
+        self._task = None
+
+    def started(self):
+        """Called on the API startup event, inside its event loop."""
+        self._started_at = self._heartbeat_at = self._clock()
+        self._latency = 0.0
+        self._error = None
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+
+    def stopped(self, error=None):
+        """Called on the API shutdown event, or with ``error`` if the server could not start."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._started_at = None
+        if error is not None:
+            self._error = str(error)
+
+    async def _beat(self):
+        while True:
+            start = self._clock()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = self._clock()
+            self._latency = max(0.0, now - start - HEARTBEAT_INTERVAL)
+            self._heartbeat_at = now
+
+    def status(self):
+        """Returns ``status`` (available, unresponsive, unavailable), loop ``latency_ms``, ``uptime_s`` and ``error``."""
+        started_at = self._started_at
+        if started_at is None:
+            return {"status": "unavailable", "latency_ms": None, "uptime_s": None, "error": self._error}
+        now = self._clock()
+        return {
+            "status": "available" if now - self._heartbeat_at < UNRESPONSIVE_AFTER else "unresponsive",
+            "latency_ms": round(self._latency * 1000.0, 3),
+            "uptime_s": round(now - started_at, 1),
+            "error": None,
+        }
@@ -0,0 +1,230 @@
+"""Columnar ring buffer for the simulation history.
+
+Each channel is stored in its own preallocated NumPy array. Appending a
+sample writes one slot per channel at the write cursor, so the cost of a tick
+does not depend on the amount of history kept. Machine channels hold one
+column per machine of the fleet, so a whole fleet tick is a single row write.
+Snapshots are returned as a dict of column arrays that can be passed straight
+to ``pd.DataFrame``.
+
+``view()`` captures the buffer position in an immutable ``HistoryView`` that
+can be read without holding the writer's lock: the next tick only writes the
+slot after the newest sample, which a view never exposes, and adding a
+machine only widens the used part of the arrays (views keep the old width)
+or moves them to new ones. A view is meant to be read right away, not kept
+across ticks.
+
+The machine columns are allocated ahead (``reserve``) and grow by doubling,
+so registering many machines one by one copies the history a logarithmic
+number of times instead of once per machine.
+
+Every appended tick gets a sequence number (``seq``) that keeps increasing
+across resets, so clients can ask for the samples after the last one they
+have seen.
+"""
+
+import numpy as np
+
+
+# Channel name -> dtype. The order defines the column order of snapshots.
+HISTORY_CHANNELS = {
+    "seq": np.int64,             # tick sequence number, assigned by the buffer
+    "time": np.float64,          # Unix epoch seconds
+    "timestamp": "U11",          # HH:MM:SS(.ff above 1 Hz), used as chart x-axis
+    "Main supply": np.int32,
+    "Mist extractor": np.int32,
+    "Chip conveyor": np.int32,
+    "PM10": np.float64,
+    "mist_extractor_active": np.bool_,
+    "pm10_rise_rate": np.float64,
+    "pm10_fall_rate": np.float64,
+}
+
+# Channels shared by all machines (one value per tick instead of per machine).
+SHARED_CHANNELS = ("seq", "time", "timestamp")
+
+
+def columns_to_records(columns):
+    """Converts a dict of column arrays into a list of dicts (for JSON responses)."""
+    names = list(columns)
+    values = [columns[name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+class HistoryBuffer:
+    def __init__(self, capacity, width=1, channels=None, reserve=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.width = int(width)
+        self.channels = dict(channels or HISTORY_CHANNELS)
+        # Allocated machine columns; _columns are views of the used part.
+        self._full = {
+            name: np.zeros(self._shape(name, max(self.width, reserve or 0)), dtype=dtype)
+            for name, dtype in self.channels.items()
+        }
+        self._columns = {}
+        self._use_width(self.width)
+        self._cursor = 0
+        self._size = 0
+        self.last_seq = 0
+        # Number of valid samples per machine column (machines can join later
+        # or be reset individually).
+        self._filled = np.zeros(self.width, dtype=np.int64)
+
+    def _shape(self, name, width):
+        if name in SHARED_CHANNELS:
+            return (self.capacity,)
+        return (self.capacity, width)
+
+    def _use_width(self, width):
+        for name, values in self._full.items():
+            self._columns[name] = values if name in SHARED_CHANNELS else values[:, :width]
+
+    def _allocated(self):
+        for name, values in self._full.items():
+            if name not in SHARED_CHANNELS:
+                return values.shape[1]
+        return 0
+
+    def _reserve(self, width):
+        """Makes room for ``width`` machine columns, at least doubling the allocation."""
+        allocated = self._allocated()
+        if width <= allocated:
+            return
+        allocated = max(width, 2 * allocated)
+        for name, values in self._full.items():
+            if name not in SHARED_CHANNELS:
+                grown = np.zeros(self._shape(name, allocated), dtype=values.dtype)
+                grown[:, :self.width] = values[:, :self.width]
+                self._full[name] = grown
+
+    def __len__(self):
+        return self._size
+
+    def add_column(self):
+        """Adds an empty column for a new machine and returns its index."""
+        return self.add_columns(1)
+
+    def add_columns(self, count):
+        """Adds empty columns for ``count`` new machines and returns the index of the first."""
+        first = self.width
+        width = first + int(count)
+        # Columns past the width are never written, so the new ones are still zero.
+        self._reserve(width)
+        self._use_width(width)
+        self._filled = np.concatenate((self._filled, np.zeros(width - first, dtype=np.int64)))
+        self.width = width
+        return first
+
+    def append(self, sample):
+        """Writes one tick at the cursor and returns its sequence number.
+
+        ``sample`` maps each channel except ``seq`` to a scalar (shared
+        channels) or an array with one value per machine column.
+        """
+        index = self._cursor
+        self.last_seq += 1
+        for name, column in self._columns.items():
+            column[index] = self.last_seq if name == "seq" else sample[name]
+        self._cursor = (index + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        np.minimum(self._filled + 1, self.capacity, out=self._filled)
+        return self.last_seq
+
+    def clear(self, column=None):
+        """Clears the whole buffer or the history of a single machine column.
+
+        Sequence numbers are not reset.
+        """
+        if column is not None:
+            self._filled[column] = 0
+            return
+        self._cursor = 0
+        self._size = 0
+        self._filled[:] = 0
+
+    def view(self):
+        """Returns an immutable view of the current contents (safe to read without a lock)."""
+        return HistoryView(
+            dict(self._columns), self.capacity, self._cursor, self.last_seq,
+            np.minimum(self._filled, self.capacity - 1),
+        )
+
+    def snapshot(self, column=0, limit=None, channels=None, after=None):
+        return self._live_view().snapshot(column, limit, channels, after)
+
+    def latest(self, column=0):
+        return self._live_view().latest(column)
+
+    def to_records(self, column=0, limit=None, after=None, channels=None):
+        return self._live_view().to_records(column, limit, after, channels)
+
+    def _live_view(self):
+        # Direct reads happen under the caller's lock and may use every slot.
+        return HistoryView(dict(self._columns), self.capacity, self._cursor, self.last_seq, self._filled.copy())
+
+
+class HistoryView:
+    def __init__(self, columns, capacity, cursor, last_seq, filled):
+        self._columns = columns
+        self.capacity = capacity
+        self._cursor = cursor
+        self.last_seq = last_seq
+        self._filled = filled
+
+    def __len__(self):
+        return int(self._filled.max()) if len(self._filled) else 0
+
+    def _ordered(self, values, count, skip_newest=0):
+        """Returns ``count`` entries of a 1-D array in chronological order.
+
+        The window ends ``skip_newest`` entries before the most recent one.
+        """
+        end = (self._cursor - skip_newest) % self.capacity
+        start = (end - count) % self.capacity
+        if start + count <= self.capacity:
+            return values[start:start + count].copy()
+        return np.concatenate((values[start:], values[:end]))
+
+    def _window(self, column, limit, after):
+        """Returns ``(count, skip_newest)`` of the rows selected by limit/after."""
+        available = int(self._filled[column])
+        if after is None:
+            count = available if limit is None else max(0, min(int(limit), available))
+            return count, 0
+        newer = max(0, min(self.last_seq - int(after), available))
+        count = newer if limit is None else max(0, min(int(limit), newer))
+        return count, newer - count
+
+    def snapshot(self, column=0, limit=None, channels=None, after=None):
+        """Returns a dict of column copies for one machine, oldest sample first.
+
+        Without ``after`` the snapshot holds the most recent ``limit`` samples.
+        With ``after`` it holds the first ``limit`` samples whose sequence
+        number is greater than ``after``, so clients can page forward.
+        ``channels`` restricts the snapshot to a subset of the channels.
+        """
+        count, skip_newest = self._window(column, limit, after)
+        names = self._columns if channels is None else channels
+        snapshot = {}
+        for name in names:
+            values = self._columns[name]
+            if name not in SHARED_CHANNELS:
+                values = values[:, column]
+            snapshot[name] = self._ordered(values, count, skip_newest)
+        return snapshot
+
+    def latest(self, column=0):
+        """Returns the most recent sample of one machine as a dict of Python scalars."""
+        if not self._filled[column]:
+            return None
+        index = (self._cursor - 1) % self.capacity
+        return {
+            name: (values[index] if name in SHARED_CHANNELS else values[index, column]).item()
+            for name, values in self._columns.items()
+        }
+
+    def to_records(self, column=0, limit=None, after=None, channels=None):
+        """Returns the history of one machine as a list of dicts (for JSON responses)."""
+        return columns_to_records(self.snapshot(column, limit, channels=channels, after=after))
@@ -0,0 +1,318 @@
+"""Bounded ingest queue for pushed sensor samples.
+
+Push sources (a message broker subscription, the ``/ingest`` endpoint, a
+stand-in in benchmarks) put ``SensorSample``s into an ``IngestQueue``. Its
+capacity is fixed; when it is full the overflow policy decides:
+
+``block``        the producer waits up to ``block_timeout`` for room
+                 (backpressure), then the sample is rejected
+``drop_oldest``  the oldest queued sample is discarded for the new one
+``drop_newest``  the new sample is discarded
+
+Every outcome is counted. An ``IngestWorker`` thread drains the queue in
+batches. It folds the samples into the latest value per machine and
+channel, which the simulation ticks take over as measurements until the
+machine has not pushed anything for ``STALE_AFTER`` seconds. With an
+``IngestRecorder`` it also writes every sample, with its own timestamp, to
+an on-disk store per machine, so bursts faster than the tick rate are kept
+in full. Putting a sample never touches the simulation state lock, so
+bursts of pushed samples do not stall the tick, the UI or the API readers.
+"""
+
+import math
+import threading
+import time
+from collections import deque, namedtuple
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from app.services.timeseries_store import FLUSH_INTERVAL, TimeSeriesStore
+
+
+INGEST_CAPACITY = 10_000
+INGEST_BATCH = 1_000
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+BLOCK_TIMEOUT = 0.5  # seconds a blocked producer waits before the sample is rejected
+STALE_AFTER = 5.0  # seconds after the last pushed sample until the simulation takes over again
+MEASURED_CHANNELS = ("Main supply", "Mist extractor", "Chip conveyor", "PM10", "mist_extractor_active")
+
+SensorSample = namedtuple("SensorSample", ("machine_id", "values", "timestamp"))
+
+# Channels of the recorded samples; a channel missing from a sample is NaN.
+RECORD_CHANNELS = {"seq": np.int64, "time": np.float64, **{channel: np.float64 for channel in MEASURED_CHANNELS}}
+
+
+class IngestQueue:
+    def __init__(self, capacity=INGEST_CAPACITY, policy="drop_oldest", block_timeout=BLOCK_TIMEOUT):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.capacity = INGEST_CAPACITY
+        self.policy = "drop_oldest"
+        self.block_timeout = block_timeout
+        self.accepted = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.rejected = 0  # block policy: no room within the timeout
+        self.blocked = 0  # puts that had to wait
+        self.blocked_seconds = 0.0
+        self.high_watermark = 0
+        self.configure(capacity, policy)
+
+    def configure(self, capacity=None, policy=None):
+        """Changes capacity and/or overflow policy. Raises ValueError if invalid."""
+        capacity = self.capacity if capacity is None else int(capacity)
+        policy = self.policy if policy is None else policy
+        if capacity < 1:
+            raise ValueError("The ingest capacity must be positive")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}")
+        with self._lock:
+            self.capacity = capacity
+            self.policy = policy
+            while len(self._queue) > capacity:
+                self._queue.popleft()
+                self.dropped_oldest += 1
+            self._not_full.notify_all()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, sample):
+        """Queues one sample. Returns False if the overflow policy discarded it."""
+        with self._lock:
+            if len(self._queue) >= self.capacity:
+                if self.policy == "drop_newest":
+                    self.dropped_newest += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped_oldest += 1
+                elif not self._wait_for_room():
+                    self.rejected += 1
+                    return False
+            self._queue.append(sample)
+            self.accepted += 1
+            self.high_watermark = max(self.high_watermark, len(self._queue))
+            self._not_empty.notify()
+            return True
+
+    def put_many(self, samples):
+        """Queues several samples. Returns the number accepted."""
+        return sum(self.put(sample) for sample in samples)
+
+    def _wait_for_room(self):
+        """Backpressure: waits (lock held by the caller) until there is room or the timeout passes."""
+        self.blocked += 1
+        start = time.monotonic()
+        deadline = start + self.block_timeout
+        while len(self._queue) >= self.capacity:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.policy != "block":
+                break
+            self._not_full.wait(remaining)
+        self.blocked_seconds += time.monotonic() - start
+        if len(self._queue) < self.capacity:
+            return True
+        if self.policy == "drop_oldest":  # changed while waiting
+            self._queue.popleft()
+            self.dropped_oldest += 1
+            return True
+        return False
+
+    def drain(self, max_items=INGEST_BATCH, timeout=None):
+        """Removes up to ``max_items`` samples, waiting up to ``timeout`` for the first one."""
+        with self._lock:
+            if not self._queue and timeout:
+                self._not_empty.wait(timeout)
+            count = min(max_items, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def stats(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "policy": self.policy,
+                "depth": len(self._queue),
+                "high_watermark": self.high_watermark,
+                "accepted": self.accepted,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+                "rejected": self.rejected,
+                "blocked": self.blocked,
+                "blocked_seconds": round(self.blocked_seconds, 3),
+            }
+
+
+class IngestRecorder:
+    """Writes pushed samples with their own timestamps to one ``TimeSeriesStore`` per machine.
+
+    ``record`` only queues the rows; they are written in batches by
+    ``flush``, which the worker calls every ``flush_interval`` seconds. The
+    rows of a batch are sorted by time. The stores only append (their
+    queries expect the time to increase), so a sample older than the newest
+    recorded one of its machine is dropped and counted in ``out_of_order``.
+    """
+
+    def __init__(self, directory, read_only=False, flush_interval=FLUSH_INTERVAL, **store_options):
+        self.directory = Path(directory)
+        self.read_only = read_only
+        self.flush_interval = flush_interval
+        self._store_options = store_options
+        self._stores = {}
+        self._seqs = {}
+        self._newest = {}  # machine_id -> time of the newest recorded row
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self.recorded = 0
+        self.out_of_order = 0
+
+    def _store(self, machine_id):
+        with self._lock:
+            store = self._stores.get(machine_id)
+            if store is None:
+                # Machine ids are free text; quoted and prefixed they cannot leave the directory.
+                path = self.directory / f"m-{quote(machine_id, safe='')}"
+                store = TimeSeriesStore(path, RECORD_CHANNELS, read_only=self.read_only, **self._store_options)
+                self._stores[machine_id] = store
+                self._seqs[machine_id] = store.last_seq
+                self._newest[machine_id] = store.segments[-1].end_time if store.segments else -math.inf
+            return store
+
+    def record(self, batch):
+        """Queues a batch of ``SensorSample``s for writing."""
+        by_machine = {}
+        for machine_id, values, timestamp in batch:
+            by_machine.setdefault(machine_id, []).append((float(timestamp), values))
+        for machine_id, samples in by_machine.items():
+            store = self._store(machine_id)
+            samples.sort(key=lambda sample: sample[0])
+            newest = self._newest[machine_id]
+            late = sum(1 for timestamp, _ in samples if timestamp < newest)
+            samples = samples[late:]
+            self.out_of_order += late
+            if not samples:
+                continue
+            seq = self._seqs[machine_id]
+            rows = []
+            for seq, (timestamp, values) in enumerate(samples, seq + 1):
+                row = {channel: float(values.get(channel, math.nan)) for channel in MEASURED_CHANNELS}
+                row["time"] = timestamp
+                rows.append((seq, row))
+            self._seqs[machine_id] = seq
+            self._newest[machine_id] = samples[-1][0]
+            store.append_many(rows, (machine_id,))
+            self.recorded += len(rows)
+
+    def flush(self, force=False):
+        """Writes the queued rows if ``flush_interval`` has passed (or with ``force``)."""
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.flush_interval:
+            return
+        self._flushed_at = now
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            store.flush()
+
+    def stop(self):
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            store.stop()
+
+    def query(self, machine_id, start=None, end=None, channels=None, limit=None):
+        """Returns the recorded samples of one machine as a dict of column arrays (see ``TimeSeriesStore.query``)."""
+        return self._store(machine_id).query(machine_id, start, end, channels, limit=limit)
+
+
+class IngestWorker:
+    """Drains an ``IngestQueue``, keeps the latest value per machine and channel and records the samples."""
+
+    def __init__(self, queue, batch_size=INGEST_BATCH, recorder=None):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.recorder = recorder
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.batches = 0
+        self.samples = 0
+        self.unknown_channels = 0
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the worker; the recorder writes what it still holds."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.recorder is not None:
+            self.recorder.stop()
+
+    def _run(self):
+        while self._running:
+            batch = self.queue.drain(self.batch_size, timeout=0.1)
+            if batch:
+                self.fold(batch)
+            if self.recorder is not None:
+                if batch:
+                    self.recorder.record(batch)
+                self.recorder.flush()
+
+    def fold(self, batch):
+        """Merges a batch into the latest values the ticks use (newer samples win)."""
+        latest = {}
+        unknown = 0
+        for machine_id, values, _ in batch:
+            merged = latest.setdefault(machine_id, {})
+            for channel, value in values.items():
+                if channel in MEASURED_CHANNELS:
+                    merged[channel] = value
+                else:
+                    unknown += 1
+        now = time.monotonic()
+        with self._lock:
+            for machine_id, values in latest.items():
+                held = self._latest.get(machine_id)
+                self._latest[machine_id] = ({**held[0], **values} if held else values, now)
+            self.batches += 1
+            self.samples += len(batch)
+            self.unknown_channels += unknown
+
+    def current(self, max_age=STALE_AFTER):
+        """Returns ``{machine_id: values}`` of the machines that pushed within ``max_age`` seconds."""
+        oldest = time.monotonic() - max_age
+        with self._lock:
+            return {
+                machine_id: values for machine_id, (values, received) in self._latest.items()
+                if received >= oldest
+            }
+
+    def clear(self, machine_id=None):
+        with self._lock:
+            if machine_id is None:
+                self._latest.clear()
+            else:
+                self._latest.pop(machine_id, None)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "samples": self.samples,
+            "unknown_channels": self.unknown_channels,
+            "recorded": 0 if self.recorder is None else self.recorder.recorded,
+            "out_of_order": 0 if self.recorder is None else self.recorder.out_of_order,
+        }
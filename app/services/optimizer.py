@@ -0,0 +1,175 @@
+"""Threshold optimizer for the two-point controller.
+
+Searches switch-on/switch-off thresholds and minimum run times for the
+lowest mist extractor energy that keeps PM10 exposure within a limit (peak
+PM10 and/or time-weighted average). With constant rates the duty cycle of
+the extractor does not depend on the band width, so the energy model adds a
+start-up energy per switch-on (motor run-up); wide bands and minimum run
+times trade fewer starts against higher exposure. Candidates are evaluated
+with the batch engine on the shared process pool in stages:
+
+1. Candidates whose peak PM10 (the switch-on threshold) already violates the
+   peak limit are dropped without simulating.
+2. All remaining candidates are screened on a short horizon. Candidates that
+   clearly violate the TWA limit, or are clearly dominated in energy and
+   exposure by a feasible candidate, are pruned.
+3. The survivors are evaluated over the full horizon; the result is the
+   energy/exposure Pareto front and the lowest-energy feasible candidate.
+"""
+
+import time
+from itertools import product
+
+import numpy as np
+
+from app.services.savings import EXTRACTOR_POWER
+from app.services.simulation import simulate
+from app.services.workers import map_chunks
+
+
+ON_THRESHOLDS = tuple(np.round(np.arange(2.0, 5.01, 0.25), 2))
+OFF_THRESHOLDS = tuple(np.round(np.arange(0.5, 4.51, 0.25), 2))
+MIN_RUN_TIMES = (0.0, 10.0, 30.0, 60.0)
+
+# Run-up energy per switch-on: about 5 s at nominal extractor power.
+STARTUP_ENERGY_WH = EXTRACTOR_POWER * 5.0 / 3600.0
+
+SCREENING_DURATION = 1800.0  # seconds simulated per candidate in stage 2
+PRUNING_MARGIN = 0.1  # relative safety margin of the screening stage
+
+
+def evaluate_candidate(rise_rate, fall_rate, on_threshold, off_threshold, min_run_time,
+                       duration, dt=1.0, seed=0, startup_energy_wh=STARTUP_ENERGY_WH):
+    """Simulates one threshold candidate and returns its energy and exposure."""
+    series = simulate(
+        duration,
+        dt=dt,
+        rise_rate=rise_rate,
+        fall_rate=fall_rate,
+        on_threshold=on_threshold,
+        off_threshold=off_threshold,
+        min_run_time=min_run_time,
+        initial_pm10=off_threshold,
+        seed=seed,
+        include_power=False,
+    )
+    active = series["mist_extractor_active"]
+    switch_ons = int(np.count_nonzero(active[1:] & ~active[:-1]))
+    on_fraction = float(active.mean())
+    return {
+        "on_threshold": on_threshold,
+        "off_threshold": off_threshold,
+        "min_run_time": min_run_time,
+        "on_fraction": on_fraction,
+        "energy_wh": EXTRACTOR_POWER * on_fraction * duration / 3600.0 + switch_ons * startup_energy_wh,
+        "twa_pm10": float(series["PM10"].mean()),
+        "max_pm10": float(series["PM10"].max()),
+        "switches_per_hour": switch_ons * 3600.0 / duration,
+    }
+
+
+def _evaluate_chunk(start, candidates, rise_rate, fall_rate, duration, dt, seed, startup_energy_wh):
+    """Worker entry point: evaluates a slice of the candidate list."""
+    return start, [
+        evaluate_candidate(
+            rise_rate, fall_rate, *candidate, duration,
+            dt=dt, seed=seed, startup_energy_wh=startup_energy_wh,
+        )
+        for candidate in candidates
+    ]
+
+
+def _evaluate(candidates, rise_rate, fall_rate, duration, dt, seed, startup_energy_wh):
+    results = [None] * len(candidates)
+    chunks = map_chunks(
+        _evaluate_chunk, candidates, rise_rate, fall_rate, duration, dt, seed, startup_energy_wh
+    )
+    for start, rows in chunks:
+        results[start:start + len(rows)] = rows
+    return results
+
+
+def _is_feasible(result, max_pm10, max_twa, margin=0.0):
+    if max_pm10 is not None and result["max_pm10"] > max_pm10 * (1.0 + margin):
+        return False
+    if max_twa is not None and result["twa_pm10"] > max_twa * (1.0 + margin):
+        return False
+    return True
+
+
+def pareto_front(results):
+    """Returns the results not dominated in (energy, TWA), sorted by energy."""
+    front = []
+    best_twa = float("inf")
+    for result in sorted(results, key=lambda r: (r["energy_wh"], r["twa_pm10"])):
+        if result["twa_pm10"] < best_twa:
+            front.append(result)
+            best_twa = result["twa_pm10"]
+    return front
+
+
+def _prune_dominated(results, max_pm10, max_twa, margin):
+    """Drops candidates clearly worse in energy and TWA than a feasible one."""
+    feasible = [r for r in results if _is_feasible(r, max_pm10, max_twa)]
+    if not feasible:
+        return results
+    energy = np.array([r["energy_wh"] for r in feasible])
+    twa = np.array([r["twa_pm10"] for r in feasible])
+    kept = []
+    for result in results:
+        dominated = np.any(
+            (energy < result["energy_wh"] * (1.0 - margin))
+            & (twa < result["twa_pm10"] * (1.0 - margin))
+        )
+        if not dominated:
+            kept.append(result)
+    return kept
+
+
+def optimize_thresholds(rise_rate, fall_rate, max_pm10=None, max_twa=None,
+                        on_thresholds=ON_THRESHOLDS, off_thresholds=OFF_THRESHOLDS,
+                        min_run_times=MIN_RUN_TIMES, duration=8 * 3600.0, dt=1.0, seed=0,
+                        startup_energy_wh=STARTUP_ENERGY_WH):
+    """Finds the lowest-energy thresholds that satisfy the exposure limits."""
+    started = time.perf_counter()
+    candidates = [
+        (float(on), float(off), float(min_run))
+        for on, off, min_run in product(on_thresholds, off_thresholds, min_run_times)
+        if off < on
+    ]
+    total = len(candidates)
+
+    # Stage 1: the peak PM10 of a candidate is its switch-on threshold.
+    if max_pm10 is not None:
+        candidates = [candidate for candidate in candidates if candidate[0] <= max_pm10]
+    bound_pruned = total - len(candidates)
+
+    # Stage 2: screening on a short horizon.
+    screening_duration = min(SCREENING_DURATION, duration)
+    screened = _evaluate(candidates, rise_rate, fall_rate, screening_duration, dt, seed, startup_energy_wh)
+    screened = [r for r in screened if _is_feasible(r, None, max_twa, PRUNING_MARGIN)]
+    screened = _prune_dominated(screened, max_pm10, max_twa, PRUNING_MARGIN)
+    survivors = [(r["on_threshold"], r["off_threshold"], r["min_run_time"]) for r in screened]
+    screening_pruned = len(candidates) - len(survivors)
+
+    # Stage 3: full horizon for the survivors.
+    if duration > screening_duration:
+        results = _evaluate(survivors, rise_rate, fall_rate, duration, dt, seed, startup_energy_wh)
+    else:
+        results = screened
+    feasible = [r for r in results if _is_feasible(r, max_pm10, max_twa)]
+    front = pareto_front(feasible)
+
+    return {
+        "rise_rate": rise_rate,
+        "fall_rate": fall_rate,
+        "constraint": {"max_pm10": max_pm10, "max_twa": max_twa},
+        "startup_energy_wh": startup_energy_wh,
+        "best": front[0] if front else None,
+        "pareto_front": front,
+        "candidates": total,
+        "pruned_by_bound": bound_pruned,
+        "pruned_by_screening": screening_pruned,
+        "evaluated_full": len(survivors) if duration > screening_duration else 0,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+    }
@@ -0,0 +1,257 @@
+"""Replay of recorded measurement campaigns.
+
+A ``ReplaySource`` reads a CSV or Excel file in chunks and hands out one
+sample per row, so the file is never loaded as a whole: CSV files are read
+with ``pandas.read_csv(chunksize=...)``, Excel files row by row with
+openpyxl in read-only mode. The channel map says which file column feeds
+which channel of the live simulation; unmapped channels keep being
+simulated. The time column only sets the pacing: the gap between two rows is
+slept at ``1/speed`` (no sleep at maximum speed), and the samples are stamped
+with the time they are replayed at. pandas is imported on first use, so the
+API-only service starts without it.
+
+Recordings are opened from one directory only (``FACTORYX_REPLAY_DIR``):
+the path comes from the unauthenticated REST API, so anything that resolves
+outside of it is rejected before the filesystem is asked about it.
+"""
+
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+
+# Channel of the live data -> column in the recorded file.
+DEFAULT_CHANNEL_MAP = {
+    "time": "time",
+    "Main supply": "Main supply",
+    "Mist extractor": "Mist extractor",
+    "Chip conveyor": "Chip conveyor",
+    "PM10": "PM10",
+    "mist_extractor_active": "mist_extractor_active",
+}
+REPLAY_CHANNELS = tuple(DEFAULT_CHANNEL_MAP)
+REPLAY_SUFFIXES = (".csv", ".xlsx", ".xlsm")
+CHUNK_ROWS = 10_000
+MAX_STEP_SECONDS = 60.0  # gaps in the recording are replayed as at most one minute
+_TRUE_STRINGS = {"1", "true", "on", "yes", "active"}
+
+
+def recording_path(path, directory):
+    """Resolves ``path`` against ``directory``. Raises ValueError if it points outside of it."""
+    directory = Path(directory).resolve()
+    resolved = (directory / path).resolve()
+    if not resolved.is_relative_to(directory) or resolved == directory:
+        raise ValueError(f"Recordings must be inside the recordings directory ({directory.name})")
+    return resolved
+
+
+def time_seconds(values):
+    """Converts a time column (seconds, datetimes or date strings) to float seconds."""
+    import pandas as pd
+
+    series = pd.Series(values)
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().any() or series.isna().all():
+            return numeric.to_numpy(dtype=np.float64)
+        series = pd.to_datetime(series, errors="coerce")
+    return (series - pd.Timestamp(0)).dt.total_seconds().to_numpy(dtype=np.float64)
+
+
+def flag_values(values):
+    """Converts an on/off column (bools, 0/1 or strings) to bools."""
+    import pandas as pd
+
+    series = pd.Series(values)
+    if series.dtype == object:
+        return series.astype(str).str.strip().str.lower().isin(_TRUE_STRINGS).to_numpy()
+    return series.fillna(0).astype(bool).to_numpy()
+
+
+class ReplaySource:
+    def __init__(self, path, channel_map=None, speed=1.0, chunk_rows=CHUNK_ROWS, sheet=None, loop=False,
+                 directory=None):
+        """Opens a recording. Raises ValueError if the file or mapping is unusable.
+
+        With ``directory`` the path is resolved against it and must stay
+        inside it (see ``recording_path``).
+
+        ``channel_map`` entries override ``DEFAULT_CHANNEL_MAP``; an empty
+        column name unmaps a channel. Mapped columns missing from the file
+        are dropped, except ``time`` and (at least) one measured channel.
+        ``speed`` is the replay factor, ``None`` or 0 replays at maximum speed.
+        """
+        self.path = Path(path) if directory is None else recording_path(path, directory)
+        if self.path.suffix.lower() not in REPLAY_SUFFIXES:
+            raise ValueError(f"Unsupported file type '{self.path.suffix}', expected one of {REPLAY_SUFFIXES}")
+        if not self.path.is_file():
+            raise ValueError(f"Recording '{path}' not found")
+        mapping = {**DEFAULT_CHANNEL_MAP, **(channel_map or {})}
+        unknown = set(mapping) - set(REPLAY_CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown channels in mapping: {sorted(unknown)}")
+        if speed is not None and speed < 0:
+            raise ValueError("speed must not be negative")
+        self.speed = speed or None
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.sheet = sheet
+        self.loop = loop
+
+        header = self._read_header()
+        self.channel_map = {
+            channel: column for channel, column in mapping.items()
+            if column and column in header
+        }
+        if "time" not in self.channel_map:
+            raise ValueError(f"Time column '{mapping.get('time')}' not found in {self.path.name}")
+        if len(self.channel_map) == 1:
+            raise ValueError(f"None of the mapped channels found in {self.path.name}, columns: {header}")
+
+        self.rows = 0
+        self.passes = 0
+        self.finished = False
+        self.error = None
+        self.recorded_time = None
+        self._previous_time = None
+        self._stop = threading.Event()
+        self._samples = self._iter_samples()
+
+    @property
+    def channels(self):
+        return [channel for channel in self.channel_map if channel != "time"]
+
+    def _read_header(self):
+        if self.path.suffix.lower() == ".csv":
+            import pandas as pd
+
+            return list(pd.read_csv(self.path, nrows=0).columns)
+        workbook = self._open_workbook()
+        try:
+            header = next(self._worksheet(workbook).iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        return [str(name) for name in header if name is not None]
+
+    def _open_workbook(self):
+        from openpyxl import load_workbook
+
+        return load_workbook(self.path, read_only=True, data_only=True)
+
+    def _worksheet(self, workbook):
+        if self.sheet is None:
+            return workbook.active
+        if self.sheet not in workbook.sheetnames:
+            raise ValueError(f"Sheet '{self.sheet}' not found in {self.path.name}")
+        return workbook[self.sheet]
+
+    def _iter_chunks(self):
+        """Yields DataFrames of at most ``chunk_rows`` rows with the mapped columns."""
+        import pandas as pd
+
+        columns = list(self.channel_map.values())
+        if self.path.suffix.lower() == ".csv":
+            yield from pd.read_csv(self.path, usecols=columns, chunksize=self.chunk_rows)
+            return
+        workbook = self._open_workbook()
+        try:
+            rows = self._worksheet(workbook).iter_rows(values_only=True)
+            header = [None if name is None else str(name) for name in next(rows, ())]
+            positions = [header.index(column) for column in columns]
+            chunk = []
+            for row in rows:
+                chunk.append([row[position] if position < len(row) else None for position in positions])
+                if len(chunk) == self.chunk_rows:
+                    yield pd.DataFrame(chunk, columns=columns)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            workbook.close()
+
+    def _convert(self, chunk):
+        """Turns a raw chunk into one array per channel."""
+        import pandas as pd
+
+        values = {}
+        for channel, column in self.channel_map.items():
+            if channel == "time":
+                values[channel] = time_seconds(chunk[column])
+            elif channel == "mist_extractor_active":
+                values[channel] = flag_values(chunk[column])
+            else:
+                values[channel] = pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=np.float64)
+        return values
+
+    def _iter_samples(self):
+        while True:
+            for chunk in self._iter_chunks():
+                values = self._convert(chunk)
+                for row in range(len(chunk)):
+                    if self._stop.is_set():
+                        return
+                    yield {channel: column[row] for channel, column in values.items()}
+            self.passes += 1
+            if not self.loop:
+                return
+            self._previous_time = None
+
+    def next_sample(self):
+        """Returns ``(elapsed_seconds, values)`` of the next row, or None at the end.
+
+        Rows with an unreadable time are skipped; unreadable values are left
+        out of ``values`` so the simulation fills them in.
+        """
+        for sample in self._samples:
+            recorded = float(sample.pop("time"))
+            if np.isnan(recorded):
+                continue
+            elapsed = 0.0 if self._previous_time is None else recorded - self._previous_time
+            self._previous_time = recorded
+            self.recorded_time = recorded
+            self.rows += 1
+            values = {
+                channel: value for channel, value in sample.items()
+                if channel == "mist_extractor_active" or not np.isnan(value)
+            }
+            return min(max(elapsed, 0.0), MAX_STEP_SECONDS), values
+        self.finished = True
+        return None
+
+    def delay(self, elapsed_seconds):
+        """Wall-clock seconds to wait before the next row."""
+        return 0.0 if self.speed is None else elapsed_seconds / self.speed
+
+    def stop(self):
+        self._stop.set()
+
+    def fail(self, exc):
+        """Stops the replay after a read error (malformed row, file removed) and keeps the message."""
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.stop()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def status(self):
+        recorded = None
+        if self.recorded_time is not None:
+            # Plain seconds (e.g. a measurement clock) are shown as they are.
+            recorded = (
+                datetime.fromtimestamp(self.recorded_time).strftime("%Y-%m-%d %H:%M:%S")
+                if self.recorded_time > 10 ** 8 else round(self.recorded_time, 3)
+            )
+        return {
+            "file": str(self.path),
+            "speed": self.speed,
+            "channels": self.channel_map,
+            "rows": self.rows,
+            "passes": self.passes,
+            "recorded_time": recorded,
+            "loop": self.loop,
+            "finished": self.finished,
+            "stopped": self.stopped,
+            "error": self.error,
+        }
@@ -0,0 +1,182 @@
+"""Multi-resolution rollups of the simulation history.
+
+Each resolution keeps one bucket per interval with min/max/mean/last of the
+power and PM10 channels and the on-time fraction of the mist extractor. The
+open bucket of every resolution is updated on each tick from running
+accumulators and appended to a ``HistoryBuffer`` once its interval is over,
+so the cost of a tick does not depend on the amount of history. Charts of
+long time ranges read the coarsest resolution that still gives them enough
+points instead of every raw sample.
+"""
+
+import math
+from datetime import datetime
+
+import numpy as np
+
+from app.services.history_buffer import HistoryBuffer
+
+
+# Resolution in seconds -> number of buckets kept.
+ROLLUP_RESOLUTIONS = {
+    1: 4 * 60 * 60,      # 4 hours
+    10: 24 * 60 * 6,     # 1 day
+    60: 7 * 24 * 60,     # 7 days
+    900: 30 * 24 * 4,    # 30 days
+}
+ROLLUP_CHANNELS = ("Main supply", "Mist extractor", "Chip conveyor", "PM10")
+
+
+def rollup_channels(channels=ROLLUP_CHANNELS):
+    """Buffer channels of a rollup level. The mean is stored under the channel name."""
+    dtypes = {"seq": np.int64, "time": np.float64, "timestamp": "U14", "samples": np.int32}
+    for channel in channels:
+        dtypes[channel] = np.float32
+        for statistic in ("min", "max", "last"):
+            dtypes[f"{channel}_{statistic}"] = np.float32
+    dtypes["on_fraction"] = np.float32
+    return dtypes
+
+
+def select_resolution(span_seconds, max_points, resolutions=ROLLUP_RESOLUTIONS):
+    """Returns the finest rollup resolution that fits ``max_points`` (None: raw samples)."""
+    if span_seconds <= max_points or not resolutions:
+        return None
+    for resolution in sorted(resolutions):
+        if span_seconds / resolution <= max_points:
+            return resolution
+    return max(resolutions)
+
+
+class RollupLevel:
+    def __init__(self, resolution, capacity, width=1, channels=ROLLUP_CHANNELS):
+        self.resolution = resolution
+        self.channels = tuple(channels)
+        self.buffer = HistoryBuffer(capacity, width, rollup_channels(self.channels))
+        self._bucket = None  # start time of the open bucket
+        self._reset_accumulators(width)
+
+    def _reset_accumulators(self, width):
+        shape = (len(self.channels), width)
+        self._count = np.zeros(width, dtype=np.int64)
+        self._on = np.zeros(width, dtype=np.int64)
+        self._min = np.full(shape, np.inf)
+        self._max = np.full(shape, -np.inf)
+        self._sum = np.zeros(shape)
+        self._last = np.zeros(shape)
+
+    def add_columns(self, count):
+        self.buffer.add_columns(count)
+        shape = (len(self.channels), count)
+        self._count = np.append(self._count, np.zeros(count, dtype=np.int64))
+        self._on = np.append(self._on, np.zeros(count, dtype=np.int64))
+        self._min = np.hstack((self._min, np.full(shape, np.inf)))
+        self._max = np.hstack((self._max, np.full(shape, -np.inf)))
+        self._sum = np.hstack((self._sum, np.zeros(shape)))
+        self._last = np.hstack((self._last, np.zeros(shape)))
+
+    def add(self, timestamp, values, active):
+        """Adds one tick; ``values`` has one row per channel and one column per machine."""
+        bucket = math.floor(timestamp / self.resolution) * self.resolution
+        if self._bucket is not None and bucket != self._bucket:
+            self.buffer.append(self._open_row())
+            self._reset_accumulators(self.buffer.width)
+        self._bucket = bucket
+        self._count += 1
+        self._on += active
+        np.minimum(self._min, values, out=self._min)
+        np.maximum(self._max, values, out=self._max)
+        self._sum += values
+        self._last[:] = values
+
+    def _open_row(self):
+        count = np.maximum(self._count, 1)
+        row = {
+            "time": self._bucket,
+            "timestamp": self._format_time(self._bucket),
+            "samples": self._count.copy(),
+            "on_fraction": self._on / count,
+        }
+        for position, channel in enumerate(self.channels):
+            row[channel] = self._sum[position] / count
+            row[f"{channel}_min"] = self._min[position].copy()
+            row[f"{channel}_max"] = self._max[position].copy()
+            row[f"{channel}_last"] = self._last[position].copy()
+        return row
+
+    def _format_time(self, timestamp):
+        moment = datetime.fromtimestamp(timestamp)
+        return moment.strftime("%H:%M:%S" if self.resolution < 60 else "%d.%m. %H:%M")
+
+    def clear(self, column=None):
+        self.buffer.clear(column)
+        if column is None:
+            self._bucket = None
+            self._reset_accumulators(self.buffer.width)
+            return
+        self._count[column] = 0
+        self._on[column] = 0
+        self._min[:, column] = np.inf
+        self._max[:, column] = -np.inf
+        self._sum[:, column] = 0.0
+        self._last[:, column] = 0.0
+
+    def view(self):
+        """Returns an immutable view including the open bucket (see ``HistoryBuffer.view``)."""
+        open_row = self._open_row() if self._bucket is not None else None
+        return RollupView(self.buffer.view(), open_row, self._count > 0)
+
+    def snapshot(self, column=0, limit=None):
+        """Returns the newest ``limit`` buckets of one machine, including the open one."""
+        return self.view().snapshot(column, limit)
+
+
+class RollupView:
+    def __init__(self, history, open_row, has_open):
+        self.history = history
+        self._open_row = open_row
+        self._has_open = has_open
+
+    def snapshot(self, column=0, limit=None):
+        has_open = self._open_row is not None and bool(self._has_open[column])
+        closed_limit = None if limit is None else max(0, limit - has_open)
+        columns = self.history.snapshot(column, closed_limit)
+        if has_open:
+            row = self._open_row
+            for name, values in columns.items():
+                if name == "seq":
+                    value = self.history.last_seq + 1
+                else:
+                    value = row[name][column] if np.ndim(row[name]) else row[name]
+                columns[name] = np.append(values, np.array([value], dtype=values.dtype))
+        return columns
+
+
+class RollupSet:
+    def __init__(self, width=1, resolutions=None, channels=ROLLUP_CHANNELS):
+        self.channels = tuple(channels)
+        self.levels = {
+            resolution: RollupLevel(resolution, capacity, width, self.channels)
+            for resolution, capacity in (resolutions or ROLLUP_RESOLUTIONS).items()
+        }
+
+    def add(self, sample):
+        """Updates every resolution with one fleet tick."""
+        values = np.array([sample[channel] for channel in self.channels], dtype=np.float64)
+        active = np.asarray(sample["mist_extractor_active"], dtype=np.int64)
+        for level in self.levels.values():
+            level.add(sample["time"], values, active)
+
+    def add_columns(self, count):
+        for level in self.levels.values():
+            level.add_columns(count)
+
+    def clear(self, column=None):
+        for level in self.levels.values():
+            level.clear(column)
+
+    def snapshot(self, resolution, column=0, limit=None):
+        return self.levels[resolution].snapshot(column, limit)
+
+    def views(self):
+        return {resolution: level.view() for resolution, level in self.levels.items()}
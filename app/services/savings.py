@@ -0,0 +1,159 @@
+"""Energy comparison of mist extractor control strategies.
+
+Compares an always-on mist extractor with demand-oriented two-point control
+over a grid of PM10 rise rates, fall rates and threshold pairs. Every grid
+point is simulated with the batch engine of :mod:`app.services.simulation`.
+The grid is split into chunks that run on a process pool, and finished
+sweeps are cached on disk, keyed by a hash of all parameters.
+"""
+
+import hashlib
+import json
+import os
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+from app.services.simulation import (
+    PM10_OFF_THRESHOLD,
+    PM10_ON_THRESHOLD,
+    POWER_LEVELS,
+    simulate,
+)
+from app.services.workers import map_chunks
+
+
+_APP_ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = _APP_ROOT / ".cache" / "savings"
+
+# Bump when the simulation model changes so stale cache entries are ignored.
+MODEL_VERSION = 1
+
+EXTRACTOR_POWER = POWER_LEVELS["Mist extractor"][0]  # W, always-on baseline
+
+RESULT_COLUMNS = (
+    "rise_rate",
+    "fall_rate",
+    "on_threshold",
+    "off_threshold",
+    "on_fraction",
+    "mean_pm10",
+    "always_on_wh",
+    "two_point_wh",
+    "savings_wh",
+    "savings_percent",
+)
+
+
+def evaluate_strategies(rise_rate, fall_rate, on_threshold=PM10_ON_THRESHOLD,
+                        off_threshold=PM10_OFF_THRESHOLD, duration=3600.0, dt=1.0,
+                        seed=0, min_run_time=0.0):
+    """Simulates one parameter set and returns the energy of both strategies."""
+    series = simulate(
+        duration,
+        dt=dt,
+        rise_rate=rise_rate,
+        fall_rate=fall_rate,
+        on_threshold=on_threshold,
+        off_threshold=off_threshold,
+        min_run_time=min_run_time,
+        initial_pm10=off_threshold,  # start in steady state, not from clean air
+        seed=seed,
+        include_power=False,
+    )
+    on_fraction = float(series["mist_extractor_active"].mean())
+    always_on_wh = EXTRACTOR_POWER * duration / 3600.0
+    two_point_wh = always_on_wh * on_fraction
+    return {
+        "rise_rate": rise_rate,
+        "fall_rate": fall_rate,
+        "on_threshold": on_threshold,
+        "off_threshold": off_threshold,
+        "on_fraction": on_fraction,
+        "mean_pm10": float(series["PM10"].mean()),
+        "always_on_wh": always_on_wh,
+        "two_point_wh": two_point_wh,
+        "savings_wh": always_on_wh - two_point_wh,
+        "savings_percent": 100.0 * (1.0 - on_fraction),
+    }
+
+
+def _evaluate_chunk(start, points, duration, dt, seed):
+    """Worker entry point: evaluates a slice of the grid."""
+    rows = []
+    for offset, (rise_rate, fall_rate, on_threshold, off_threshold) in enumerate(points):
+        result = evaluate_strategies(
+            rise_rate, fall_rate, on_threshold, off_threshold,
+            duration=duration, dt=dt, seed=(seed, start + offset),
+        )
+        rows.append([result[column] for column in RESULT_COLUMNS])
+    return start, rows
+
+
+def build_grid(rise_rates, fall_rates, thresholds):
+    """Returns the list of (rise, fall, on, off) points. Invalid bands are skipped."""
+    return [
+        (float(rise), float(fall), float(on), float(off))
+        for rise, fall, (on, off) in product(rise_rates, fall_rates, thresholds)
+        if off < on
+    ]
+
+
+def sweep_key(grid, duration, dt, seed):
+    payload = json.dumps(
+        {"grid": grid, "duration": duration, "dt": dt, "seed": seed, "model": MODEL_VERSION},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _cache_path(key):
+    return CACHE_DIR / f"{key}.npz"
+
+
+def load_cached_sweep(key):
+    """Returns the cached sweep result as a dict of columns, or None."""
+    path = _cache_path(key)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            return {column: data[column] for column in RESULT_COLUMNS}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _store_sweep(key, result):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _cache_path(key)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(tmp_path, **result)
+    os.replace(tmp_path, path)
+
+
+def run_sweep(grid, duration=3600.0, dt=1.0, seed=0, chunk_size=None):
+    """Evaluates the grid on the process pool.
+
+    Generator yielding ``(done, total, result)``. ``result`` is None while the
+    sweep is running and the final dict of columns on the last item. Cached
+    sweeps complete immediately.
+    """
+    total = len(grid)
+    key = sweep_key(grid, duration, dt, seed)
+    cached = load_cached_sweep(key)
+    if cached is not None:
+        yield total, total, cached
+        return
+
+    values = np.empty((total, len(RESULT_COLUMNS)), dtype=np.float64)
+    done = 0
+    for start, rows in map_chunks(_evaluate_chunk, grid, duration, dt, seed, chunk_size=chunk_size):
+        values[start:start + len(rows)] = rows
+        done += len(rows)
+        if done < total:
+            yield done, total, None
+
+    result = {column: values[:, i] for i, column in enumerate(RESULT_COLUMNS)}
+    _store_sweep(key, result)
+    yield total, total, result
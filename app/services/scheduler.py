@@ -0,0 +1,111 @@
+"""Deadline-based scheduling of the simulation tick.
+
+Ticks are due on absolute deadlines ``start + n * period``, so the cost of a
+tick does not add up to a drift of the sample rate. When the generator
+thread wakes up after one or more deadlines have passed (a slow tick, a GC
+pause, a suspended machine), the missed deadlines are counted and handled by
+the catch-up policy: ``skip`` runs a single tick and drops the missed
+intervals, ``batch`` simulates every missed interval (at most
+``MAX_CATCH_UP_SECONDS`` worth of them, the rest is dropped).
+
+Only the generator thread (``next_ticks``) touches the deadline. Rate
+changes and restarts from other threads set a flag it consumes on its
+next call, so they cannot clear the deadline while it is in use.
+"""
+
+import threading
+import time
+
+
+MIN_RATE_HZ = 0.1
+MAX_RATE_HZ = 100.0
+DEFAULT_RATE_HZ = 1.0
+CATCH_UP_POLICIES = ("skip", "batch")
+MAX_CATCH_UP_SECONDS = 60.0
+
+
+class TickScheduler:
+    def __init__(self, rate_hz=DEFAULT_RATE_HZ, catch_up="skip", clock=time.monotonic):
+        self._clock = clock
+        self._wakeup = threading.Event()
+        self.rate_hz = DEFAULT_RATE_HZ
+        self.catch_up = "skip"
+        self.deadline = None
+        self._restart = False
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.skipped_ticks = 0
+        self.batched_ticks = 0
+        self.last_lateness = 0.0
+        self.configure(rate_hz, catch_up)
+
+    @property
+    def period(self):
+        return 1.0 / self.rate_hz
+
+    def configure(self, rate_hz=None, catch_up=None):
+        """Changes the rate and/or policy. Raises ValueError if out of range."""
+        rate_hz = self.rate_hz if rate_hz is None else float(rate_hz)
+        catch_up = self.catch_up if catch_up is None else catch_up
+        if not MIN_RATE_HZ <= rate_hz <= MAX_RATE_HZ:
+            raise ValueError(f"The sample rate must be between {MIN_RATE_HZ} and {MAX_RATE_HZ} Hz")
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy '{catch_up}', expected one of {CATCH_UP_POLICIES}")
+        self.rate_hz = rate_hz
+        self.catch_up = catch_up
+        # The new rate starts with a tick right away.
+        self.restart()
+
+    def restart(self):
+        """Schedules the next tick immediately (after a pause or a rate change)."""
+        self._restart = True
+        self._wakeup.set()
+
+    def wake(self):
+        """Interrupts ``next_ticks`` without changing the schedule."""
+        self._wakeup.set()
+
+    def next_ticks(self):
+        """Waits for the next deadline and returns ``(ticks, lateness)``.
+
+        ``ticks`` is the number of intervals to simulate now (0 if the wait
+        was interrupted), ``lateness`` the seconds since the deadline.
+        """
+        now = self._clock()
+        if self._restart:
+            self._restart = False
+            self.deadline = None
+        if self.deadline is None:
+            self.deadline = now
+        if now < self.deadline:
+            self._wakeup.wait(self.deadline - now)
+            self._wakeup.clear()
+            now = self._clock()
+            if self._restart or now < self.deadline:
+                return 0, 0.0
+        period = self.period
+        lateness = now - self.deadline
+        due = 1 + int(lateness // period)
+        self.deadline += due * period
+        missed = due - 1
+        ticks = 1
+        if missed and self.catch_up == "batch":
+            ticks = min(due, max(1, int(MAX_CATCH_UP_SECONDS / period)))
+        self.ticks += ticks
+        self.missed_deadlines += missed
+        self.batched_ticks += ticks - 1
+        self.skipped_ticks += due - ticks
+        self.last_lateness = lateness
+        return ticks, lateness
+
+    def status(self):
+        return {
+            "rate_hz": self.rate_hz,
+            "period_s": self.period,
+            "catch_up": self.catch_up,
+            "ticks": self.ticks,
+            "missed_deadlines": self.missed_deadlines,
+            "skipped_ticks": self.skipped_ticks,
+            "batched_ticks": self.batched_ticks,
+            "last_lateness_s": round(self.last_lateness, 6),
+        }
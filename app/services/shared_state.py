@@ -0,0 +1,485 @@
+"""Simulation state in shared memory for multi-process deployments.
+
+One writer process runs the tick (``FACTORYX_SHARED_STATE=writer``) and
+publishes every snapshot into a named ``multiprocessing.shared_memory``
+segment. Any number of reader processes (``FACTORYX_SHARED_STATE=reader``,
+e.g. ``uvicorn --workers N`` or further Streamlit servers) serve the API and
+the UI from it, so reads scale across cores instead of sharing one GIL.
+
+The segment holds a header, the columns of the history ring buffer
+(allocated for ``max_machines`` columns, so adding a machine never moves
+them) and the rest of the snapshot (machine states, control metadata,
+energy summaries, scheduler/replay/ingest status) as one JSON document.
+
+Snapshots are published under a sequence lock: the writer makes the counter
+odd, writes the header fields and the JSON document and makes the counter
+even again. Readers copy those fields and retry if the counter was odd or
+changed meanwhile, so they get a consistent snapshot without a lock and
+never hold up the writer. History rows are copied from the segment when a
+view is read, which can be several ticks later. The writer therefore
+announces each row before writing it and counts full clears; after copying,
+a view checks that none of its rows was overwritten meanwhile and otherwise
+repeats the read on the newest snapshot. The protocol relies on the stores
+of the writer becoming visible in order, which holds on x86 and, through
+the interpreter's own synchronisation, in practice for CPython elsewhere.
+
+The header holds the pid of the writer; a second writer refuses to take
+over a segment whose writer process is still alive.
+
+Readers do not change the simulation themselves: methods marked with
+``writer_command`` are forwarded to the writer over a
+``multiprocessing.connection`` socket whose address and random key the
+writer puts into the segment.
+"""
+
+import atexit
+import functools
+import os
+import secrets
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError, resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+import orjson
+
+from app.services.history_buffer import HISTORY_CHANNELS, SHARED_CHANNELS, HistoryBuffer, HistoryView
+from app.services.snapshots import ServiceSnapshot
+
+
+SHARED_ROLES = ("", "writer", "reader")
+META_BYTES = 64 * 1024  # JSON document, plus META_BYTES_PER_MACHINE per machine
+META_BYTES_PER_MACHINE = 16 * 1024
+POLL_INTERVAL = 0.01  # seconds between checks for a new tick in reader processes
+REATTACH_AFTER = 5.0  # seconds without a new snapshot until a reader looks for a restarted writer
+
+# Header fields (int64 each). _WRITING is the seq of the row being written
+# (announced before the row), _CLEARS counts clears of the whole history and
+# _SNAPSHOT_CLEARS is that count as of the published snapshot.
+(_LOCK, _TOKEN, _CAPACITY, _MAX_WIDTH, _META_BYTES, _WIDTH, _CURSOR, _LAST_SEQ, _VERSION, _META_LENGTH,
+ _PID, _WRITING, _CLEARS, _SNAPSHOT_CLEARS) = range(14)
+_HEADER_FIELDS = 16
+_KEY_BYTES = 32
+_ADDRESS_BYTES = 256
+
+
+def _align(position, alignment=64):
+    return -(-position // alignment) * alignment
+
+
+def _shape(name, capacity, max_width):
+    return (capacity,) if name in SHARED_CHANNELS else (capacity, max_width)
+
+
+def _layout(capacity, max_width, meta_bytes):
+    """Returns ``(offsets, size)`` of the regions of a segment."""
+    position = _HEADER_FIELDS * 8
+    offsets = {"key": position, "address": position + _KEY_BYTES}
+    position += _KEY_BYTES + _ADDRESS_BYTES
+    offsets["filled"] = position = _align(position)
+    position += 8 * max_width
+    for name, dtype in HISTORY_CHANNELS.items():
+        offsets[name] = position = _align(position)
+        position += np.dtype(dtype).itemsize * int(np.prod(_shape(name, capacity, max_width)))
+    offsets["meta"] = position = _align(position)
+    return offsets, position + meta_bytes
+
+
+def _map(buffer, capacity, max_width, meta_bytes):
+    """Returns the regions of a segment as ``(header, filled, columns, meta)`` arrays."""
+    offsets, _ = _layout(capacity, max_width, meta_bytes)
+    header = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=buffer)
+    filled = np.ndarray((max_width,), np.int64, buffer=buffer, offset=offsets["filled"])
+    columns = {
+        name: np.ndarray(_shape(name, capacity, max_width), dtype, buffer=buffer, offset=offsets[name])
+        for name, dtype in HISTORY_CHANNELS.items()
+    }
+    meta = np.ndarray((meta_bytes,), np.uint8, buffer=buffer, offset=offsets["meta"])
+    return header, filled, columns, meta
+
+
+def _attach(name):
+    """Opens an existing segment without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    # Older versions register every opened segment with the resource tracker,
+    # which unlinks it when this process exits (or the writer's entry is lost
+    # if both share a tracker).
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, but belongs to another user
+        return True
+    return True
+
+
+def default_address(name):
+    return os.path.join(tempfile.gettempdir(), f"{name}.sock")
+
+
+class SharedHistoryBuffer(HistoryBuffer):
+    """``HistoryBuffer`` whose columns live in a shared memory segment.
+
+    The machine channels are allocated for ``max_width`` columns and never
+    move; adding machines widens the used part of them. Rows and clears are
+    announced in ``header`` for the readers' ``SharedHistoryView``s.
+    """
+
+    def __init__(self, columns, capacity, width, max_width, header):
+        super().__init__(capacity, width=0)
+        self.max_width = max_width
+        self.width = int(width)
+        self._full = columns
+        self._use_width(self.width)
+        self._filled = np.zeros(self.width, dtype=np.int64)
+        self._header = header
+
+    def _reserve(self, width):
+        if width > self.max_width:
+            raise ValueError(f"The shared state holds at most {self.max_width} machines")
+
+    def append(self, sample):
+        self._header[_WRITING] = self.last_seq + 1
+        return super().append(sample)
+
+    def clear(self, column=None):
+        if column is None:  # the next rows go to the start of the arrays
+            self._header[_CLEARS] += 1
+        super().clear(column)
+
+    def position(self):
+        """Returns ``(cursor, last_seq, filled, clears)`` as exposed by ``view()``."""
+        return (
+            self._cursor, self.last_seq, np.minimum(self._filled, self.capacity - 1), int(self._header[_CLEARS]),
+        )
+
+
+class SharedHistoryView(HistoryView):
+    """``HistoryView`` of a shared segment that detects rows the writer overwrote while they were read.
+
+    The writer may have written several ticks since the snapshot was
+    published. If that reached a row of the view, the read is repeated on
+    the reader's newest snapshot, so the result is consistent but may be
+    newer than the snapshot it was asked from.
+    """
+
+    def __init__(self, reader, header, clears, *args):
+        super().__init__(*args)
+        self._reader = reader
+        self._header = header
+        self._clears = clears
+
+    def _intact(self, rows):
+        """Whether the newest ``rows`` rows of the view have not been overwritten so far."""
+        written = int(self._header[_WRITING]) - self.last_seq
+        return int(self._header[_CLEARS]) == self._clears and written <= self.capacity - rows
+
+    def snapshot(self, column=0, limit=None, channels=None, after=None):
+        view = self
+        while True:
+            snapshot = HistoryView.snapshot(view, column, limit, channels, after)
+            count, skip_newest = view._window(column, limit, after)
+            if view._intact(count + skip_newest):
+                return snapshot
+            self._reader.retries += 1
+            view = self._reader.snapshot().history
+
+    def latest(self, column=0):
+        view = self
+        while True:
+            latest = HistoryView.latest(view, column)
+            if view._intact(1):
+                return latest
+            self._reader.retries += 1
+            view = self._reader.snapshot().history
+
+
+class SharedEnergyView:
+    """Energy summaries published by the writer, in place of an ``EnergyView``."""
+
+    def __init__(self, summaries):
+        self.summaries = summaries
+
+    def summary(self, column=0):
+        return dict(self.summaries[column])
+
+
+class SharedStateWriter:
+    """Owns the segment and publishes the snapshots of the writer process."""
+
+    def __init__(self, name, capacity, max_machines, width, address=None):
+        if width > max_machines:
+            raise ValueError(f"The shared state holds at most {max_machines} machines")
+        self.name = name
+        self.max_machines = max_machines
+        meta_bytes = META_BYTES + META_BYTES_PER_MACHINE * max_machines
+        _, size = _layout(capacity, max_machines, meta_bytes)
+        try:
+            existing = _attach(name)
+        except FileNotFoundError:
+            pass
+        else:
+            owner = int(np.ndarray((_HEADER_FIELDS,), np.int64, buffer=existing.buf)[_PID])
+            existing.close()
+            if owner and owner != os.getpid() and _alive(owner):
+                raise RuntimeError(f"Shared state '{name}' is in use by the writer process {owner}")
+            existing.unlink()  # left over by a writer that did not shut down
+        self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._header, self._filled, columns, self._meta = _map(self._memory.buf, capacity, max_machines, meta_bytes)
+        self._header[_CAPACITY] = capacity
+        self._header[_MAX_WIDTH] = max_machines
+        self._header[_META_BYTES] = meta_bytes
+        self.authkey = secrets.token_bytes(_KEY_BYTES)
+        self.address = address or default_address(name)
+        offsets, _ = _layout(capacity, max_machines, meta_bytes)
+        self._memory.buf[offsets["key"]:offsets["key"] + _KEY_BYTES] = self.authkey
+        encoded = self.address.encode()
+        if len(encoded) > _ADDRESS_BYTES:
+            raise ValueError(f"The command address is longer than {_ADDRESS_BYTES} bytes")
+        self._memory.buf[offsets["address"]:offsets["address"] + len(encoded)] = encoded
+        self._header[_PID] = os.getpid()
+        # Written last: readers ignore the segment until it is set.
+        self._header[_TOKEN] = secrets.randbits(63) or 1
+        self.history = SharedHistoryBuffer(columns, capacity, width, max_machines, self._header)
+        self._command_server = None
+        atexit.register(self.close)
+
+    def check_width(self, width):
+        """Raises ValueError if the segment has no room for ``width`` machines."""
+        if width > self.max_machines:
+            raise ValueError(f"The shared state holds at most {self.max_machines} machines")
+
+    def publish(self, snapshot, status):
+        """Writes a snapshot of ``self.history`` and its state. Call with the state lock held."""
+        meta = orjson.dumps({
+            "machine_ids": snapshot.machine_ids,
+            "states": snapshot.states,
+            "metadata": snapshot.metadata,
+            "energy": [snapshot.energy.summary(index) for index in range(len(snapshot.machine_ids))],
+            "status": status,
+        }, option=orjson.OPT_SERIALIZE_NUMPY)
+        if len(meta) > len(self._meta):
+            raise ValueError(f"The shared snapshot needs {len(meta)} bytes, {len(self._meta)} are reserved")
+        cursor, last_seq, filled, clears = self.history.position()
+        header = self._header
+        header[_LOCK] += 1  # odd: readers retry
+        header[_WIDTH] = len(filled)
+        header[_CURSOR] = cursor
+        header[_LAST_SEQ] = last_seq
+        header[_VERSION] = snapshot.version
+        header[_SNAPSHOT_CLEARS] = clears
+        self._filled[:len(filled)] = filled
+        self._meta[:len(meta)] = np.frombuffer(meta, np.uint8)
+        header[_META_LENGTH] = len(meta)
+        header[_LOCK] += 1
+
+    def serve_commands(self, service):
+        """Runs forwarded ``writer_command`` calls of reader processes on ``service``."""
+        if self._command_server is None:
+            self._command_server = CommandServer(service, self.address, self.authkey)
+
+    def close(self):
+        if self._command_server is not None:
+            self._command_server.close()
+            self._command_server = None
+        if self._memory is not None:
+            memory, self._memory = self._memory, None
+            memory.unlink()
+
+
+class SharedStateReader:
+    """Reads the snapshots a ``SharedStateWriter`` publishes, without locking."""
+
+    def __init__(self, name):
+        self.name = name
+        self.retries = 0  # reads repeated because the writer was publishing
+        self._retired = []  # earlier segments, kept mapped for views still in use
+        self._memory = None
+        self.token = None
+        deadline = time.monotonic() + REATTACH_AFTER
+        while not self._reattach():
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"No shared state '{name}' found; start the writer process first")
+            time.sleep(POLL_INTERVAL)
+
+    def _reattach(self):
+        """Switches to the segment of a (re)started writer. Returns False if there is none."""
+        self._changed = time.monotonic()
+        try:
+            memory = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        token = int(np.ndarray((_HEADER_FIELDS,), np.int64, buffer=memory.buf)[_TOKEN])
+        if not token or token == self.token:  # still being set up, or the same writer
+            memory.close()
+            return False
+        self._use(memory, token)
+        return True
+
+    def _use(self, memory, token):
+        header = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=memory.buf)
+        capacity, max_width, meta_bytes = (int(header[field]) for field in (_CAPACITY, _MAX_WIDTH, _META_BYTES))
+        offsets, _ = _layout(capacity, max_width, meta_bytes)
+        if self._memory is not None:
+            self._retired.append(self._memory)
+        self._memory = memory
+        self._header, self._filled, self._columns, self._meta = _map(memory.buf, capacity, max_width, meta_bytes)
+        self.capacity = capacity
+        self.token = token
+        self.authkey = bytes(memory.buf[offsets["key"]:offsets["key"] + _KEY_BYTES])
+        self.address = bytes(memory.buf[offsets["address"]:offsets["address"] + _ADDRESS_BYTES]).rstrip(b"\0").decode()
+        self._lock_seen = None
+        self._snapshot = None
+        self._status = None
+        self._changed = time.monotonic()
+
+    def _read(self):
+        while True:
+            header = self._header
+            lock = int(header[_LOCK])
+            if lock == self._lock_seen:
+                if time.monotonic() - self._changed > REATTACH_AFTER and self._reattach():
+                    continue
+                return
+            if lock & 1:
+                self.retries += 1
+                time.sleep(0)
+                continue
+            width, cursor, last_seq, version, length, clears = (
+                int(header[field]) for field in (_WIDTH, _CURSOR, _LAST_SEQ, _VERSION, _META_LENGTH, _SNAPSHOT_CLEARS)
+            )
+            filled = self._filled[:width].copy()
+            meta = self._meta[:length].tobytes()
+            if int(header[_LOCK]) != lock:
+                self.retries += 1
+            elif not length:  # created, but nothing published yet
+                time.sleep(POLL_INTERVAL)
+            else:
+                break
+        state = orjson.loads(meta)
+        columns = {
+            name: values if name in SHARED_CHANNELS else values[:, :width]
+            for name, values in self._columns.items()
+        }
+        self._snapshot = ServiceSnapshot(
+            last_seq,
+            version,
+            state["machine_ids"],
+            state["states"],
+            state["metadata"],
+            SharedHistoryView(self, header, clears, columns, self.capacity, cursor, last_seq, filled),
+            {},  # rollups stay in the writer; long ranges are read from the store
+            SharedEnergyView(state["energy"]),
+        )
+        self._status = state["status"]
+        self._lock_seen = lock
+        self._changed = time.monotonic()
+
+    def snapshot(self):
+        """Returns the latest published ``ServiceSnapshot``."""
+        self._read()
+        return self._snapshot
+
+    def status(self):
+        """Returns the scheduler, replay and ingest status published with the snapshot."""
+        self._read()
+        return self._status
+
+
+class CommandServer:
+    """Accepts forwarded commands of reader processes (one thread per connection)."""
+
+    def __init__(self, service, address, authkey):
+        if os.path.exists(address):
+            os.unlink(address)
+        self.service = service
+        self._listener = Listener(address, family="AF_UNIX", authkey=authkey)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):  # closed, or a client with the wrong key
+                if self._listener is None:
+                    return
+                continue
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    name, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                method = getattr(type(self.service), name, None)
+                if not getattr(method, "writer_command", False):
+                    connection.send(("error", ValueError(f"Unknown command '{name}'")))
+                    continue
+                try:
+                    connection.send(("ok", getattr(self.service, name)(*args, **kwargs)))
+                except Exception as exc:
+                    connection.send(("error", exc))
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        listener.close()
+
+
+class CommandClient:
+    """Forwards commands of a reader process to the writer (one connection, serialized)."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def call(self, name, *args, **kwargs):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._connection is None:
+                        self._connection = Client(self.reader.address, family="AF_UNIX", authkey=self.reader.authkey)
+                    self._connection.send((name, args, kwargs))
+                    break
+                except OSError:
+                    # Stale connection of a restarted writer: the command was not sent yet.
+                    self._connection = None
+                    if attempt:
+                        raise
+            try:
+                status, result = self._connection.recv()
+            except (EOFError, OSError):
+                self._connection = None
+                raise
+        if status == "error":
+            raise result
+        return result
+
+
+def writer_command(method):
+    """Marks a state-changing service method; reader processes forward it to the writer."""
+
+    @functools.wraps(method)
+    def forward(service, *args, **kwargs):
+        if service.command_client is not None:
+            return service.command_client.call(method.__name__, *args, **kwargs)
+        return method(service, *args, **kwargs)
+
+    forward.writer_command = True
+    return forward
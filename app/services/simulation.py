@@ -0,0 +1,198 @@
+"""Two-point controller simulation engine.
+
+The PM10 two-point controller switches the mist extractor on when PM10
+reaches the upper threshold and off when it falls back to the lower one.
+This module holds the stepping rule shared by the live fleet tick
+(:func:`step`, vectorized over machines) and the batch engine
+(:func:`simulate`, one machine over many time steps). The batch engine does
+not loop per time step: within a phase PM10 is a cumulative sum of the noisy
+increments, so each phase is computed with one ``cumsum`` and the switching
+point is located with the same rule :func:`step` applies. Hours or days of
+simulated time take milliseconds.
+
+Both paths draw their noise from a ``numpy.random.Generator``; passing a seed
+makes a batch run fully reproducible.
+"""
+
+import math
+
+import numpy as np
+
+
+# Two-point controller thresholds in mg/m3
+PM10_ON_THRESHOLD = 3.0
+PM10_OFF_THRESHOLD = 2.0
+
+# Nominal power draw [W] and uniform noise amplitude per consumer
+POWER_LEVELS = {
+    "Main supply": (4200, 50),
+    "Mist extractor": (385, 5),
+    "Chip conveyor": (260, 10),
+}
+
+# The rates are maximum rates per second, so the random factor never exceeds 1.0.
+NOISE_LOW = 0.9
+NOISE_HIGH = 1.0
+
+# Phases up to this many steps are stepped with a scalar loop in simulate().
+_SHORT_PHASE = 32
+
+
+def noise_factors(rng, size):
+    """Draws the random rate factors for ``size`` steps or machines."""
+    return rng.uniform(NOISE_LOW, NOISE_HIGH, size)
+
+
+def _phase_ends(pm10, active, on_threshold, off_threshold):
+    """True where PM10 reaches the threshold of the current phase.
+
+    ``active`` is a single state here; ``pm10`` may be a scalar or an array.
+    """
+    return pm10 <= off_threshold if active else pm10 >= on_threshold
+
+
+def _switches(pm10, active, on_threshold, off_threshold):
+    """Per-machine version of :func:`_phase_ends` for arrays of states."""
+    return np.where(active, pm10 <= off_threshold, pm10 >= on_threshold)
+
+
+def _switch_value(active, on_threshold, off_threshold):
+    """PM10 is clamped to the threshold that triggered the switch."""
+    return np.where(active, off_threshold, on_threshold)
+
+
+def step(pm10, active, run_time, rise_rate, fall_rate, elapsed_seconds, factor,
+         on_threshold=PM10_ON_THRESHOLD, off_threshold=PM10_OFF_THRESHOLD, min_run_time=0.0):
+    """Advances the controller of several machines by one step.
+
+    All arguments may be arrays with one entry per machine. ``run_time`` is
+    the time the extractor has been running in its current on-phase; it is
+    not switched off before ``min_run_time`` has passed. Returns the new
+    ``(pm10, active, run_time)`` arrays.
+    """
+    rate = np.where(active, -fall_rate, rise_rate)
+    new_pm10 = pm10 + rate * elapsed_seconds * factor
+    run_time = np.where(active, run_time + elapsed_seconds, 0.0)
+    switch = _switches(new_pm10, active, on_threshold, off_threshold) & (~active | (run_time >= min_run_time))
+    # PM10 is clamped to the threshold crossed in this step. After a minimum
+    # run below the switch-off threshold it keeps its value.
+    clamp = switch & np.where(active, pm10 > off_threshold, True)
+    new_pm10 = np.where(clamp, _switch_value(active, on_threshold, off_threshold), new_pm10)
+    return np.maximum(new_pm10, 0.0), active ^ switch, np.where(switch, 0.0, run_time)
+
+
+def power_draw(active, rng, levels=None):
+    """Draws the effective power of each consumer for the given extractor states."""
+    levels = POWER_LEVELS if levels is None else levels
+    size = np.shape(active)
+    power = {}
+    for channel, (nominal, noise) in levels.items():
+        values = nominal + rng.integers(-noise, noise + 1, size)
+        if channel == "Mist extractor":
+            values = np.where(active, values, 0)
+        power[channel] = values
+    return power
+
+
+def _steps_to_cross(distance, rate, dt):
+    """Upper bound for the number of steps needed to cover ``distance``."""
+    if rate <= 0.0:
+        return None
+    return max(1, math.ceil(distance / (rate * dt * NOISE_LOW)) + 1)
+
+
+def _min_run_steps(min_run_time, dt):
+    """Number of steps after switching on until ``min_run_time`` has passed.
+
+    Accumulates ``dt`` exactly like the ``run_time`` of :func:`step`.
+    """
+    steps, run_time = 1, dt
+    while run_time < min_run_time:
+        run_time += dt
+        steps += 1
+    return steps
+
+
+def simulate(duration, dt=1.0, rise_rate=0.05, fall_rate=0.15,
+             on_threshold=PM10_ON_THRESHOLD, off_threshold=PM10_OFF_THRESHOLD,
+             min_run_time=0.0, power_levels=None, initial_pm10=0.0, initial_active=False,
+             seed=None, include_power=True):
+    """Simulates one machine for ``duration`` seconds with step size ``dt``.
+
+    Returns a dict of arrays with one entry per step: ``time`` (seconds since
+    start), ``PM10``, ``mist_extractor_active`` and, if ``include_power`` is
+    set, the power channels of :data:`POWER_LEVELS` (or ``power_levels``).
+    The result matches calling :func:`step` once per step with the same
+    noise factors.
+    """
+    count = int(round(duration / dt))
+    rng = np.random.default_rng(seed)
+    factors = noise_factors(rng, count)
+    factor_list = factors.tolist()
+    pm10 = np.empty(count, dtype=np.float64)
+    active = np.empty(count, dtype=np.bool_)
+    min_steps = _min_run_steps(min_run_time, dt)
+
+    value = float(initial_pm10)
+    state = bool(initial_active)
+    phase_steps = 0  # steps already taken in the current phase
+    index = 0
+    while index < count:
+        if state:
+            rate, distance = fall_rate, value - off_threshold
+            earliest = max(1, min_steps - phase_steps)  # first step allowed to switch off
+        else:
+            rate, distance = rise_rate, on_threshold - value
+            earliest = 1
+        bound = _steps_to_cross(max(distance, 0.0), rate, dt)
+        stop = count if bound is None else min(count, index + max(bound, earliest))
+        increment = (-fall_rate if state else rise_rate) * dt
+
+        # Sequential sums, identical to applying step() once per step. Short
+        # phases (fast rates) are cheaper as a scalar loop than as array calls.
+        if stop - index <= _SHORT_PHASE:
+            end = index
+            next_value = value
+            while end < stop:
+                next_value = value + increment * factor_list[end]
+                if end - index + 1 >= earliest and _phase_ends(next_value, state, on_threshold, off_threshold):
+                    break
+                value = next_value
+                pm10[end] = max(value, 0.0)
+                end += 1
+            previous = value
+        else:
+            path = increment * factors[index:stop]
+            path[0] = value + path[0]
+            np.cumsum(path, out=path)
+            ends = _phase_ends(path, state, on_threshold, off_threshold)
+            ends[:earliest - 1] = False
+            crossed = np.flatnonzero(ends)
+            end = stop if crossed.size == 0 else index + int(crossed[0])
+            pm10[index:end] = np.maximum(path[:end - index], 0.0)
+            previous = value if end == index else float(path[end - index - 1])
+            next_value = float(path[end - index]) if end < stop else previous
+
+        active[index:end] = state
+        if end < stop:
+            if state and previous <= off_threshold:
+                pm10[end] = max(next_value, 0.0)  # minimum run ended below the threshold
+            else:
+                pm10[end] = on_threshold if not state else off_threshold
+            state = not state
+            active[end] = state
+            end += 1
+            phase_steps = 0
+        else:
+            phase_steps += end - index
+        value = float(pm10[end - 1])
+        index = end
+
+    series = {
+        "time": dt * np.arange(1, count + 1, dtype=np.float64),
+        "PM10": pm10,
+        "mist_extractor_active": active,
+    }
+    if include_power:
+        series.update(power_draw(active, rng, power_levels))
+    return series
@@ -0,0 +1,53 @@
+"""Immutable service snapshots published by reference swap.
+
+The generator thread and the control commands build a new ``ServiceSnapshot``
+while holding the state lock and then replace the published reference in a
+single assignment. Readers (UI fragments, REST handlers, streams) take the
+current reference and read from it without locking, so they never contend
+with the tick or with each other.
+
+Serialized response bodies are memoized on the snapshot, so each payload is
+encoded at most once per tick no matter how many clients ask for it.
+"""
+
+
+class ServiceSnapshot:
+    __slots__ = ("seq", "version", "machine_ids", "states", "metadata", "history", "rollups", "energy", "_index", "_payloads")
+
+    def __init__(self, seq, version, machine_ids, states, metadata, history, rollups, energy):
+        self.seq = seq
+        self.version = version  # increases with every published snapshot (ticks and commands)
+        self.machine_ids = tuple(machine_ids)
+        self.states = tuple(states)  # machine state dicts, one per machine
+        self.metadata = metadata  # machine_id -> control metadata dict
+        self.history = history  # HistoryView
+        self.rollups = rollups  # resolution -> RollupView
+        self.energy = energy  # EnergyView
+        self._index = {machine_id: index for index, machine_id in enumerate(self.machine_ids)}
+        self._payloads = {}
+
+    @property
+    def etag(self):
+        """HTTP entity tag of every response built from this snapshot."""
+        return f'"{self.seq}-{self.version}"'
+
+    def payload(self, key, build):
+        """Returns the cached payload ``key``, building it on first use.
+
+        Concurrent first requests may both build it; the results are equal.
+        """
+        payload = self._payloads.get(key)
+        if payload is None:
+            payload = self._payloads[key] = build()
+        return payload
+
+    def __contains__(self, machine_id):
+        return machine_id in self._index
+
+    def index_of(self, machine_id):
+        """Returns the column of a machine. Raises KeyError if unknown."""
+        return self._index[machine_id]
+
+    def state(self, machine_id):
+        """Returns a copy of the state of one machine."""
+        return dict(self.states[self._index[machine_id]])
@@ -0,0 +1,213 @@
+"""Pluggable sensor sources feeding the ingest queue.
+
+A source pushes ``SensorSample``s into an ``IngestQueue`` from its own
+thread (or the thread of the client library it wraps). The fleet simulation
+stays the fallback source: every machine without recent pushed values is
+simulated by the tick as before.
+
+``BrokerSource`` subscribes to topics of a message broker in the style of
+MQTT or OPC UA subscriptions (``factoryx/<machine_id>/<channel>`` with a
+numeric payload, or ``factoryx/<machine_id>`` with a dict of channels).
+``LocalBroker`` is an in-process broker with the same subscribe/publish
+interface; a client for a real broker only has to provide ``subscribe`` and
+``unsubscribe``. Messages for machines the ``known`` check refuses are
+counted and dropped before they reach the queue, so topics of arbitrary
+machine ids do not end up in the ingest store. ``SensorStandIn`` publishes synthetic sensor values to a
+broker at a fixed rate and replaces real machines in tests and benchmarks.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from app.services.ingest import SensorSample
+
+
+TOPIC_PREFIX = "factoryx"
+
+
+def topic_matches(pattern, topic):
+    """MQTT-style topic match with ``+`` (one level) and ``#`` (rest) wildcards."""
+    pattern_levels = pattern.split("/")
+    topic_levels = topic.split("/")
+    for position, level in enumerate(pattern_levels):
+        if level == "#":
+            return True
+        if position >= len(topic_levels) or level not in ("+", topic_levels[position]):
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class LocalBroker:
+    """In-process publish/subscribe broker; callbacks run in the publisher's thread."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, pattern, callback):
+        with self._lock:
+            self._subscriptions.setdefault(pattern, []).append(callback)
+
+    def unsubscribe(self, pattern, callback):
+        with self._lock:
+            callbacks = self._subscriptions.get(pattern, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, topic, payload):
+        with self._lock:
+            callbacks = [
+                callback for pattern, registered in self._subscriptions.items()
+                if topic_matches(pattern, topic) for callback in registered
+            ]
+            self.published += 1
+        for callback in callbacks:
+            callback(topic, payload)
+
+
+class SensorSource:
+    """Base class of push sources. ``start`` hands over the queue to fill."""
+
+    kind = "push"
+
+    def __init__(self, name):
+        self.name = name
+        self.queue = None
+        self.received = 0
+        self.discarded = 0  # refused by the queue's overflow policy
+        self.invalid = 0
+
+    def start(self, queue):
+        self.queue = queue
+
+    def stop(self):
+        self.queue = None
+
+    def push(self, machine_id, values, timestamp=None):
+        """Hands one sample to the ingest queue. Returns False if it was discarded."""
+        queue = self.queue
+        if queue is None:
+            return False
+        self.received += 1
+        if queue.put(SensorSample(machine_id, values, time.time() if timestamp is None else timestamp)):
+            return True
+        self.discarded += 1
+        return False
+
+    def status(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "running": self.queue is not None,
+            "received": self.received,
+            "discarded": self.discarded,
+            "invalid": self.invalid,
+        }
+
+
+class BrokerSource(SensorSource):
+    kind = "broker"
+
+    def __init__(self, name, broker, prefix=TOPIC_PREFIX, known=None):
+        super().__init__(name)
+        self.broker = broker
+        self.pattern = f"{prefix}/#"
+        self._prefix_levels = len(prefix.split("/"))
+        self.known = known  # machine_id -> bool; None accepts every machine
+        self.unknown_machine = 0
+
+    def start(self, queue):
+        super().start(queue)
+        self.broker.subscribe(self.pattern, self._on_message)
+
+    def stop(self):
+        self.broker.unsubscribe(self.pattern, self._on_message)
+        super().stop()
+
+    def _on_message(self, topic, payload):
+        levels = topic.split("/")[self._prefix_levels:]
+        try:
+            if len(levels) == 1 and isinstance(payload, dict):
+                values = {channel: _value(value) for channel, value in payload.items()}
+            elif len(levels) == 2:
+                values = {levels[1]: _value(payload)}
+            else:
+                raise ValueError(topic)
+        except (TypeError, ValueError):
+            self.invalid += 1
+            return
+        if self.known is not None and not self.known(levels[0]):
+            self.unknown_machine += 1
+            return
+        self.push(levels[0], values)
+
+    def status(self):
+        return {**super().status(), "unknown_machine": self.unknown_machine}
+
+
+def _value(payload):
+    if isinstance(payload, (bytes, str)):
+        payload = payload.decode() if isinstance(payload, bytes) else payload
+        if payload.lower() in ("true", "false"):
+            return payload.lower() == "true"
+        return float(payload)
+    if isinstance(payload, (bool, np.bool_)):
+        return bool(payload)
+    return float(payload)
+
+
+class SensorStandIn:
+    """Publishes synthetic PM10 and power readings for a set of machines."""
+
+    def __init__(self, broker, machine_ids, rate_hz=10.0, prefix=TOPIC_PREFIX, per_channel=False, seed=None):
+        self.broker = broker
+        self.machine_ids = list(machine_ids)
+        self.rate_hz = rate_hz
+        self.prefix = prefix
+        self.per_channel = per_channel
+        self._rng = np.random.default_rng(seed)
+        self._thread = None
+        self._running = False
+        self.published = 0
+
+    def readings(self):
+        """One synthetic reading per machine."""
+        pm10 = self._rng.uniform(0.5, 4.0, len(self.machine_ids))
+        main_supply = self._rng.integers(4150, 4251, len(self.machine_ids))
+        return {
+            machine_id: {"PM10": round(float(pm10[index]), 4), "Main supply": int(main_supply[index])}
+            for index, machine_id in enumerate(self.machine_ids)
+        }
+
+    def publish_once(self):
+        for machine_id, values in self.readings().items():
+            if self.per_channel:
+                for channel, value in values.items():
+                    self.broker.publish(f"{self.prefix}/{machine_id}/{channel}", value)
+                    self.published += 1
+            else:
+                self.broker.publish(f"{self.prefix}/{machine_id}", values)
+                self.published += 1
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        period = 1.0 / self.rate_hz
+        deadline = time.monotonic()
+        while self._running:
+            self.publish_once()
+            deadline += period
+            time.sleep(max(0.0, deadline - time.monotonic()))
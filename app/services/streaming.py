@@ -0,0 +1,103 @@
+"""Fan-out of live samples to SSE and WebSocket subscribers.
+
+The generator thread publishes one serialized payload per subscribed machine
+and tick. Delivery is handed to each subscriber's event loop with a single
+``call_soon_threadsafe`` per loop, so the generator never waits for a client.
+Every subscriber has its own bounded queue: when it is full the oldest
+sample is dropped in favour of the newest one (coalescing), and a subscriber
+that keeps overflowing is disconnected.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+
+STREAM_QUEUE_SIZE = 8
+# Consecutive overflowing publishes after which a subscriber is disconnected.
+MAX_CONSECUTIVE_DROPS = 30
+
+
+class Subscription:
+    def __init__(self, machine_id, queue_size):
+        self.machine_id = machine_id
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.consecutive_drops = 0
+        self.closed = False
+
+    async def get(self):
+        """Returns the next payload, or None once the subscription was closed."""
+        payload = await self.queue.get()
+        return None if self.closed else payload
+
+
+class SnapshotBroadcaster:
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE, max_consecutive_drops=MAX_CONSECUTIVE_DROPS):
+        self.queue_size = queue_size
+        self.max_consecutive_drops = max_consecutive_drops
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self.disconnected = 0
+
+    def subscribe(self, machine_id):
+        """Registers a subscriber. Must be called from the subscriber's event loop."""
+        subscription = Subscription(machine_id, self.queue_size)
+        with self._lock:
+            self._subscriptions[machine_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.machine_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.machine_id]
+
+    def machine_ids(self):
+        """Machines with at least one subscriber."""
+        with self._lock:
+            return list(self._subscriptions)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+    def publish(self, payloads):
+        """Delivers ``{machine_id: payload}`` to all subscribers (any thread)."""
+        by_loop = defaultdict(list)
+        with self._lock:
+            for machine_id, payload in payloads.items():
+                for subscription in self._subscriptions.get(machine_id, ()):
+                    by_loop[subscription.loop].append((subscription, payload))
+        for loop, deliveries in by_loop.items():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, deliveries)
+
+    def _deliver(self, deliveries):
+        # Runs in the subscribers' event loop.
+        for subscription, payload in deliveries:
+            if subscription.closed:
+                continue
+            queue = subscription.queue
+            if queue.full():
+                queue.get_nowait()  # coalesce: keep the newest samples
+                subscription.dropped += 1
+                subscription.consecutive_drops += 1
+                if subscription.consecutive_drops > self.max_consecutive_drops:
+                    self._disconnect(subscription)
+                    continue
+            else:
+                subscription.consecutive_drops = 0
+            queue.put_nowait(payload)
+
+    def _disconnect(self, subscription):
+        subscription.closed = True
+        self.disconnected += 1
+        self.unsubscribe(subscription)
+        # Cancel the handler in case it is stuck writing to a stalled client.
+        if subscription.task is not None:
+            subscription.task.cancel()
@@ -0,0 +1,39 @@
+"""Wakes up async API handlers when the generator thread finishes a tick."""
+
+import asyncio
+import threading
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TickNotifier:
+    def __init__(self):
+        self._waiters = set()
+        self._lock = threading.Lock()
+
+    async def wait(self, timeout):
+        """Waits for the next tick. Returns False if ``timeout`` passed first."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def notify(self):
+        """Called from the generator thread after each tick."""
+        with self._lock:
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        for loop, future in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, future)
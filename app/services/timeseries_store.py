@@ -0,0 +1,385 @@
+"""Append-only on-disk store for the simulation history.
+
+The store is a directory of segments. A segment is a directory with one
+fixed-width binary file per channel (raw NumPy rows, machine channels hold
+one value per machine) and a ``meta.json`` with the machine ids, the row count
+and the covered time and sequence range. New rows are appended to the open
+segment; it is closed and a new one started when it exceeds a size or time
+span, or when the fleet changes. Closed segments are memory-mapped for reads,
+so a range query only touches the segments and channel files it needs.
+After each rotation the oldest closed segments are deleted while the store
+is larger than ``max_bytes`` or they end more than ``max_seconds`` before
+the newest row (None disables a limit), so the open segment can exceed
+``max_bytes`` by at most one segment.
+
+Ticks are handed to ``append`` without any disk I/O. A background writer
+thread collects them and writes one batch per channel every
+``flush_interval`` seconds.
+
+Other processes open the same directory with ``read_only=True``: they never
+write or recover segments and pick up new segments and rows on each query.
+"""
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from app.services.history_buffer import HISTORY_CHANNELS, SHARED_CHANNELS
+
+
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+SEGMENT_MAX_SECONDS = 60 * 60
+MAX_BYTES = 2 * 1024 ** 3  # whole store
+MAX_SECONDS = 30 * 24 * 60 * 60
+FLUSH_INTERVAL = 5.0  # seconds between background writes
+
+_META_FILE = "meta.json"
+
+
+class Segment:
+    def __init__(self, path, machine_ids, channels, rows=0, start_seq=None, end_seq=None,
+                 start_time=None, end_time=None, closed=False):
+        self.path = Path(path)
+        self.machine_ids = list(machine_ids)
+        self.channels = channels
+        self.rows = rows
+        self.start_seq = start_seq
+        self.end_seq = end_seq
+        self.start_time = start_time
+        self.end_time = end_time
+        self.closed = closed
+        self._maps = {}
+
+    @property
+    def width(self):
+        return len(self.machine_ids)
+
+    def row_shape(self, name):
+        return () if name in SHARED_CHANNELS else (self.width,)
+
+    def row_bytes(self):
+        return sum(
+            np.dtype(dtype).itemsize * int(np.prod(self.row_shape(name)))
+            for name, dtype in self.channels.items()
+        )
+
+    def nbytes(self):
+        return self.rows * self.row_bytes()
+
+    def column_path(self, name):
+        return self.path / f"{name}.bin"
+
+    def column(self, name, rows=None):
+        """Returns a read-only memory map of a channel (cached once closed)."""
+        rows = self.rows if rows is None else rows
+        if self.closed and name in self._maps:
+            return self._maps[name]
+        if rows == 0:
+            return np.zeros((0, *self.row_shape(name)), dtype=self.channels[name])
+        values = np.memmap(
+            self.column_path(name), dtype=self.channels[name], mode="r",
+            shape=(rows, *self.row_shape(name)),
+        )
+        if self.closed:
+            self._maps[name] = values
+        return values
+
+    def to_meta(self):
+        return {
+            "machine_ids": self.machine_ids,
+            "channels": {name: np.dtype(dtype).str for name, dtype in self.channels.items()},
+            "rows": self.rows,
+            "start_seq": self.start_seq,
+            "end_seq": self.end_seq,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "closed": self.closed,
+        }
+
+    def write_meta(self):
+        temp_path = self.path / f"{_META_FILE}.tmp"
+        temp_path.write_text(json.dumps(self.to_meta()))
+        os.replace(temp_path, self.path / _META_FILE)
+
+    @classmethod
+    def load(cls, path):
+        meta = json.loads((Path(path) / _META_FILE).read_text())
+        channels = {name: np.dtype(dtype) for name, dtype in meta["channels"].items()}
+        return cls(
+            path, meta["machine_ids"], channels, meta["rows"], meta["start_seq"], meta["end_seq"],
+            meta["start_time"], meta["end_time"], meta["closed"],
+        )
+
+
+class TimeSeriesStore:
+    def __init__(self, directory, channels=None, segment_max_bytes=SEGMENT_MAX_BYTES,
+                 segment_max_seconds=SEGMENT_MAX_SECONDS, flush_interval=FLUSH_INTERVAL, read_only=False,
+                 max_bytes=MAX_BYTES, max_seconds=MAX_SECONDS):
+        self.directory = Path(directory)
+        self.read_only = read_only
+        self.channels = dict(channels or HISTORY_CHANNELS)
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        # Guards the segment list and row counts (writer vs. queries).
+        self._lock = threading.RLock()
+        self._flush_lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._files = {}
+        self.segments = []
+        self._open_segment = None
+        self._load_segments()
+
+    def _load_segments(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.read_only:
+            self.refresh()
+            return
+        for path in sorted(self.directory.iterdir()):
+            if not (path / _META_FILE).exists():
+                continue
+            segment = Segment.load(path)
+            if not segment.closed:
+                self._recover(segment)
+            if segment.rows:
+                self.segments.append(segment)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+        if self.segments:
+            self._apply_retention(self.segments[-1].end_time)
+
+    def _recover(self, segment):
+        """Closes a segment left open by a crash, keeping only complete rows."""
+        rows = None
+        for name, dtype in segment.channels.items():
+            path = segment.column_path(name)
+            row_size = np.dtype(dtype).itemsize * int(np.prod(segment.row_shape(name)))
+            available = path.stat().st_size // row_size if path.exists() else 0
+            rows = available if rows is None else min(rows, available)
+        segment.rows = rows or 0
+        for name, dtype in segment.channels.items():
+            row_size = np.dtype(dtype).itemsize * int(np.prod(segment.row_shape(name)))
+            if segment.column_path(name).exists():
+                os.truncate(segment.column_path(name), segment.rows * row_size)
+        if segment.rows:
+            seq = segment.column("seq")
+            times = segment.column("time")
+            segment.start_seq, segment.end_seq = int(seq[0]), int(seq[-1])
+            segment.start_time, segment.end_time = float(times[0]), float(times[-1])
+        segment.closed = True
+        segment.write_meta()
+
+    def refresh(self):
+        """Read-only stores: loads the segments and rows the writing process added since."""
+        with self._lock:
+            known = {segment.path: segment for segment in self.segments}
+            segments = []
+            for path in sorted(self.directory.iterdir()):
+                segment = known.get(path)
+                if segment is None or not segment.closed:
+                    try:
+                        segment = Segment.load(path)
+                    except (OSError, ValueError):  # no meta.json yet
+                        continue
+                if segment.rows:
+                    segments.append(segment)
+            self.segments = segments
+
+    @property
+    def last_seq(self):
+        """Sequence number of the most recent stored tick (0 if empty)."""
+        if self.read_only:
+            self.refresh()
+        with self._lock:
+            for segment in reversed(self.segments):
+                if segment.end_seq is not None:
+                    return segment.end_seq
+            return 0
+
+    def append(self, seq, sample, machine_ids):
+        """Queues one tick for the background writer (no disk I/O)."""
+        with self._pending_lock:
+            self._pending.append((seq, sample, tuple(machine_ids)))
+
+    def append_many(self, ticks, machine_ids):
+        """Queues several ``(seq, sample)`` rows of the same machines at once (no disk I/O)."""
+        machine_ids = tuple(machine_ids)
+        with self._pending_lock:
+            self._pending.extend((seq, sample, machine_ids) for seq, sample in ticks)
+
+    def start(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, daemon=True)
+            self._writer.start()
+
+    def stop(self):
+        """Stops the writer after a final flush and closes the open segment."""
+        if self._writer is not None:
+            self._writer, writer = None, self._writer
+            self._wakeup.set()
+            writer.join()
+            self._wakeup.clear()
+        with self._flush_lock:
+            self.flush()
+            self._close_open_segment()
+
+    def _run_writer(self):
+        while self._writer is not None:
+            self._wakeup.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Writes all queued ticks to disk."""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            start = 0
+            while start < len(pending):
+                machine_ids = pending[start][2]
+                end = start
+                while end < len(pending) and pending[end][2] == machine_ids:
+                    end += 1
+                self._write_batch(pending[start:end], machine_ids)
+                start = end
+
+    def _write_batch(self, ticks, machine_ids):
+        position = 0
+        while position < len(ticks):
+            seq, sample, _ = ticks[position]
+            segment = self._segment_for(machine_ids, seq, sample["time"])
+            # Rows still fitting into the segment before it exceeds its size.
+            room = max(1, (self.segment_max_bytes - segment.nbytes()) // segment.row_bytes())
+            batch = ticks[position:position + room]
+            for name, dtype in self.channels.items():
+                if name == "seq":
+                    values = np.array([seq for seq, _, _ in batch], dtype=dtype)
+                else:
+                    values = np.array([sample[name] for _, sample, _ in batch], dtype=dtype)
+                self._files[name].write(values.tobytes())
+            for handle in self._files.values():
+                handle.flush()
+            with self._lock:
+                if segment.start_seq is None:
+                    segment.start_seq = int(batch[0][0])
+                    segment.start_time = float(batch[0][1]["time"])
+                segment.end_seq = int(batch[-1][0])
+                segment.end_time = float(batch[-1][1]["time"])
+                segment.rows += len(batch)
+            segment.write_meta()
+            position += len(batch)
+
+    def _segment_for(self, machine_ids, seq, timestamp):
+        """Returns the open segment, rotating it if the batch does not fit."""
+        segment = self._open_segment
+        if segment is not None and (
+            tuple(segment.machine_ids) != machine_ids
+            or segment.nbytes() + segment.row_bytes() > self.segment_max_bytes
+            or (segment.start_time is not None and timestamp - segment.start_time >= self.segment_max_seconds)
+        ):
+            self._close_open_segment()
+            self._apply_retention(timestamp)
+            segment = None
+        if segment is None:
+            path = self.directory / f"{seq:012d}-{int(timestamp)}"
+            path.mkdir(parents=True, exist_ok=True)
+            segment = Segment(path, machine_ids, self.channels)
+            segment.write_meta()
+            self._files = {name: segment.column_path(name).open("ab") for name in self.channels}
+            with self._lock:
+                self.segments.append(segment)
+            self._open_segment = segment
+        return segment
+
+    def _apply_retention(self, newest_time):
+        """Deletes the oldest closed segments beyond ``max_bytes`` or ``max_seconds``; the newest one stays."""
+        with self._lock:
+            total = sum(segment.nbytes() for segment in self.segments)
+            expired = []
+            for segment in self.segments[:-1]:
+                too_large = self.max_bytes is not None and total > self.max_bytes
+                too_old = self.max_seconds is not None and segment.end_time < newest_time - self.max_seconds
+                if not segment.closed or not (too_large or too_old):
+                    break
+                expired.append(segment)
+                total -= segment.nbytes()
+            self.segments = self.segments[len(expired):]
+        for segment in expired:
+            segment._maps.clear()
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+    def _close_files(self):
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+    def _close_open_segment(self):
+        self._close_files()
+        segment = self._open_segment
+        self._open_segment = None
+        if segment is not None:
+            with self._lock:
+                segment.closed = True
+            segment.write_meta()
+
+    def query(self, machine_id, start=None, end=None, channels=None, after=None, limit=None):
+        """Returns the stored samples of one machine as a dict of column arrays.
+
+        ``start``/``end`` are Unix epoch seconds (inclusive), ``after`` drops
+        samples with a sequence number up to ``after`` and ``limit`` keeps the
+        oldest ``limit`` matches. Only segments overlapping the range and the
+        requested channels are read.
+        """
+        names = list(self.channels if channels is None else channels)
+        if self.read_only:
+            self.refresh()
+        with self._lock:
+            segments = [
+                (segment, segment.rows) for segment in self.segments
+                if segment.rows
+                and machine_id in segment.machine_ids
+                and (start is None or segment.end_time >= start)
+                and (end is None or segment.start_time <= end)
+                and (after is None or segment.end_seq > after)
+            ]
+        parts = {name: [] for name in names}
+        remaining = limit
+        for segment, rows in segments:
+            try:
+                times = segment.column("time", rows)
+                first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+                last = rows if end is None else int(np.searchsorted(times, end, side="right"))
+                if after is not None:
+                    seq = segment.column("seq", rows)
+                    first = max(first, int(np.searchsorted(seq, after, side="right")))
+                if remaining is not None:
+                    last = min(last, first + remaining)
+                if last <= first:
+                    continue
+                column = segment.machine_ids.index(machine_id)
+                selected = {}
+                for name in names:
+                    values = segment.column(name, rows)[first:last]
+                    if name not in SHARED_CHANNELS:
+                        values = values[:, column]
+                    selected[name] = np.array(values)
+            except FileNotFoundError:  # deleted by the retention meanwhile
+                continue
+            for name, values in selected.items():
+                parts[name].append(values)
+            if remaining is not None:
+                remaining -= last - first
+                if remaining <= 0:
+                    break
+        return {
+            name: np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=self.channels[name])
+            for name in names
+        }
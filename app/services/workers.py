@@ -0,0 +1,43 @@
+"""Shared process pool for CPU-bound simulation batches."""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_process_pool():
+    # A spawn context keeps the worker processes independent of the threads
+    # running in the Streamlit/uvicorn process. The pool is reused so that
+    # only the first batch pays the process start-up cost.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def map_chunks(function, items, *args, chunk_size=None):
+    """Runs ``function(start, items[start:start + chunk_size], *args)`` on the pool.
+
+    ``function`` must be a module-level function returning ``(start, results)``.
+    Yields the return values in completion order, so callers can report
+    progress while the remaining chunks are still running.
+    """
+    if not items:
+        return
+    if chunk_size is None:
+        # Several chunks per worker for load balancing and progress updates.
+        workers = os.cpu_count() or 1
+        chunk_size = max(1, min(200, len(items) // (workers * 4) or 1))
+    executor = get_process_pool()
+    futures = [
+        executor.submit(function, start, items[start:start + chunk_size], *args)
+        for start in range(0, len(items), chunk_size)
+    ]
+    for future in as_completed(futures):
+        yield future.result()
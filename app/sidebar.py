@@ -0,0 +1,62 @@
+"""Sidebar controls and the session selections shared by all tabs.
+
+Kept free of the tab modules and their dependencies (plotly, the optimizer,
+replay), so ``app.main`` can render the sidebar without importing them.
+"""
+
+import streamlit as st
+
+from app.config import CHART_MAX_POINTS, CHART_RANGES, DEFAULT_MACHINE_ID
+from app.services.data_service import data_service
+from app.views import chart_view, history_frame
+
+
+def init_background_tasks():
+    if "threads_started" not in st.session_state:
+        data_service.start_background_tasks()
+        st.session_state.threads_started = True
+
+
+def get_selected_machine_id():
+    return st.session_state.get("machine_id", DEFAULT_MACHINE_ID)
+
+
+def render_machine_selector():
+    machine_ids = data_service.get_machine_ids()
+    if st.session_state.get("machine_id") not in machine_ids:
+        st.session_state.machine_id = DEFAULT_MACHINE_ID
+    st.sidebar.selectbox("Machine", machine_ids, key="machine_id")
+
+
+def render_chart_settings():
+    st.sidebar.selectbox("Visible range", list(CHART_RANGES), key="chart_range")
+    st.sidebar.number_input(
+        "Max points per chart",
+        100,
+        5000,
+        CHART_MAX_POINTS,
+        step=100,
+        key="chart_max_points",
+        help="Longer ranges are drawn from 10 s / 1 min / 15 min rollups or downsampled (LTTB).",
+    )
+
+
+def get_chart_window():
+    """Returns the visible range in seconds and the maximum points per chart."""
+    range_label = st.session_state.get("chart_range", next(iter(CHART_RANGES)))
+    return CHART_RANGES[range_label], int(st.session_state.get("chart_max_points", CHART_MAX_POINTS))
+
+
+def get_chart_view():
+    """Returns the shared view of the visible chart window of the selected machine (see ``chart_view``)."""
+    span, max_points = get_chart_window()
+    return chart_view(get_selected_machine_id(), span, max_points)
+
+
+def get_global_history():
+    return get_chart_view()["columns"]
+
+
+def get_global_history_frame():
+    span, max_points = get_chart_window()
+    return history_frame(get_selected_machine_id(), span, max_points)
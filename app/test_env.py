@@ -1,46 +1,43 @@
+import time
+from urllib.parse import urlencode
+
 import streamlit as st
-import pandas as pd
-import requests
+import plotly.graph_objects as go
 from app.components import create_plotly_chart
-from app.config import COLOR_PALETTE
+from app.live_chart import live_chart
+from app.config import CHART_RANGES, COLOR_PALETTE, REPLAY_DIR
 from app.services.data_service import data_service
+from app.services.metrics import timed_render
+from app.services.optimizer import optimize_thresholds
+from app.services.ingest import OVERFLOW_POLICIES
+from app.services.replay import DEFAULT_CHANNEL_MAP
+from app.services.scheduler import CATCH_UP_POLICIES, MAX_RATE_HZ, MIN_RATE_HZ
+from app.sidebar import get_chart_view, get_selected_machine_id
+from app.views import chart_update_cache, live_state_view
 
 API_BASE_URL = "http://127.0.0.1:8000"
 
 
-def init_background_tasks():
-    if "threads_started" not in st.session_state:
-        data_service.start_background_tasks()
-        st.session_state.threads_started = True
-
-
-def _check_api_health():
-    try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=0.25)
-        if response.status_code == 200:
-            return "available", response.json()
-        return f"unavailable ({response.status_code})", None
-    except requests.RequestException:
-        return "unavailable", None
-
-
 def _apply_pm10_rate_sliders():
     data_service.set_pm10_rates(
         st.session_state.slider_rise_rate,
         st.session_state.slider_fall_rate,
         source="Streamlit UI",
         command_name="set_pm10_rates",
+        machine_id=get_selected_machine_id(),
     )
 
 
 def _sync_slider_state_from_service():
-    metadata = data_service.get_control_metadata_snapshot()
-    service_rise_rate = data_service.pm10_rise_rate
-    service_fall_rate = data_service.pm10_fall_rate
-
-    if "slider_rise_rate" not in st.session_state:
+    machine_id = get_selected_machine_id()
+    metadata = data_service.get_control_metadata_snapshot(machine_id)
+    service_rise_rate = metadata["pm10_rise_rate"]
+    service_fall_rate = metadata["pm10_fall_rate"]
+
+    # Reload the sliders whenever another machine is selected.
+    if st.session_state.get("slider_machine_id") != machine_id:
+        st.session_state.slider_machine_id = machine_id
         st.session_state.slider_rise_rate = service_rise_rate
-    if "slider_fall_rate" not in st.session_state:
         st.session_state.slider_fall_rate = service_fall_rate
 
     if metadata.get("last_command_source") == "REST API":
@@ -49,12 +46,13 @@ def _sync_slider_state_from_service():
 
 
 def _render_external_control():
-    status, health = _check_api_health()
-    metadata = data_service.get_control_metadata_snapshot()
+    # Tracked by the API itself, so rendering never waits for a request.
+    health = data_service.get_api_status()
+    metadata = data_service.get_control_metadata_snapshot(get_selected_machine_id())
 
     st.subheader("External control")
     col_status, col_command, col_source = st.columns(3)
-    col_status.metric("API status", status)
+    col_status.metric("API status", health["status"])
     col_command.metric("Last command", metadata.get("last_command") or "None")
     col_source.metric("Command source", metadata.get("last_command_source") or "None")
 
@@ -63,54 +61,326 @@ def _render_external_control():
         "control the same local simulation state."
     )
 
+    import pandas as pd
+
     endpoints = pd.DataFrame([
         {"Method": "GET", "Endpoint": f"{API_BASE_URL}/health", "Purpose": "API availability"},
-        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/state", "Purpose": "Current state and control metadata"},
-        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/history", "Purpose": "Recent simulation samples"},
-        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/pm10-rates", "Purpose": "Set PM10 rise/fall rates"},
-        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/reset", "Purpose": "Reset simulation state"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/metrics", "Purpose": "Tick, lock, route and render timings (Prometheus)"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/machines", "Purpose": "Current state of all machines"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/machines", "Purpose": "Register a machine"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/state?machine_id=", "Purpose": "Current state and control metadata"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/history?machine_id=", "Purpose": "Recent simulation samples"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/history?after=&wait=", "Purpose": "Samples newer than a sequence number (long-poll)"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/history?from=&to=&channels=", "Purpose": "Persistent history for a time range"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/history?max_points=", "Purpose": "History reduced to rollups or LTTB points"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/energy?machine_id=", "Purpose": "Energy counters and savings"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/export?format=csv|parquet|xlsx&from=&to=", "Purpose": "Download the stored history"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/stream/sse?machine_id=", "Purpose": "Live samples as server-sent events"},
+        {"Method": "WS", "Endpoint": f"{API_BASE_URL.replace('http', 'ws', 1)}/stream/ws?machine_id=", "Purpose": "Live samples over WebSocket"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/pm10-rates", "Purpose": "Set PM10 rise/fall rates of a machine"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/thresholds", "Purpose": "Set on/off thresholds and minimum run time"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/optimize", "Purpose": "Optimize thresholds for an exposure limit"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/ingest", "Purpose": "Ingest queue counters and sensor sources"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/ingest", "Purpose": "Push measured sensor samples"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/ingest/history?machine_id=&from=&to=", "Purpose": "Pushed samples at their own timestamps"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/ingest", "Purpose": "Set ingest queue capacity and overflow policy"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/scheduler", "Purpose": "Sample rate, catch-up policy and missed deadlines"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/scheduler", "Purpose": "Set sample rate (0.1-100 Hz) and catch-up policy"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/control/reset", "Purpose": "Reset one machine or the whole fleet"},
+        {"Method": "GET", "Endpoint": f"{API_BASE_URL}/replay", "Purpose": "Status of the measurement replay"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/replay", "Purpose": "Replay a recorded CSV/Excel file into a machine"},
+        {"Method": "POST", "Endpoint": f"{API_BASE_URL}/replay/stop", "Purpose": "Stop the replay, resume the simulation"},
     ])
     st.dataframe(endpoints, use_container_width=True, hide_index=True)
 
-    if health:
-        st.json(health, expanded=False)
+    if health["status"] == "unavailable":
+        if health["error"]:
+            st.caption(f"API error: {health['error']}")
+    else:
+        st.caption(f"Uptime {health['uptime_s']:.0f} s, event loop latency {health['latency_ms']:.1f} ms")
+
+
+def _apply_optimized_thresholds(best):
+    data_service.set_thresholds(
+        best["on_threshold"],
+        best["off_threshold"],
+        best["min_run_time"],
+        source="Streamlit UI",
+        command_name="apply_optimized_thresholds",
+        machine_id=get_selected_machine_id(),
+    )
+
+
+def _render_pareto_chart(front):
+    fig = go.Figure(go.Scatter(
+        x=[r["twa_pm10"] for r in front],
+        y=[r["energy_wh"] for r in front],
+        mode="lines+markers",
+        line=dict(color=COLOR_PALETTE["FX Blue"], width=2),
+        customdata=[[r["off_threshold"], r["on_threshold"], r["min_run_time"]] for r in front],
+        hovertemplate=(
+            "TWA %{x:.2f} mg/m³<br>Energy %{y:.0f} Wh<br>"
+            "Band %{customdata[0]:.2f}/%{customdata[1]:.2f} mg/m³, min. run %{customdata[2]:.0f} s"
+            "<extra></extra>"
+        ),
+    ))
+    fig.update_layout(
+        height=300,
+        paper_bgcolor='white',
+        plot_bgcolor='rgba(250, 250, 250, 0.5)',
+        margin=dict(l=50, r=20, t=20, b=40),
+        xaxis=dict(title="Time-weighted average PM₁₀ [mg/m³]", gridcolor='rgba(200, 200, 200, 0.3)'),
+        yaxis=dict(title="Extractor energy [Wh]", gridcolor='rgba(200, 200, 200, 0.3)'),
+    )
+    st.plotly_chart(fig, use_container_width=True, key="optimizer_pareto_chart")
+
+
+def _render_threshold_optimizer():
+    import pandas as pd
+
+    machine_id = get_selected_machine_id()
+    metadata = data_service.get_control_metadata_snapshot(machine_id)
+
+    st.subheader("Threshold optimizer")
+    st.caption(
+        "Searches switch-on/off thresholds and minimum run times for the lowest extractor energy "
+        "at the current rise and fall rates of the machine, subject to the exposure limits."
+    )
+    col_peak, col_twa, col_duration = st.columns(3)
+    with col_peak:
+        use_peak = st.checkbox("Limit peak PM₁₀", value=True, key="optimizer_use_peak")
+        max_pm10 = st.number_input("Max. PM₁₀ [mg/m³]", 0.5, 10.0, 3.5, 0.1, key="optimizer_max_pm10")
+    with col_twa:
+        use_twa = st.checkbox("Limit time-weighted average", value=True, key="optimizer_use_twa")
+        max_twa = st.number_input("Max. TWA PM₁₀ [mg/m³]", 0.5, 10.0, 2.5, 0.1, key="optimizer_max_twa")
+    with col_duration:
+        hours = st.number_input("Evaluated period [h]", 1, 24, 8, key="optimizer_hours")
+
+    if st.button("Optimize thresholds", key="optimizer_button"):
+        with st.spinner("Evaluating threshold candidates..."):
+            st.session_state.optimizer_result = optimize_thresholds(
+                metadata["pm10_rise_rate"],
+                metadata["pm10_fall_rate"],
+                max_pm10=max_pm10 if use_peak else None,
+                max_twa=max_twa if use_twa else None,
+                duration=hours * 3600.0,
+            )
+            st.session_state.optimizer_machine_id = machine_id
+
+    result = st.session_state.get("optimizer_result")
+    if result is None or st.session_state.get("optimizer_machine_id") != machine_id:
+        return
+
+    st.caption(
+        f"{result['candidates']} candidates, {result['pruned_by_bound']} pruned by the peak bound, "
+        f"{result['pruned_by_screening']} pruned by screening, {result['evaluated_full']} fully evaluated "
+        f"in {result['elapsed_ms']:.0f} ms"
+    )
+    best = result["best"]
+    if best is None:
+        st.warning("No threshold candidate satisfies the exposure limits.")
+        return
+
+    col_band, col_energy, col_twa_result, col_apply = st.columns(4)
+    col_band.metric(
+        "Best band (off / on)",
+        f"{best['off_threshold']:.2f} / {best['on_threshold']:.2f}",
+        help=f"Minimum run time {best['min_run_time']:.0f} s",
+    )
+    col_energy.metric("Extractor energy", f"{best['energy_wh']:.0f} Wh")
+    col_twa_result.metric("TWA PM₁₀", f"{best['twa_pm10']:.2f} mg/m³")
+    with col_apply:
+        st.button(
+            "Apply to machine",
+            key="optimizer_apply",
+            on_click=_apply_optimized_thresholds,
+            args=(best,),
+        )
+
+    _render_pareto_chart(result["pareto_front"])
+    with st.expander("Pareto front"):
+        st.dataframe(pd.DataFrame(result["pareto_front"]), use_container_width=True, hide_index=True)
+
+
+def _apply_scheduler():
+    try:
+        data_service.set_scheduler(st.session_state.scheduler_rate, st.session_state.scheduler_catch_up)
+        st.session_state.scheduler_error = None
+    except ValueError as exc:
+        st.session_state.scheduler_error = str(exc)
+
+
+def _render_scheduler():
+    status = data_service.get_scheduler_status()
+    st.subheader("Sample rate")
+    st.caption(
+        "The simulation ticks on fixed deadlines. Missed deadlines are either skipped or simulated "
+        "in a batch (at most one minute) when the tick thread runs again."
+    )
+    col_rate, col_policy, col_apply = st.columns([2, 2, 1])
+    col_rate.number_input(
+        "Sample rate [Hz]", MIN_RATE_HZ, MAX_RATE_HZ, float(status["rate_hz"]), 0.1, key="scheduler_rate",
+    )
+    col_policy.selectbox(
+        "Catch-up policy", CATCH_UP_POLICIES, index=CATCH_UP_POLICIES.index(status["catch_up"]),
+        key="scheduler_catch_up",
+    )
+    col_apply.button("Apply", key="scheduler_apply", on_click=_apply_scheduler)
+    if st.session_state.get("scheduler_error"):
+        st.error(st.session_state.scheduler_error)
+    st.caption(
+        f"{status['ticks']} ticks - {status['missed_deadlines']} missed deadlines "
+        f"({status['skipped_ticks']} skipped, {status['batched_ticks']} simulated in batches)"
+    )
+
+
+def _apply_ingest_settings():
+    data_service.configure_ingest(st.session_state.ingest_capacity, st.session_state.ingest_policy)
+
+
+def _render_ingest():
+    status = data_service.get_ingest_status()
+    queue = status["queue"]
+    st.subheader("Sensor ingest")
+    st.caption(
+        "Machines can push measurements (REST `/ingest` or the broker source). They replace the simulation "
+        f"of a machine until it has been silent for {status['stale_after_s']:.0f} s."
+    )
+    col_policy, col_capacity, col_apply = st.columns([2, 2, 1])
+    col_policy.selectbox(
+        "Overflow policy", OVERFLOW_POLICIES, index=OVERFLOW_POLICIES.index(queue["policy"]), key="ingest_policy",
+    )
+    # Same bounds as POST /control/ingest, so a capacity set over REST is always a valid value.
+    capacity = min(max(queue["capacity"], 1), 1_000_000)
+    col_capacity.number_input("Queue capacity", 1, 1_000_000, capacity, 100, key="ingest_capacity")
+    col_apply.button("Apply", key="ingest_apply", on_click=_apply_ingest_settings)
+    st.caption(
+        f"{queue['accepted']} accepted, {queue['dropped_oldest'] + queue['dropped_newest']} dropped, "
+        f"{queue['rejected']} rejected (backpressure) - queue {queue['depth']} / {queue['capacity']}, "
+        f"peak {queue['high_watermark']} - pushing: {', '.join(status['pushing_machines']) or 'none'}"
+    )
+
+
+def _render_export():
+    machine_id = get_selected_machine_id()
+    st.subheader(f"Export ({machine_id})")
+    st.caption("Downloads the stored history of the selected machine. The file is streamed in chunks by the REST API.")
+    col_range, col_format, col_link = st.columns([2, 1, 1])
+    ranges = {**CHART_RANGES, "All stored data": None}
+    range_label = col_range.selectbox("Period", list(ranges), key="export_range")
+    export_format = col_format.selectbox("Format", ["csv", "parquet", "xlsx"], key="export_format")
+    params = {"machine_id": machine_id, "format": export_format}
+    if ranges[range_label] is not None:
+        params["from"] = int(time.time() - ranges[range_label])
+    with col_link:
+        st.link_button("Download", f"{API_BASE_URL}/export?{urlencode(params)}")
+
+
+REPLAY_SPEEDS = {"1x": 1.0, "10x": 10.0, "60x": 60.0, "600x": 600.0, "Max": 0.0}
+
+
+def _start_replay():
+    channel_map = {
+        channel: st.session_state[f"replay_column_{channel}"].strip()
+        for channel in DEFAULT_CHANNEL_MAP
+    }
+    try:
+        data_service.start_replay(
+            st.session_state.replay_path.strip(),
+            machine_id=get_selected_machine_id(),
+            speed=REPLAY_SPEEDS[st.session_state.replay_speed],
+            channel_map=channel_map,
+            sheet=st.session_state.replay_sheet.strip() or None,
+            loop=st.session_state.replay_loop,
+            simulate_controller=st.session_state.replay_simulate_controller,
+        )
+        st.session_state.replay_error = None
+    except ValueError as exc:
+        st.session_state.replay_error = str(exc)
+
+
+def _render_replay():
+    st.subheader(f"Measurement replay ({get_selected_machine_id()})")
+    st.caption(
+        f"Streams a recorded CSV or Excel file from the recordings directory ({REPLAY_DIR}) through "
+        "the live state, history and REST API of the selected machine. Unmapped channels keep being simulated."
+    )
+    col_path, col_sheet, col_speed = st.columns([3, 1, 1])
+    col_path.text_input("Recording", key="replay_path", placeholder="campaign.csv")
+    col_sheet.text_input("Excel sheet", key="replay_sheet", help="Empty: first sheet")
+    col_speed.selectbox("Speed", list(REPLAY_SPEEDS), key="replay_speed")
+
+    with st.expander("Channel mapping"):
+        columns = st.columns(3)
+        for position, (channel, column) in enumerate(DEFAULT_CHANNEL_MAP.items()):
+            columns[position % 3].text_input(
+                channel, value=column, key=f"replay_column_{channel}", help="Column in the file, empty: not mapped",
+            )
+        st.checkbox("Loop at the end of the file", key="replay_loop")
+        st.checkbox(
+            "Switch the extractor with the two-point controller on the recorded PM₁₀",
+            key="replay_simulate_controller",
+        )
+
+    col_start, col_stop = st.columns(2)
+    col_start.button("Start replay", key="replay_start", on_click=_start_replay)
+    col_stop.button("Stop replay", key="replay_stop", on_click=data_service.stop_replay)
+
+    if st.session_state.get("replay_error"):
+        st.error(st.session_state.replay_error)
+    status = data_service.get_replay_status()
+    if "file" in status:
+        state = "running" if status["active"] else ("finished" if status["finished"] else "stopped")
+        if status.get("error"):
+            state = f"failed ({status['error']})"
+        st.caption(
+            f"{status['file']} -> {status['machine_id']}: {state}, {status['rows']} rows replayed, "
+            f"recorded time {status['recorded_time'] or '-'}"
+        )
 
 
 @st.fragment(run_every="1s")
+@timed_render
 def render_dynamic_charts():
-    history_df = pd.DataFrame(data_service.get_history_snapshot())
-    if history_df.empty:
+    view = get_chart_view()
+    if not len(view["columns"]["seq"]):
         st.info("Waiting for data...")
         return
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        fig1 = create_plotly_chart(history_df, "Main supply", None, COLOR_PALETTE["FX Blue"])
-        st.plotly_chart(fig1, use_container_width=True, key="test_main_supply")
-    with col2:
-        fig2 = create_plotly_chart(history_df, "Mist extractor", None, COLOR_PALETTE["Light Blue"])
-        st.plotly_chart(fig2, use_container_width=True, key="test_mist_extractor")
-    with col3:
-        fig3 = create_plotly_chart(history_df, "Chip conveyor", None, COLOR_PALETTE["Blue"])
-        st.plotly_chart(fig3, use_container_width=True, key="test_chip_conveyor")
+    charts = [
+        ("test_main_supply", "Main supply", COLOR_PALETTE["FX Blue"]),
+        ("test_mist_extractor", "Mist extractor", COLOR_PALETTE["Light Blue"]),
+        ("test_chip_conveyor", "Chip conveyor", COLOR_PALETTE["Blue"]),
+    ]
+    for column, (key, y_col, color) in zip(st.columns(3), charts):
+        with column:
+            # The figure is built once per session; later runs only send new samples.
+            live_chart(
+                key, view["chart_id"],
+                lambda y_col=y_col, color=color: create_plotly_chart(
+                    {"timestamp": [], y_col: []}, y_col, None, color
+                ),
+                view["columns"], [y_col], cache=chart_update_cache,
+            )
 
 
 @st.fragment(run_every="1s")
+@timed_render
 def render_live_state():
-    history_df = pd.DataFrame(data_service.get_history_snapshot())
-    metadata = data_service.get_control_metadata_snapshot()
+    # Serialized once per tick for all sessions.
+    view = live_state_view(get_selected_machine_id())
     col_j1, col_j2, col_j3 = st.columns(3)
     with col_j1:
         st.write("**Current service state**")
-        st.json(data_service.get_server_data_snapshot(), expanded=True)
+        st.json(view["state"], expanded=True)
     with col_j2:
         st.write("**Latest history sample**")
-        if not history_df.empty:
-            st.json(history_df.iloc[-1].to_dict(), expanded=True)
+        if view["latest"] is not None:
+            st.json(view["latest"], expanded=True)
         else:
             st.warning("Waiting for data...")
     with col_j3:
         st.write("**External-control metadata**")
-        st.json(metadata, expanded=True)
+        st.json(view["metadata"], expanded=True)
 
 
 def render_test_env():
@@ -119,7 +389,7 @@ def render_test_env():
 
     st.divider()
 
-    st.subheader("Two-point controller")
+    st.subheader(f"Two-point controller ({get_selected_machine_id()})")
     _sync_slider_state_from_service()
     col_s1, col_s2 = st.columns(2)
     with col_s1:
@@ -127,8 +397,7 @@ def render_test_env():
             "Pollution rate (PM10 rise)",
             0.01,
             0.50,
-            data_service.pm10_rise_rate,
-            0.01,
+            step=0.01,
             help="How fast PM10 rises per second when extraction is inactive?",
             key="slider_rise_rate",
             on_change=_apply_pm10_rate_sliders,
@@ -138,19 +407,41 @@ def render_test_env():
             "Extraction efficiency (PM10 fall)",
             0.05,
             1.00,
-            data_service.pm10_fall_rate,
-            0.01,
+            step=0.01,
             help="How fast PM10 falls per second when extraction is active?",
             key="slider_fall_rate",
             on_change=_apply_pm10_rate_sliders,
         )
+    metadata = data_service.get_control_metadata_snapshot(get_selected_machine_id())
     st.caption(
         f"Applied rise rate: {pm10_rise_rate:.2f} mg/m3/s - "
-        f"Applied fall rate: {pm10_fall_rate:.2f} mg/m3/s"
+        f"Applied fall rate: {pm10_fall_rate:.2f} mg/m3/s - "
+        f"Thresholds: off {metadata['off_threshold']:.2f} / on {metadata['on_threshold']:.2f} mg/m3, "
+        f"min. run time {metadata['min_run_time']:.0f} s"
     )
 
     st.divider()
 
+    _render_scheduler()
+
+    st.divider()
+
+    _render_threshold_optimizer()
+
+    st.divider()
+
+    _render_replay()
+
+    st.divider()
+
+    _render_ingest()
+
+    st.divider()
+
+    _render_export()
+
+    st.divider()
+
     st.subheader("Live state")
     render_live_state()
 
@@ -161,8 +452,8 @@ def render_test_env():
 
     st.divider()
     if st.button("System Reset (Reset model to 0 mg/m3)", type="primary", key="reset_btn"):
-        data_service.reset_all_data(source="Streamlit UI", command_name="reset")
-
-
-def get_global_history():
-    return data_service.get_history_snapshot()
+        data_service.reset_all_data(
+            source="Streamlit UI",
+            command_name="reset",
+            machine_id=get_selected_machine_id(),
+        )
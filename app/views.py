@@ -0,0 +1,93 @@
+"""Views of the live data shared by all Streamlit sessions.
+
+The 1 s fragments of every open session used to read the history and derive
+the same DataFrame, latest row, axis ranges and traffic-light colour on their
+own, so 20 operators meant 20 identical builds per fragment and second. The
+views here are built by the first session that asks after a tick, memoized
+on the service snapshot (``data_service.get_view``) and shared read-only by
+all others; they are dropped with the snapshot when the next one is
+published. Each view is built from that snapshot alone, never from the
+service's current state, which may already be a tick further.
+"""
+
+import json
+
+from app.services.data_service import data_service
+
+
+def chart_view(machine_id, span, max_points, snapshot=None):
+    """Returns the shared view of the visible chart window of a machine (of ``snapshot``, default the current one).
+
+    Keys: ``columns`` (dict of arrays), ``chart_id`` (what the window shows,
+    see ``live_chart``), ``latest`` (newest sample or None), ``y_max`` (axis
+    maxima of the mist extractor chart) and ``light`` (traffic-light state).
+    Callers must not modify it.
+    """
+    return data_service.get_view(
+        ("chart", machine_id, span, max_points),
+        lambda snapshot: _build_chart_view(snapshot, machine_id, span, max_points),
+        snapshot,
+    )
+
+
+def _build_chart_view(snapshot, machine_id, span, max_points):
+    columns, resolution = data_service.get_history_view(machine_id, max_points, limit=span, snapshot=snapshot)
+    latest = snapshot.history.latest(snapshot.index_of(machine_id))
+    y_max = {}
+    if len(columns["seq"]):
+        y_max = {
+            "Mist extractor": max(float(columns["Mist extractor"].max()) * 1.2, 500),
+            "PM10": max(float(columns["PM10"].max()) * 1.2, 5),
+        }
+    light = "animation"
+    if latest is not None:
+        light = traffic_light_state(latest["PM10"], snapshot.state(machine_id))
+    return {
+        "columns": columns,
+        "chart_id": f"{machine_id}:{span}:{max_points}:{resolution}",
+        "latest": latest,
+        "y_max": y_max,
+        "light": light,
+    }
+
+
+def chart_update_cache(key, build):
+    """``cache`` of ``live_chart``: shares the serialized chart updates of a tick.
+
+    Their keys hold the sequence numbers of the samples they send, so
+    ``build`` does not need the snapshot.
+    """
+    return data_service.get_view(key, lambda snapshot: build())
+
+
+def traffic_light_state(pm10, state):
+    """Maps a PM10 value to the traffic light: green below the off, yellow below the on threshold."""
+    if pm10 <= state["off_threshold"]:
+        return "green"
+    if pm10 <= state["on_threshold"]:
+        return "yellow"
+    return "red"
+
+
+def history_frame(machine_id, span, max_points):
+    """Returns the chart window of ``chart_view`` as a shared DataFrame."""
+    import pandas as pd
+
+    return data_service.get_view(
+        ("frame", machine_id, span, max_points),
+        lambda snapshot: pd.DataFrame(chart_view(machine_id, span, max_points, snapshot)["columns"]),
+    )
+
+
+def live_state_view(machine_id):
+    """Returns the service state, latest sample and control metadata of a machine as JSON strings (None if no sample yet)."""
+
+    def build(snapshot):
+        latest = snapshot.history.latest(snapshot.index_of(machine_id))
+        return {
+            "state": json.dumps(snapshot.state(machine_id)),
+            "latest": None if latest is None else json.dumps(latest),
+            "metadata": json.dumps(snapshot.metadata[machine_id]),
+        }
+
+    return data_service.get_view(("live_state", machine_id), build)
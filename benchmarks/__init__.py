@@ -0,0 +1 @@
+"""Benchmarks for the Factory-X Energy Savings app (run with ``python -m benchmarks.<name>``)."""
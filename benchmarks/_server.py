@@ -0,0 +1,71 @@
+"""Helpers to run the FastAPI app on a local uvicorn server for benchmarks."""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import uvicorn
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_api_server(app, port=None, **config):
+    """Runs ``app`` on 127.0.0.1 in a background thread and yields its base URL."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", **config))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@contextmanager
+def api_server_process(port=None, app="app.services.data_service:app", history_dir=None):
+    """Runs an API app in a separate uvicorn process.
+
+    ``history_dir`` redirects the persistent history store (e.g. to a
+    temporary directory) so benchmark runs do not write into ``.data/``.
+    """
+    port = port or free_port()
+    env = dict(os.environ)
+    if history_dir is not None:
+        env["FACTORYX_HISTORY_DIR"] = str(history_dir)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "error"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                httpx.get(f"{base_url}/health", timeout=0.5)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
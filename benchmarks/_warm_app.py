@@ -0,0 +1,9 @@
+"""The API app with a pre-filled history, for load benchmarks."""
+
+import os
+
+from app.services.data_service import app, data_service  # noqa: F401
+
+
+for _ in range(int(os.environ.get("BENCH_WARMUP_TICKS", "600"))):
+    data_service.tick(1.0)
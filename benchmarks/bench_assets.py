@@ -0,0 +1,88 @@
+"""Cost of the page assets per rerun and session.
+
+Builds the style block and the two image panels of the savings tab
+``--runs`` times the old way (read and Base64-encode the files on every
+rerun and inline them as data URIs), from the per-process cache as data
+URIs (static serving disabled) and as static file URLs, and reports the
+time per rerun and the bytes the page carries. ``--app`` also times whole
+reruns of the app with ``AppTest`` and sums the Markdown the page sends.
+
+    python -m benchmarks.bench_assets --runs 50 --app
+"""
+
+import argparse
+import base64
+import statistics
+import time
+from pathlib import Path
+
+from streamlit import config
+
+from app.assets import STATIC_DIR, static_url
+from app.main import _STYLE_IMAGE, _get_custom_css
+
+IMAGES = [_STYLE_IMAGE, "mist_extraction_experiments.png", "mist_extraction_savings.png"]
+RGBA_BG = "rgba(177, 203, 33, 0.3)"
+APP_SCRIPT = Path(__file__).resolve().parents[1] / "app.py"
+
+
+def _inline(name):
+    """The old way: read and encode the file on every rerun."""
+    mime = "image/svg+xml" if name.endswith(".svg") else "image/png"
+    with (STATIC_DIR / name).open("rb") as image_file:
+        return f"data:{mime};base64,{base64.b64encode(image_file.read()).decode('utf-8')}"
+
+
+def _page(url):
+    css = _get_custom_css.__wrapped__(RGBA_BG, url(IMAGES[0]))
+    panels = [f'<div class="savings-image-panel"><img src="{url(name)}" alt="" /></div>' for name in IMAGES[1:]]
+    return len(css) + sum(len(panel) for panel in panels)
+
+
+def run(name, url, runs):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = _page(url)
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return name, statistics.median(durations), size
+
+
+def run_app(static_serving, runs):
+    from streamlit.testing.v1 import AppTest
+
+    config.set_option("server.enableStaticServing", static_serving)
+    app = AppTest.from_file(str(APP_SCRIPT), default_timeout=60)
+    app.run()
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app.run()
+        durations.append((time.perf_counter() - start) * 1000.0)
+    size = sum(len(element.value) for element in app.markdown)
+    return statistics.median(durations), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--app", action="store_true", help="also time whole app reruns with AppTest")
+    args = parser.parse_args()
+
+    print(f"{'way':>18} {'per rerun':>10} {'page bytes':>11}")
+    config.set_option("server.enableStaticServing", False)
+    results = [run("inline (old)", _inline, args.runs), run("cached data URI", static_url, args.runs)]
+    config.set_option("server.enableStaticServing", True)
+    results.append(run("static URL", static_url, args.runs))
+    for name, duration, size in results:
+        print(f"{name:>18} {duration:>8.3f}ms {size:>11}")
+
+    if args.app:
+        print(f"\n{'app rerun':>18} {'median':>10} {'markdown bytes':>15}")
+        for static_serving in (False, True):
+            duration, size = run_app(static_serving, max(3, args.runs // 10))
+            print(f"{'static' if static_serving else 'data URI':>18} {duration:>8.1f}ms {size:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Tick jitter and reader throughput with concurrent readers.
+
+Runs the service tick in the main thread at a fixed rate while reader threads
+call the read methods used by the UI fragments and REST handlers (state,
+control metadata, latest sample, 300-sample history) every ``--read-interval``
+seconds, or in a busy loop with ``--read-interval 0``. Reports the tick
+duration, the lateness of each tick against its deadline and the number of
+reads per second.
+
+    python -m benchmarks.bench_concurrency --readers 1 10 100
+"""
+
+import argparse
+import threading
+import time
+
+from app.services.data_service import data_service
+from benchmarks._server import percentile
+
+
+WARMUP_TICKS = 600  # fill the history before measuring
+
+
+def _reader(stop, counts, slot, interval):
+    machine_ids = data_service.get_machine_ids()
+    reads = 0
+    while not stop.is_set():
+        machine_id = machine_ids[reads % len(machine_ids)]
+        data_service.get_server_data_snapshot(machine_id)
+        data_service.get_control_metadata_snapshot(machine_id)
+        data_service.get_latest_sample(machine_id)
+        data_service.get_history_snapshot(300, machine_id=machine_id)
+        reads += 1
+        counts[slot] = reads
+        if interval:
+            stop.wait(interval)
+
+
+def run(readers, ticks, period, interval):
+    stop = threading.Event()
+    counts = [0] * readers
+    threads = [
+        threading.Thread(target=_reader, args=(stop, counts, slot, interval), daemon=True)
+        for slot in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    durations, lateness = [], []
+    started = time.perf_counter()
+    initial_reads = sum(counts)
+    deadline = started
+    for _ in range(ticks):
+        deadline += period
+        tick_start = time.perf_counter()
+        data_service.tick(period)
+        durations.append((time.perf_counter() - tick_start) * 1000.0)
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        lateness.append(max(0.0, time.perf_counter() - deadline) * 1000.0)
+    elapsed = time.perf_counter() - started
+    reads = sum(counts) - initial_reads
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "readers": readers,
+        "tick_p50_ms": percentile(durations, 50),
+        "tick_p99_ms": percentile(durations, 99),
+        "tick_max_ms": max(durations),
+        "late_p99_ms": percentile(lateness, 99),
+        "reads_per_s": reads / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--period", type=float, default=0.05, help="tick period in seconds")
+    parser.add_argument(
+        "--read-interval", type=float, default=0.005,
+        help="pause between reads of one reader in seconds (0: read in a busy loop)",
+    )
+    args = parser.parse_args()
+
+    for _ in range(WARMUP_TICKS):
+        data_service.tick(1.0)
+    print(f"{'readers':>8}{'tick p50 ms':>13}{'tick p99 ms':>13}{'tick max ms':>13}{'late p99 ms':>13}{'reads/s':>10}")
+    for readers in args.readers:
+        result = run(readers, args.ticks, args.period, args.read_interval)
+        print(
+            f"{result['readers']:>8}{result['tick_p50_ms']:>13.3f}{result['tick_p99_ms']:>13.3f}"
+            f"{result['tick_max_ms']:>13.3f}{result['late_p99_ms']:>13.3f}{result['reads_per_s']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
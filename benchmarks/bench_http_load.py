@@ -0,0 +1,93 @@
+"""HTTP load test of the read endpoints against a local uvicorn process.
+
+Starts the API in a separate uvicorn process (with a pre-filled history of
+``--warmup`` ticks) and lets ``--concurrency`` keep-alive connections request
+one endpoint as fast as possible for ``--duration`` seconds. The client is a
+minimal HTTP/1.1 implementation on asyncio streams so it costs less CPU than
+the server. With ``--conditional`` the clients send the ETag of their
+previous response in ``If-None-Match``.
+
+    python -m benchmarks.bench_http_load --concurrency 50 --duration 5
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from benchmarks._server import api_server_process, percentile
+
+
+ENDPOINTS = ("/data", "/state", "/history")
+
+
+async def _request(reader, writer, path, etag):
+    conditional = f"If-None-Match: {etag}\r\n" if etag else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\n{conditional}\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+    headers = {name.lower(): value for name, value in headers.items()}
+    length = int(headers.get("content-length", 0))
+    if length:
+        await reader.readexactly(length)
+    return status, headers.get("etag")
+
+
+async def _client(host, port, path, deadline, latencies, statuses, conditional):
+    reader, writer = await asyncio.open_connection(host, port)
+    etag = None
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status, response_etag = await _request(reader, writer, path, etag if conditional else None)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            statuses[status] = statuses.get(status, 0) + 1
+            etag = response_etag or etag
+    finally:
+        writer.close()
+
+
+async def _load(base_url, path, concurrency, duration, conditional):
+    address = urlsplit(base_url)
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _client(address.hostname, address.port, path, deadline, latencies, statuses, conditional)
+        for _ in range(concurrency)
+    ))
+    return {
+        "requests_per_s": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--warmup", type=int, default=600, help="ticks simulated before the server starts")
+    parser.add_argument("--conditional", action="store_true", help="send If-None-Match")
+    args = parser.parse_args()
+
+    os.environ["BENCH_WARMUP_TICKS"] = str(args.warmup)
+    with tempfile.TemporaryDirectory() as history_dir:
+        with api_server_process(app="benchmarks._warm_app:app", history_dir=history_dir) as base_url:
+            print(f"{'endpoint':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}  statuses")
+            for path in args.endpoints:
+                result = asyncio.run(_load(base_url, path, args.concurrency, args.duration, args.conditional))
+                print(
+                    f"{path:<12}{result['requests_per_s']:>10.0f}{result['p50_ms']:>10.2f}"
+                    f"{result['p99_ms']:>10.2f}  {result['statuses']}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Tick and reader latency under a burst of pushed sensor samples.
+
+Registers ``--machines`` machines, lets ``--publishers`` stand-in threads
+publish per-channel readings for all of them through the local broker at
+``--rate`` Hz each, and meanwhile runs the 1 Hz tick (at ``--tick-rate``) and
+a reader thread calling the read methods of the UI/REST handlers every
+10 ms. Reports the ingested samples per second, the queue counters and the
+tick and read latencies, for each overflow policy. ``--stall-worker`` stops
+the ingest worker during the run, so the queue overflows and the policies
+show their cost.
+
+    python -m benchmarks.bench_ingest --machines 100 --publishers 4 --rate 10
+"""
+
+import argparse
+import threading
+import time
+
+from app.services.data_service import data_service
+from app.services.ingest import OVERFLOW_POLICIES
+from app.services.sources import SensorStandIn
+from benchmarks._server import percentile
+
+
+def _reader(stop, machine_ids, latencies):
+    position = 0
+    while not stop.is_set():
+        machine_id = machine_ids[position % len(machine_ids)]
+        start = time.perf_counter()
+        data_service.get_server_data_snapshot(machine_id)
+        data_service.get_history_snapshot(300, machine_id=machine_id)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        position += 1
+        stop.wait(0.01)
+
+
+def run(policy, capacity, machine_ids, publishers, rate, tick_rate, duration, stall_worker=False):
+    if stall_worker:
+        data_service.ingest_worker.stop()
+        data_service.ingest_queue.drain(capacity * 10)
+    data_service.configure_ingest(capacity, policy)
+    queue_before = data_service.ingest_queue.stats()
+    worker_before = data_service.ingest_worker.stats()["samples"]
+    groups = [machine_ids[index::publishers] for index in range(publishers)]
+    stand_ins = [
+        SensorStandIn(data_service.broker, group, rate_hz=rate, per_channel=True, seed=index)
+        for index, group in enumerate(groups)
+    ]
+    stop = threading.Event()
+    read_latencies = []
+    reader = threading.Thread(target=_reader, args=(stop, machine_ids, read_latencies), daemon=True)
+    reader.start()
+    for stand_in in stand_ins:
+        stand_in.start()
+
+    durations, lateness = [], []
+    period = 1.0 / tick_rate
+    started = time.perf_counter()
+    deadline = started
+    while time.perf_counter() - started < duration:
+        deadline += period
+        tick_start = time.perf_counter()
+        data_service.tick(period)
+        durations.append((time.perf_counter() - tick_start) * 1000.0)
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        lateness.append(max(0.0, time.perf_counter() - deadline) * 1000.0)
+    elapsed = time.perf_counter() - started
+
+    if stall_worker:
+        data_service.ingest_worker.start()
+    for stand_in in stand_ins:
+        stand_in.stop()
+    stop.set()
+    reader.join()
+    queue = data_service.ingest_queue.stats()
+    published = sum(stand_in.published for stand_in in stand_ins)
+    return {
+        "policy": policy,
+        "published_per_s": published / elapsed,
+        "ingested_per_s": (data_service.ingest_worker.stats()["samples"] - worker_before) / elapsed,
+        "dropped": (queue["dropped_oldest"] - queue_before["dropped_oldest"])
+        + (queue["dropped_newest"] - queue_before["dropped_newest"]),
+        "rejected": queue["rejected"] - queue_before["rejected"],
+        "high_watermark": queue["high_watermark"],
+        "tick_p99_ms": percentile(durations, 99),
+        "late_p99_ms": percentile(lateness, 99),
+        "read_p99_ms": percentile(read_latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=100)
+    parser.add_argument("--publishers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10.0, help="readings per machine and second")
+    parser.add_argument("--tick-rate", type=float, default=1.0)
+    parser.add_argument("--capacity", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--stall-worker", action="store_true", help="stop the queue consumer during the run")
+    parser.add_argument("--policies", nargs="+", default=list(OVERFLOW_POLICIES), choices=OVERFLOW_POLICIES)
+    args = parser.parse_args()
+
+    machine_ids = data_service.get_machine_ids()
+    for index in range(len(machine_ids), args.machines):
+        data_service.add_machine(f"BENCH-{index:03d}", source="benchmark")
+    machine_ids = data_service.get_machine_ids()[:args.machines]
+    data_service.ingest_worker.start()
+
+    print(f"{len(machine_ids)} machines, {args.publishers} publishers, {args.rate:g} Hz per machine")
+    print(
+        f"{'policy':>12} {'published/s':>12} {'ingested/s':>11} {'dropped':>8} {'rejected':>9} "
+        f"{'max depth':>10} {'tick p99':>9} {'late p99':>9} {'read p99':>9}"
+    )
+    for policy in args.policies:
+        result = run(
+            policy, args.capacity, machine_ids, args.publishers, args.rate, args.tick_rate, args.duration,
+            args.stall_worker,
+        )
+        print(
+            f"{result['policy']:>12} {result['published_per_s']:>12.0f} {result['ingested_per_s']:>11.0f} "
+            f"{result['dropped']:>8} {result['rejected']:>9} {result['high_watermark']:>10} "
+            f"{result['tick_p99_ms']:>7.2f}ms {result['late_p99_ms']:>7.2f}ms {result['read_p99_ms']:>7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
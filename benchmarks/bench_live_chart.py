@@ -0,0 +1,127 @@
+"""Server CPU time and bytes per tick and session for the live charts.
+
+Fills the history with ``--prefill`` ticks, then for each visible range in
+``--ranges`` (seconds) runs ``--ticks`` more ticks and after each one renders
+the four live charts (mist extractor chart and the three overview charts)
+of ``--sessions`` sessions three ways: ``rebuild`` rebuilds the Plotly
+figures from a DataFrame and serializes them whole, as before;
+``incremental`` goes through ``chart_update``, which sends the figure once
+and afterwards only the new samples; ``shared`` also takes the chart window
+from the per-tick view cache and shares the serialized updates between the
+sessions. Ranges with more samples than ``--max-points`` are reduced by
+LTTB and are redrawn whole on every tick.
+
+    python -m benchmarks.bench_live_chart --ranges 60 300 1800 --ticks 60 --sessions 20
+"""
+
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from app.components import create_plotly_chart
+from app.config import CHART_MAX_POINTS, COLOR_PALETTE, DEFAULT_MACHINE_ID
+from app.live_chart import chart_update
+from app.mist_extractor import _mist_extractor_figure
+from app.services.data_service import data_service
+from app.views import chart_update_cache, chart_view
+
+OVERVIEW_CHARTS = [
+    ("Main supply", COLOR_PALETTE["FX Blue"]),
+    ("Mist extractor", COLOR_PALETTE["Light Blue"]),
+    ("Chip conveyor", COLOR_PALETTE["Blue"]),
+]
+
+
+def _relayout(columns):
+    return {
+        "yaxis.range": [0, max(float(columns["Mist extractor"].max()) * 1.2, 500)],
+        "yaxis2.range": [0, max(float(columns["PM10"].max()) * 1.2, 5)],
+    }
+
+
+def render_rebuild(columns, max_points):
+    """The charts as built before: a DataFrame and four whole figures per run."""
+    history_df = pd.DataFrame(columns)
+    fig = _mist_extractor_figure()
+    fig.update_traces(x=history_df["timestamp"], y=history_df["Mist extractor"], selector=0)
+    fig.update_traces(x=history_df["timestamp"], y=history_df["PM10"], selector=1)
+    fig.update_layout(_relayout(columns))
+    figures = [fig] + [
+        create_plotly_chart(history_df, y_col, None, color, max_points=max_points) for y_col, color in OVERVIEW_CHARTS
+    ]
+    return sum(len(figure.to_json()) for figure in figures)
+
+
+def render_incremental(states, chart_id, columns, cache=None):
+    """The live charts: component arguments of the four charts of one session."""
+    updates = [
+        chart_update(
+            states.setdefault("mist", {}), chart_id, _mist_extractor_figure, columns, ["Mist extractor", "PM10"],
+            relayout=_relayout(columns), cache=cache and (lambda key, build: cache(("mist", *key), build)),
+        )
+    ]
+    for y_col, color in OVERVIEW_CHARTS:
+        updates.append(chart_update(
+            states.setdefault(y_col, {}), chart_id,
+            lambda y_col=y_col, color=color: create_plotly_chart(
+                pd.DataFrame(columns=["timestamp", y_col]), y_col, None, color
+            ),
+            columns, [y_col], cache=cache and (lambda key, build, y_col=y_col: cache((y_col, *key), build)),
+        ))
+    return sum(len(json.dumps(update)) for update in updates)
+
+
+def _render_session(way, state, span, max_points):
+    if way == "shared":
+        view = chart_view(DEFAULT_MACHINE_ID, span, max_points)
+        return render_incremental(state, view["chart_id"], view["columns"], chart_update_cache)
+    columns, resolution = data_service.get_history_view(DEFAULT_MACHINE_ID, max_points, limit=span)
+    if way == "rebuild":
+        return render_rebuild(columns, max_points)
+    return render_incremental(state, f"{DEFAULT_MACHINE_ID}:{span}:{max_points}:{resolution}", columns)
+
+
+def run(span, ticks, max_points, sessions):
+    ways = ("rebuild", "incremental", "shared")
+    states = {way: [{} for _ in range(sessions)] for way in ways}
+    results = {way: ([], []) for way in ways}
+    for _ in range(ticks):
+        data_service.tick(1.0)
+        for way in ways:
+            start = time.process_time()
+            sizes = [_render_session(way, state, span, max_points) for state in states[way]]
+            results[way][0].append((time.process_time() - start) * 1000.0 / sessions)
+            results[way][1].append(sum(sizes) / sessions)
+    # The first run of a session sends the whole figure on every way; report the steady state.
+    return {
+        way: (sum(cpu[1:]) / (ticks - 1), sum(sizes[1:]) / (ticks - 1), sizes[0])
+        for way, (cpu, sizes) in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ranges", type=int, nargs="+", default=[60, 300, 1800], help="visible ranges in seconds")
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--prefill", type=int, default=1800, help="ticks recorded before the first range")
+    parser.add_argument("--max-points", type=int, default=CHART_MAX_POINTS)
+    parser.add_argument("--sessions", type=int, default=1, help="browser sessions rendering after each tick")
+    args = parser.parse_args()
+
+    for _ in range(args.prefill):
+        data_service.tick(1.0)
+
+    print(
+        f"{args.sessions} sessions with 4 charts, max {args.max_points} points per chart, "
+        f"{args.ticks} ticks per range (CPU and bytes per session)"
+    )
+    print(f"{'range':>7} {'way':>12} {'CPU/tick':>10} {'bytes/tick':>11} {'first run':>10}")
+    for span in args.ranges:
+        for name, (cpu_ms, size, first) in run(span, args.ticks, args.max_points, args.sessions).items():
+            print(f"{span:>6}s {name:>12} {cpu_ms:>8.2f}ms {size:>11.0f} {first:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Read throughput of reader processes on the shared-memory state.
+
+Starts a writer process that ticks at ``--rate`` Hz and publishes into
+shared memory, then for each count in ``--readers`` that many reader
+processes, each calling the read methods of the UI/REST handlers for
+``--duration`` seconds. Reports the reads per second over all readers, the
+read latency, the sequence lock retries and the snapshots whose machine
+states, history and sequence number did not belong to the same tick (must
+be 0).
+
+    python -m benchmarks.bench_shared_state --readers 1 2 4 --rate 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks._server import percentile
+
+
+def _configure(role, name, history_dir):
+    # Read by app.config on import, so set before importing the service.
+    os.environ.update({
+        "FACTORYX_SHARED_STATE": role,
+        "FACTORYX_SHARED_NAME": name,
+        "FACTORYX_HISTORY_DIR": history_dir,
+    })
+
+
+def _writer(name, history_dir, rate, ready, stop):
+    _configure("writer", name, history_dir)
+    from app.services.data_service import data_service
+
+    data_service.set_scheduler(rate)
+    data_service.start_data_generator()
+    ready.set()
+    stop.wait()
+
+
+def _reader(name, history_dir, duration, results):
+    _configure("reader", name, history_dir)
+    from app.services.data_service import data_service
+
+    machine_ids = data_service.get_machine_ids()
+    latencies = []
+    inconsistent = 0
+    position = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        machine_id = machine_ids[position % len(machine_ids)]
+        start = time.perf_counter()
+        data_service.get_server_data_snapshot(machine_id)
+        data_service.get_history_snapshot(300, machine_id=machine_id)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        # One snapshot must describe a single tick.
+        snapshot = data_service._snapshot
+        index = snapshot.index_of(machine_id)
+        latest = snapshot.history.latest(index)
+        if snapshot.states[index]["seq"] != snapshot.seq or (latest and latest["seq"] != snapshot.seq):
+            inconsistent += 1
+        position += 1
+    results.put((latencies, data_service._shared_reader.retries, inconsistent))
+
+
+def run(context, name, history_dir, readers, duration):
+    results = context.Queue()
+    processes = [
+        context.Process(target=_reader, args=(name, history_dir, duration, results)) for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    latencies = [value for reader_latencies, _, _ in collected for value in reader_latencies]
+    return {
+        "readers": readers,
+        "reads_per_s": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "retries": sum(retries for _, retries, _ in collected),
+        "inconsistent": sum(count for _, _, count in collected),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rate", type=float, default=10.0, help="tick rate of the writer in Hz")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    name = f"factoryx_bench_{os.getpid()}"
+    with tempfile.TemporaryDirectory() as history_dir:
+        ready, stop = context.Event(), context.Event()
+        writer = context.Process(target=_writer, args=(name, history_dir, args.rate, ready, stop))
+        writer.start()
+        ready.wait()
+        try:
+            print(f"writer at {args.rate:g} Hz, {os.cpu_count()} CPUs")
+            print(f"{'readers':>8} {'reads/s':>9} {'p50':>8} {'p99':>8} {'retries':>8} {'inconsistent':>13}")
+            for readers in args.readers:
+                result = run(context, name, history_dir, readers, args.duration)
+                print(
+                    f"{result['readers']:>8} {result['reads_per_s']:>9.0f} {result['p50_ms']:>6.3f}ms "
+                    f"{result['p99_ms']:>6.3f}ms {result['retries']:>8} {result['inconsistent']:>13}"
+                )
+        finally:
+            stop.set()
+            writer.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Cold start of the API-only service and of the Streamlit app.
+
+Each measurement runs ``--repeat`` times in a fresh interpreter: the import
+of the API-only entry point (``app.services.data_service``, as loaded by
+``uvicorn app.services.data_service:app``) together with the heavy modules
+it pulled in (must not list streamlit, pandas or plotly), the import of
+the app module (``app.main``), and the time to the first render of the app
+with ``AppTest`` (script run of the open tab, including its imports).
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HEAVY_MODULES = ("streamlit", "pandas", "plotly", "pyarrow", "openpyxl", "requests")
+APP_SCRIPT = Path(__file__).resolve().parents[1] / "app.py"
+
+
+def _child(kind):
+    start = time.perf_counter()
+    if kind == "api":
+        import app.services.data_service  # noqa: F401
+    elif kind == "app":
+        import app.main  # noqa: F401
+    else:
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(str(APP_SCRIPT), default_timeout=120)
+        start = time.perf_counter()
+        app.run()
+    elapsed = (time.perf_counter() - start) * 1000.0
+    print(json.dumps({"ms": elapsed, "modules": [name for name in HEAVY_MODULES if name in sys.modules]}))
+
+
+def measure(kind, repeat, history_dir):
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child", kind],
+            capture_output=True, text=True, check=True,
+            cwd=APP_SCRIPT.parent, env={**os.environ, "FACTORYX_HISTORY_DIR": history_dir},
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return statistics.median(result["ms"] for result in results), results[-1]["modules"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", choices=("api", "app", "render"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child)
+        return
+
+    print(f"{'measurement':>22} {'median':>10}  heavy modules loaded")
+    with tempfile.TemporaryDirectory() as history_dir:
+        for kind, label in (("api", "API-only import"), ("app", "app import"), ("render", "first render")):
+            duration, modules = measure(kind, args.repeat, history_dir)
+            print(f"{label:>22} {duration:>8.0f}ms  {', '.join(modules) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Fan-out latency of the /stream endpoints.
+
+Connects N WebSocket or SSE subscribers to a local uvicorn server running the
+live simulation and measures, for every received sample, the time between the
+tick (``time`` field of the sample) and its arrival at the subscriber.
+
+    python -m benchmarks.bench_stream_fanout --subscribers 100 300 --ticks 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import websockets
+
+from app.services.data_service import data_service
+from benchmarks._server import local_api_server, percentile
+
+
+async def _ws_subscriber(address, ticks, latencies, ready):
+    async with websockets.connect(f"ws://{address}/stream/ws", max_queue=None) as websocket:
+        await websocket.recv()  # initial state
+        ready.release()
+        for _ in range(ticks):
+            sample = json.loads(await websocket.recv())
+            latencies.append(time.time() - sample["time"])
+
+
+async def _sse_subscriber(client, address, ticks, latencies, ready):
+    async with client.stream("GET", f"http://{address}/stream/sse") as response:
+        received = -1  # the first event is the current state
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            if received < 0:
+                ready.release()
+            else:
+                latencies.append(time.time() - json.loads(line[6:])["time"])
+            received += 1
+            if received >= ticks:
+                break
+
+
+async def _run(address, transport, subscribers, ticks):
+    latencies = []
+    ready = asyncio.Semaphore(0)
+    limits = httpx.Limits(max_connections=subscribers + 10)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        if transport == "ws":
+            tasks = [_ws_subscriber(address, ticks, latencies, ready) for _ in range(subscribers)]
+        else:
+            tasks = [_sse_subscriber(client, address, ticks, latencies, ready) for _ in range(subscribers)]
+        await asyncio.gather(*tasks)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--transport", choices=["ws", "sse", "both"], default="both")
+    args = parser.parse_args()
+
+    transports = ["ws", "sse"] if args.transport == "both" else [args.transport]
+    with local_api_server(data_service.api_app, ws_max_queue=64) as address:
+        data_service.start_data_generator()
+        print(f"{'transport':<10}{'subscribers':>12}{'samples':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for transport in transports:
+            for subscribers in args.subscribers:
+                latencies = asyncio.run(_run(address, transport, subscribers, args.ticks))
+                latencies_ms = [latency * 1000.0 for latency in latencies]
+                print(
+                    f"{transport:<10}{subscribers:>12}{len(latencies_ms):>10}"
+                    f"{percentile(latencies_ms, 50):>10.2f}{percentile(latencies_ms, 99):>10.2f}"
+                    f"{max(latencies_ms):>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Benchmark suite of the tick, read, render and API paths, with baseline comparison.
+
+Fills the history to ``--history`` samples and times each case in the same
+process. The micro-benchmarks cover one service tick, ``get_history_snapshot``
+and ``pd.DataFrame`` of the history at several window sizes, the chart
+figures (``create_plotly_chart`` and the ``make_subplots`` figure of the
+mist extractor chart with a 5-minute window) and the JSON encoding of
+``/history``. The macro-benchmarks send requests to the API through an
+in-process FastAPI ``TestClient`` (no server, no background tasks); the
+cached variants answer from the per-tick payload cache, ``uncached`` ones
+force a new encode.
+
+Every case runs ``--repeat`` rounds of as many calls as fit into
+``--min-time`` seconds and reports the median and the best time per call.
+``--output`` saves the results as JSON; ``--baseline`` compares them with a
+saved run and exits with status 1 if a case got slower than ``--tolerance``
+(relative, on the median).
+
+    python -m benchmarks.bench_suite --output baseline.json
+    python -m benchmarks.bench_suite --baseline baseline.json --filter history
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# The filled history must not end up in .data/ (set before the service is imported).
+os.environ.setdefault("FACTORYX_HISTORY_DIR", tempfile.mkdtemp(prefix="factoryx-bench-"))
+
+import orjson  # noqa: E402
+
+from app.config import HISTORY_CAPACITY, HISTORY_WINDOW  # noqa: E402
+from app.services.data_service import data_service  # noqa: E402
+
+WINDOWS = (HISTORY_WINDOW, 3600, HISTORY_CAPACITY)
+
+
+def _windows(history):
+    """The window sizes that fit into a history of ``history`` samples."""
+    return sorted({min(limit, history) for limit in WINDOWS})
+
+
+def _micro_cases(machine_id, history):
+    import pandas as pd
+
+    from app.components import create_plotly_chart
+    from app.mist_extractor import _mist_extractor_figure
+
+    def history_json(limit):
+        snapshot = data_service._snapshot
+        records = snapshot.history.to_records(snapshot.index_of(machine_id), limit)
+        return orjson.dumps(records, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def mist_extractor_figure(columns):
+        # Layout plus the visible window, as the chart is sent to a new session.
+        fig = _mist_extractor_figure()
+        fig.update_traces(x=columns["timestamp"], y=columns["Mist extractor"], selector=0)
+        fig.update_traces(x=columns["timestamp"], y=columns["PM10"], selector=1)
+        return fig.to_plotly_json()
+
+    window = data_service.get_history_snapshot(HISTORY_WINDOW, machine_id=machine_id)
+    frame = pd.DataFrame(window)
+    cases = {}
+    for limit in _windows(history):
+        columns = data_service.get_history_snapshot(limit, machine_id=machine_id)
+        cases[f"history_snapshot[{limit}]"] = lambda limit=limit: data_service.get_history_snapshot(
+            limit, machine_id=machine_id
+        )
+        cases[f"dataframe[{limit}]"] = lambda columns=columns: pd.DataFrame(columns)
+        cases[f"history_json[{limit}]"] = lambda limit=limit: history_json(limit)
+    cases[f"create_plotly_chart[{HISTORY_WINDOW}]"] = lambda: create_plotly_chart(
+        frame, "Mist extractor", "Mist extractor"
+    )
+    cases[f"mist_extractor_figure[{HISTORY_WINDOW}]"] = lambda: mist_extractor_figure(window)
+    return cases
+
+
+def _macro_cases(machine_id, history):
+    from fastapi.testclient import TestClient
+
+    # Without the context manager the startup events (data generator, heartbeat) do not run.
+    client = TestClient(data_service.api_app)
+
+    def get(url, **params):
+        response = client.get(url, params={"machine_id": machine_id, **params})
+        response.raise_for_status()
+        return response.content
+
+    def uncached_history(limit):
+        return get("/history", limit=limit, after=max(0, data_service.get_last_seq() - limit))
+
+    return {
+        "api /data": lambda: get("/data"),
+        "api /state": lambda: get("/state"),
+        "api /machines": lambda: get("/machines"),
+        f"api /history[{HISTORY_WINDOW}]": lambda: get("/history"),
+        f"api /history[{HISTORY_WINDOW}] uncached": lambda: uncached_history(HISTORY_WINDOW),
+        f"api /history[{history}] uncached": lambda: uncached_history(history),
+        f"api /history[3600, max_points={HISTORY_WINDOW}]": lambda: get(
+            "/history", limit=3600, max_points=HISTORY_WINDOW
+        ),
+    }
+
+
+def measure(function, repeat, min_time):
+    """Returns the median and best time per call in microseconds and the calls per round."""
+    function()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+    rounds = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        rounds.append((time.perf_counter() - start) / loops)
+    return statistics.median(rounds) * 1e6, min(rounds) * 1e6, loops
+
+
+def run(args):
+    machine_id = data_service.get_machine_ids()[0]
+    for _ in range(args.history - len(data_service.get_history_snapshot(machine_id=machine_id)["seq"])):
+        data_service.tick(1.0)
+
+    cases = {**_micro_cases(machine_id, args.history), **_macro_cases(machine_id, args.history)}
+    # Last, as it grows the history; it stays at capacity once full.
+    cases["tick"] = lambda: data_service.tick(1.0)
+    results = {}
+    for name, function in cases.items():
+        if args.filter and not any(pattern in name for pattern in args.filter):
+            continue
+        median, best, loops = measure(function, args.repeat, args.min_time)
+        results[name] = {"median_us": median, "min_us": best, "loops": loops}
+        print(f"{name:>44} {median:>12.1f}us {best:>12.1f}us {loops:>8}", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Prints the median of each case against the baseline; returns the names of the slower cases."""
+    regressions = []
+    print(f"\n{'case':>44} {'baseline':>14} {'now':>14} {'change':>8}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:>44} {'-':>14} {result['median_us']:>12.1f}us {'new':>8}")
+            continue
+        change = result["median_us"] / before["median_us"] - 1.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  slower"
+        elif change < -tolerance:
+            flag = "  faster"
+        print(f"{name:>44} {before['median_us']:>12.1f}us {result['median_us']:>12.1f}us {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, default=HISTORY_CAPACITY, help="samples in the history")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--filter", nargs="+", help="only run cases whose name contains one of these")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown of the median")
+    args = parser.parse_args()
+    args.history = min(args.history, HISTORY_CAPACITY)
+
+    print(f"{'case':>44} {'median':>14} {'best':>14} {'calls':>8}")
+    results = run(args)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machines": len(data_service.get_machine_ids()),
+        "history": args.history,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["history"] != args.history:
+            print(f"\nThe baseline was run with a history of {baseline['history']} samples, not {args.history}.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
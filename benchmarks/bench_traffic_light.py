@@ -0,0 +1,86 @@
+"""Bytes and remounts per tick of a page with many traffic lights.
+
+Renders ``--lights`` lights (one per machine) for ``--ticks`` reruns with
+changing states, once the old way (a new ``st.components.v1.html`` document
+with the full CSS on every rerun, which the browser parses and lays out
+anew whenever the state changes) and once with the persistent component of
+``render_traffic_light`` (mounted once per key, later runs only carry the
+state). Reports the element bytes per tick and how many iframes got a new
+document, i.e. were reloaded by the browser.
+
+    python -m benchmarks.bench_traffic_light --lights 20 --ticks 30
+"""
+
+import argparse
+import re
+import statistics
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+FRONTEND_PAGE = Path(__file__).resolve().parents[1] / "app" / "frontend" / "traffic_light" / "index.html"
+STATES = ("green", "yellow", "red", "animation")
+
+_SCRIPT = """
+import streamlit as st
+from app.components import render_traffic_light
+
+tick = st.session_state.get("tick", 0)
+for machine in range({lights}):
+    state = {states}[(tick + machine) // 3 % 4]
+    if {old}:
+        st.components.v1.html(old_html(state), height=170)
+    else:
+        render_traffic_light(state, key=f"light:{{machine}}")
+"""
+
+
+def old_html(state):
+    """The document the old ``render_traffic_light`` sent on every rerun."""
+    css = re.search(r"<style>.*?</style>", FRONTEND_PAGE.read_text(encoding="utf-8"), re.S).group(0)
+    classes = [
+        f"anim-{color}" if state == "animation" else (f"light-{color}" if state == color else "")
+        for color in ("red", "yellow", "green")
+    ]
+    spans = "".join(f'<span class="{css_class}"></span>' for css_class in classes)
+    return f'{css}<div class="trafficLight">{spans}</div>'
+
+
+def run(old, lights, ticks):
+    source = "from benchmarks.bench_traffic_light import old_html\n" + _SCRIPT.format(
+        lights=lights, states=STATES, old=old
+    )
+    app = AppTest.from_string(source, default_timeout=60)
+    app.run()
+    previous = None
+    durations, sizes, reloads = [], [], 0
+    for tick in range(1, ticks + 1):
+        app.session_state["tick"] = tick
+        start = time.perf_counter()
+        app.run()
+        durations.append((time.perf_counter() - start) * 1000.0)
+        elements = [node.proto for node in app.main.children.values()]
+        sizes.append(sum(element.ByteSize() for element in elements))
+        # A changed srcdoc (old way) or element id (component) makes the browser load a new document.
+        documents = [getattr(element, "srcdoc", None) or element.id for element in elements]
+        if previous is not None:
+            reloads += sum(a != b for a, b in zip(previous, documents))
+        previous = documents
+    return statistics.median(durations), statistics.mean(sizes), reloads / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lights", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'way':>22} {'rerun':>9} {'bytes/tick':>11} {'reloads/tick':>13}")
+    for name, old in (("iframe per rerun (old)", True), ("persistent component", False)):
+        duration, size, reloads = run(old, args.lights, args.ticks)
+        print(f"{name:>22} {duration:>7.1f}ms {size:>11.0f} {reloads:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()